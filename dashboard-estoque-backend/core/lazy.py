@@ -0,0 +1,41 @@
+# core/lazy.py - IMPORTAÇÃO SOB DEMANDA DE MÓDULOS PESADOS (numpy, pandas...)
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Referência a um módulo que só é importado no primeiro acesso a um atributo.
+
+    Seguro entre threads (workers gthread): o import real passa pelo
+    ``importlib.import_module``, que já serializa a execução do módulo.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'carregado' if self._module is not None else 'não carregado'
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Retorna o módulo ``name`` sem importá-lo: o import real acontece no primeiro
+    acesso a um atributo. Mantém comandos e workers que não usam o módulo livres
+    do custo de importação.
+    """
+    return LazyModule(name)
@@ -0,0 +1,181 @@
+# core/metrics.py - MÉTRICAS NO FORMATO DO PROMETHEUS
+#
+# Os valores ficam em arquivos mmap em PROMETHEUS_MULTIPROC_DIR (modo
+# multiprocesso do prometheus_client): cada worker do gunicorn, o report_worker
+# e o warm_cache gravam os seus, e o GET /metrics soma todos na hora da coleta.
+# Registrar um valor é escrever em memória mapeada (alguns microssegundos); o
+# prometheus_client só é importado no primeiro registro.
+
+import os
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from core.lazy import lazy_import
+
+prometheus = lazy_import('prometheus_client')
+multiprocess = lazy_import('prometheus_client.multiprocess')
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 200000)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 2e7, 1e8)
+
+# Chaves da resposta (DRF) que trazem as linhas retornadas
+ROWS_KEYS = ('results', 'data', 'locations')
+
+_lock = threading.Lock()
+_metrics = None
+
+
+def _build():
+    Path(os.environ['PROMETHEUS_MULTIPROC_DIR']).mkdir(parents=True, exist_ok=True)
+
+    # registry=None: no modo multiprocesso a coleta lê os arquivos, não o registro
+    return SimpleNamespace(
+        request_seconds=prometheus.Histogram(
+            'dashboard_request_duration_seconds', 'Tempo de resposta por endpoint',
+            ['view', 'method', 'status'], buckets=LATENCY_BUCKETS, registry=None,
+        ),
+        response_rows=prometheus.Histogram(
+            'dashboard_response_rows', 'Linhas retornadas por resposta',
+            ['view'], buckets=ROWS_BUCKETS, registry=None,
+        ),
+        response_bytes=prometheus.Histogram(
+            'dashboard_response_bytes', 'Tamanho do corpo da resposta (bytes)',
+            ['view'], buckets=BYTES_BUCKETS, registry=None,
+        ),
+        query_seconds=prometheus.Histogram(
+            'protheus_query_duration_seconds', 'Tempo das consultas ao Oracle por método do ProtheusService',
+            ['method', 'database'], buckets=LATENCY_BUCKETS, registry=None,
+        ),
+        cache_requests=prometheus.Counter(
+            'protheus_cache_requests', 'Consultas ao cache de resultados (hit, miss, refresh, stale)',
+            ['namespace', 'result'], registry=None,
+        ),
+        connections=prometheus.Gauge(
+            'protheus_oracle_connections', 'Conexões abertas com o Oracle',
+            ['database'], multiprocess_mode='livesum', registry=None,
+        ),
+        admission_in_use=prometheus.Gauge(
+            'protheus_admission_slots_in_use', 'Vagas de consulta ao Oracle ocupadas (ver admission)',
+            ['database'], multiprocess_mode='livesum', registry=None,
+        ),
+        admission_wait=prometheus.Histogram(
+            'protheus_admission_wait_seconds', 'Espera por vaga de consulta ao Oracle',
+            ['database'], buckets=LATENCY_BUCKETS, registry=None,
+        ),
+        query_unavailable=prometheus.Counter(
+            'protheus_query_unavailable', 'Consultas não atendidas (sem vaga, tempo esgotado, disjuntor aberto)',
+            ['endpoint', 'reason'], registry=None,
+        ),
+    )
+
+
+def get_metrics():
+    """
+    Métricas da aplicação, criadas no primeiro uso; None com METRICS_ENABLED=0
+    """
+    global _metrics
+    if _metrics is None and settings.METRICS_ENABLED:
+        with _lock:
+            if _metrics is None:
+                _metrics = _build()
+    return _metrics
+
+
+def response_rows(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        for key in ROWS_KEYS:
+            if isinstance(data.get(key), list):
+                return len(data[key])
+    return None
+
+
+def response_size(response):
+    if response.streaming:
+        length = response.get('Content-Length')
+        return int(length) if length else None
+    return len(response.content)
+
+
+def record_query(method, database, seconds):
+    metrics = get_metrics()
+    if metrics:
+        metrics.query_seconds.labels(method, database).observe(seconds)
+
+
+def record_cache(namespace, result):
+    metrics = get_metrics()
+    if metrics:
+        metrics.cache_requests.labels(namespace, result).inc()
+
+
+def record_connection(database, delta):
+    metrics = get_metrics()
+    if metrics:
+        metrics.connections.labels(database).inc(delta)
+
+
+def record_admission(database, waited=None, delta=1):
+    """
+    Vaga reservada (``waited`` = espera em segundos) ou liberada (``delta=-1``)
+    """
+    metrics = get_metrics()
+    if metrics:
+        if waited is not None:
+            metrics.admission_wait.labels(database).observe(waited)
+        metrics.admission_in_use.labels(database).inc(delta)
+
+
+def record_unavailable(endpoint, reason):
+    metrics = get_metrics()
+    if metrics:
+        metrics.query_unavailable.labels(endpoint, reason).inc()
+
+
+class MetricsMiddleware:
+    """
+    Tempo de resposta, linhas e bytes por nome de URL (``stocks-summary``,
+    ``sales-summary``...); requisições sem rota contam como ``unmatched``
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        metrics = get_metrics()
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unmatched'
+        if metrics is None or view == 'metrics':
+            return response
+
+        metrics.request_seconds.labels(view, request.method, f'{response.status_code // 100}xx').observe(elapsed)
+        rows = response_rows(response)
+        if rows is not None:
+            metrics.response_rows.labels(view).observe(rows)
+        size = response_size(response)
+        if size is not None:
+            metrics.response_bytes.labels(view).observe(size)
+        return response
+
+
+def metrics_view(request):
+    """
+    GET /metrics - soma os arquivos de todos os processos no formato texto do Prometheus
+    """
+    if get_metrics() is None:
+        raise Http404
+    registry = prometheus.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(prometheus.generate_latest(registry), content_type=prometheus.CONTENT_TYPE_LATEST)
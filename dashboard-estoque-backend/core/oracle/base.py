@@ -0,0 +1,83 @@
+"""
+Backend Oracle do Protheus (ENGINE = 'core.oracle').
+
+É o backend padrão do Django, sem a verificação de versão mínima do Oracle
+(o banco do Protheus roda em uma versão anterior à suportada oficialmente).
+Como todo backend, só é importado - junto com o ``oracledb`` - no primeiro
+uso de ``connections['protheus']``.
+
+Os valores já saem do driver no formato usado pela API (ver
+``ProtheusCursor._output_type_handler``): CHAR sem os espaços de
+preenchimento e números como float/int nativos.
+"""
+
+from django.conf import settings
+from django.db.backends.oracle.base import Database, FormatStylePlaceholderCursor
+from django.db.backends.oracle.base import DatabaseWrapper as OracleDatabaseWrapper
+
+from core import metrics
+
+
+def _integral(value):
+    """
+    NUMBER sem precisão (R_E_C_N_O_, COUNT, SUM...): int quando não tem casas
+    decimais, senão float
+    """
+    return int(value) if value.is_integer() else value
+
+
+def _rstrip_char(value):
+    return value.rstrip()
+
+
+class ProtheusCursor(FormatStylePlaceholderCursor):
+    """
+    Cursor do Django com conversões do Protheus feitas na leitura pelo driver.
+
+    O Django define o ``outputtypehandler`` em cada cursor (o da conexão seria
+    ignorado), por isso o tratamento fica aqui.
+    """
+
+    @staticmethod
+    def _output_type_handler(cursor, name, defaultType, length, precision, scale):
+        if defaultType in (Database.DB_TYPE_CHAR, Database.DB_TYPE_NCHAR):
+            # Colunas CHAR vêm completadas com espaços até o tamanho da coluna
+            # (datas do Protheus são DATE; nenhuma coluna CHAR vira None)
+            return cursor.var(defaultType, size=length, arraysize=cursor.arraysize, outconverter=_rstrip_char)
+
+        if defaultType == Database.DB_TYPE_NUMBER:
+            if scale == 0 and precision > 0:
+                # NUMBER(p): o driver já devolve int
+                return None
+            # FLOAT, NUMBER(p,s) e expressões: double nativo, sem passar por
+            # string/Decimal como no backend padrão
+            return cursor.var(
+                Database.DB_TYPE_BINARY_DOUBLE,
+                arraysize=cursor.arraysize,
+                outconverter=_integral if precision == 0 else None,
+            )
+
+        return FormatStylePlaceholderCursor._output_type_handler(
+            cursor, name, defaultType, length, precision, scale
+        )
+
+
+class DatabaseWrapper(OracleDatabaseWrapper):
+
+    def check_database_version_supported(self):
+        pass
+
+    def create_cursor(self, name=None):
+        return ProtheusCursor(self.connection, self)
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # Também vale para o ORM; o protheus_cursor troca pelo tempo do endpoint
+        connection.call_timeout = int(settings.PROTHEUS_CALL_TIMEOUT * 1000)
+        metrics.record_connection(self.alias, 1)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            metrics.record_connection(self.alias, -1)
+        return super()._close()
@@ -0,0 +1,221 @@
+# core/profiling.py - PERFIL DE UMA REQUISIÇÃO SOB DEMANDA (SÓ STAFF)
+#
+# Com ``?_profile=1`` (ou o cabeçalho ``X-Profile: 1``) um usuário staff recebe,
+# no lugar da resposta, o perfil da requisição:
+#
+# - pilhas amostradas a cada PROFILING_INTERVAL segundos por uma thread à parte
+#   (``sys._current_frames``), no formato "folded" (uma linha por pilha,
+#   ``raiz;...;folha N``) aceito por flamegraph.pl, speedscope e inferno;
+# - tempo por fase: consulta ao Oracle por método do ProtheusService,
+#   consolidação, view, serialização (estimada pelas amostras) e renderização.
+#
+# ``?_profile=folded`` devolve só as pilhas em texto. Os últimos PROFILING_KEEP
+# perfis de cada endpoint ficam em PROFILING_DIR (ver ``manage.py profiles``).
+
+import datetime
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+_state = threading.local()
+
+# Módulos cujas amostras contam como serialização (DRF)
+SERIALIZER_MODULES = ('rest_framework.serializers', 'rest_framework.fields', 'rest_framework.relations')
+
+
+class Sampler(threading.Thread):
+    """
+    Amostra a pilha da thread ``thread_id`` até ``stop()``
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+class Timeline:
+    """
+    Tempo acumulado por fase da requisição perfilada
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+def active():
+    return getattr(_state, 'timeline', None)
+
+
+def add_phase(name, seconds):
+    """
+    Soma ``seconds`` à fase ``name`` se a requisição atual estiver sendo perfilada
+    """
+    timeline = getattr(_state, 'timeline', None)
+    if timeline is not None:
+        timeline.add(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    """
+    Mede o bloco como fase ``name`` (sem custo fora do modo perfil)
+    """
+    timeline = getattr(_state, 'timeline', None)
+    if timeline is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timeline.add(name, time.perf_counter() - started)
+
+
+def is_staff(request):
+    """
+    Staff pela sessão (admin) ou pelas autenticações do DRF (ex.: Basic)
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    try:
+        user = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+    except Exception:
+        return False
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+def save_profile(view, profile):
+    """
+    Grava o perfil em PROFILING_DIR/<endpoint>/ mantendo os PROFILING_KEEP mais recentes
+    """
+    directory = Path(settings.PROFILING_DIR) / view
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{datetime.datetime.now():%Y%m%d_%H%M%S_%f}.json"
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(profile, fh, ensure_ascii=False)
+
+    for old in sorted(directory.glob('*.json'))[:-settings.PROFILING_KEEP or None]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def sampled_seconds(stacks, modules, seconds_per_sample):
+    """
+    Tempo estimado das amostras que passam por algum dos ``modules``
+    """
+    count = sum(
+        n for stack, n in stacks.items()
+        if any(f';{module}.' in f';{stack}' for module in modules)
+    )
+    return count * seconds_per_sample
+
+
+class ProfilingMiddleware:
+    """
+    Executa a requisição sob o Sampler e devolve o perfil (ver o topo do módulo)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get('_profile') or request.headers.get('X-Profile')
+        if not mode or not settings.PROFILING_ENABLED or not is_staff(request):
+            return self.get_response(request)
+
+        timeline = Timeline()
+        _state.timeline = timeline
+        sampler = Sampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            finished = time.perf_counter()
+            sampler.stop()
+            _state.timeline = None
+        total = finished - started
+
+        # Depois do process_template_response vem só a renderização
+        rendered_at = getattr(request, '_profile_rendered_at', None)
+        if rendered_at is not None:
+            timeline.add('renderizacao', finished - rendered_at)
+
+        samples = sum(sampler.stacks.values())
+        if samples:
+            timeline.add('serializacao (amostrado)', sampled_seconds(
+                sampler.stacks, SERIALIZER_MODULES, total / samples,
+            ))
+
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unmatched'
+        profile = {
+            'endpoint': view,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total': round(total, 6),
+            'phases': {name: round(seconds, 6) for name, seconds in sorted(timeline.phases.items())},
+            'samples': samples,
+            'interval': settings.PROFILING_INTERVAL,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'folded': sampler.folded(),
+        }
+        path = save_profile(view, profile)
+
+        if mode == 'folded':
+            result = HttpResponse(profile['folded'], content_type='text/plain; charset=utf-8')
+        else:
+            result = JsonResponse(profile, json_dumps_params={'ensure_ascii': False})
+        result['X-Profile-File'] = path.name
+        return result
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if active() is not None:
+            request._profile_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Chamado antes do response.render(): separa a view da renderização
+        if active() is not None:
+            now = time.perf_counter()
+            request._profile_rendered_at = now
+            started = getattr(request, '_profile_view_started', None)
+            if started is not None:
+                active().add('view', now - started)
+        return response
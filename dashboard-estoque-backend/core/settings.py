@@ -11,28 +11,41 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
-import sys
 from pathlib import Path
-import oracledb
-sys.modules["cx_Oracle"] = oracledb
 
-from core.monkey_patch_oracle import patch_oracle_version_check
-patch_oracle_version_check()
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Variáveis do .env (as do ambiente têm prioridade)
+load_dotenv(BASE_DIR / '.env')
 
-# Quick-start development settings - unsuitable for production
-# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).strip().lower() in ('1', 'true', 'sim', 'yes')
+
+
+def env_list(name, default=''):
+    return [item.strip() for item in os.environ.get(name, default).split(',') if item.strip()]
+
+
+# Perfil: "development" (padrão) ou "production"
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'development')
+PRODUCTION = DJANGO_ENV == 'production'
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-dashboard-estoque-backend-secret-key'
+SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-dashboard-estoque-backend-secret-key')
+if PRODUCTION and SECRET_KEY.startswith('django-insecure'):
+    raise ImproperlyConfigured('Defina SECRET_KEY no perfil production')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Com DEBUG ligado o Django guarda todo SQL executado em connection.queries
+# (cresce indefinidamente em workers de longa duração)
+DEBUG = env_bool('DEBUG', not PRODUCTION)
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS', '*')
 
 
 # Application definition
@@ -52,6 +65,7 @@ INSTALLED_APPS = [
 
     # Local apps
     'protheus',
+    'reports',
 ]
 
 # CORS settings
@@ -69,16 +83,29 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+
+    # Limites por cliente (histórico em PROTHEUS_THROTTLE_DIR, ver protheus/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'protheus.throttling.ClientRateThrottle',
+        'protheus.throttling.ClientScopedRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'cliente': os.environ.get('PROTHEUS_RATE_CLIENTE', '120/min'),
+        'consulta_pesada': os.environ.get('PROTHEUS_RATE_CONSULTA_PESADA', '10/min'),
+    },
 }
 
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'protheus.cache.StaleDataMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -113,16 +140,158 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     },
     'protheus': {
-        'ENGINE': 'django.db.backends.oracle',
-        'NAME': '192.168.0.12:1521/ORCL',
-        'USER': 'P11PROD',
-        'PASSWORD': 'P11PROD',
+        # Backend Oracle padrão sem a verificação de versão (core/oracle/base.py);
+        # o oracledb só é importado na primeira conexão
+        'ENGINE': 'core.oracle',
+        'NAME': '{}:{}/{}'.format(
+            os.environ.get('PROTHEUS_HOST', '192.168.0.12'),
+            os.environ.get('PROTHEUS_PORT', '1521'),
+            os.environ.get('PROTHEUS_NAME', 'ORCL'),
+        ),
+        'USER': os.environ.get('PROTHEUS_USER', 'P11PROD'),
+        'PASSWORD': os.environ.get('PROTHEUS_PASSWORD', 'P11PROD'),
+        'OPTIONS': {
+            # Cache de statements do cliente oracledb por conexão (padrão do driver: 20);
+            # as consultas usam binds nomeados e texto estável (ver in_filter)
+            'stmtcachesize': int(os.environ.get('PROTHEUS_STMT_CACHE_SIZE', 100)),
+        },
     },
 }
 
+# Réplica de leitura opcional (Active Data Guard ou cópia de relatórios): só é
+# definida com PROTHEUS_REPLICA_HOST; usuário, senha, porta e serviço caem nos
+# do banco principal quando não informados
+if os.environ.get('PROTHEUS_REPLICA_HOST'):
+    DATABASES['protheus_replica'] = {
+        **DATABASES['protheus'],
+        'NAME': '{}:{}/{}'.format(
+            os.environ['PROTHEUS_REPLICA_HOST'],
+            os.environ.get('PROTHEUS_REPLICA_PORT', os.environ.get('PROTHEUS_PORT', '1521')),
+            os.environ.get('PROTHEUS_REPLICA_NAME', os.environ.get('PROTHEUS_NAME', 'ORCL')),
+        ),
+        'USER': os.environ.get('PROTHEUS_REPLICA_USER', DATABASES['protheus']['USER']),
+        'PASSWORD': os.environ.get('PROTHEUS_REPLICA_PASSWORD', DATABASES['protheus']['PASSWORD']),
+        'OPTIONS': dict(DATABASES['protheus']['OPTIONS']),
+    }
+
+# Endpoints (ver protheus_cursor) atendidos pela réplica quando ela estiver saudável:
+# agregações e varreduras longas; consultas pequenas ficam no principal
+PROTHEUS_REPLICA_ENDPOINTS = set(env_list(
+    'PROTHEUS_REPLICA_ENDPOINTS',
+    'sales,stock_movements,movement_series,net_movements,balances,deliveries,'
+    'delivery_status,pending_deliveries,expiry,stock_catalog',
+))
+PROTHEUS_REPLICA_MAX_LAG = int(os.environ.get('PROTHEUS_REPLICA_MAX_LAG', 300))
+PROTHEUS_REPLICA_LAG_SQL = os.environ.get(
+    'PROTHEUS_REPLICA_LAG_SQL',
+    "SELECT VALUE FROM V$DATAGUARD_STATS WHERE NAME = 'apply lag'",
+)
+PROTHEUS_REPLICA_CHECK_INTERVAL = int(os.environ.get('PROTHEUS_REPLICA_CHECK_INTERVAL', 30))
+
 # Configuração para usar o banco Protheus como leitura
 DATABASE_ROUTERS = ['protheus.db_router.ProtheusRouter']
 
+# Cache compartilhado entre os workers (resultados de consultas Protheus)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'protheus': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+# Catálogo colunar de estoque gerado por `manage.py sync_stock_catalog`
+# (compartilhado entre os workers via mmap). Após PROTHEUS_CATALOG_MAX_AGE
+# segundos sem sincronização as consultas voltam a ir direto ao Oracle.
+PROTHEUS_CATALOG_DIR = BASE_DIR / 'var' / 'catalog'
+PROTHEUS_CATALOG_MAX_AGE = int(os.environ.get('PROTHEUS_CATALOG_MAX_AGE', 15 * 60))
+
+# Checkpoints de saldo (SB2 reconstruído em datas passadas) gerados por
+# `manage.py build_balance_checkpoints`, usados pelo "saldo em data"
+PROTHEUS_BALANCE_DIR = BASE_DIR / 'var' / 'balances'
+
+# Fotografias diárias do SB2 gravadas por `manage.py snapshot_stock` (diferença
+# de saldo entre datas): um arquivo completo a cada PROTHEUS_SNAPSHOT_FULL_EVERY
+# dias e, entre eles, só as chaves que mudaram
+PROTHEUS_SNAPSHOT_DIR = BASE_DIR / 'var' / 'snapshots'
+PROTHEUS_SNAPSHOT_FULL_EVERY = int(os.environ.get('PROTHEUS_SNAPSHOT_FULL_EVERY', 7))
+
+# Planos gravados pelo `manage.py explain_queries`
+PROTHEUS_EXPLAIN_DIR = BASE_DIR / 'var' / 'explain'
+
+# Relatórios pesados executados pelo `manage.py report_worker` (fila no SQLite)
+REPORTS_RESULT_DIR = BASE_DIR / 'var' / 'reports'
+REPORTS_RESULT_TTL = int(os.environ.get('REPORTS_RESULT_TTL', 24 * 60 * 60))
+# Espera antes de tentar de novo um job devolvido à fila (Oracle indisponível)
+REPORTS_RETRY_DELAY = int(os.environ.get('REPORTS_RETRY_DELAY', 60))
+
+# Aquecimento do cache (`manage.py warm_cache`, também disparado ao subir o gunicorn)
+PROTHEUS_WARMUP_CONCURRENCY = int(os.environ.get('PROTHEUS_WARMUP_CONCURRENCY', 2))
+
+# Controle de admissão das consultas ao Oracle (protheus/admission.py): no máximo
+# PROTHEUS_MAX_CONCURRENT_QUERIES consultas simultâneas somando todos os processos,
+# e um limite por endpoint. Sem vaga em PROTHEUS_QUERY_QUEUE_TIMEOUT segundos a
+# resposta vem do cache vencido (até PROTHEUS_STALE_TTL) ou é um 503.
+PROTHEUS_ADMISSION_ENABLED = env_bool('PROTHEUS_ADMISSION_ENABLED', True)
+PROTHEUS_ADMISSION_DIR = BASE_DIR / 'var' / 'admission'
+PROTHEUS_MAX_CONCURRENT_QUERIES = int(os.environ.get('PROTHEUS_MAX_CONCURRENT_QUERIES', 6))
+PROTHEUS_REPLICA_MAX_CONCURRENT_QUERIES = int(os.environ.get('PROTHEUS_REPLICA_MAX_CONCURRENT_QUERIES', 10))
+PROTHEUS_ENDPOINT_DEFAULT_LIMIT = int(os.environ.get('PROTHEUS_ENDPOINT_DEFAULT_LIMIT', 3))
+PROTHEUS_ENDPOINT_QUERY_LIMITS = {
+    # Varreduras de meses de SD1/SD2/SD3/SC9
+    'sales': 2,
+    'deliveries': 2,
+    'movement_series': 2,
+    'net_movements': 2,
+}
+PROTHEUS_QUERY_QUEUE_TIMEOUT = float(os.environ.get('PROTHEUS_QUERY_QUEUE_TIMEOUT', 15))
+PROTHEUS_STALE_TTL = int(os.environ.get('PROTHEUS_STALE_TTL', 24 * 60 * 60))
+PROTHEUS_RETRY_AFTER = int(os.environ.get('PROTHEUS_RETRY_AFTER', 30))
+
+# Histórico dos limites por cliente (protheus/throttling.py), fora do cache das
+# consultas: arquivos travados com flock, como as vagas de admissão
+PROTHEUS_THROTTLE_DIR = BASE_DIR / 'var' / 'throttle'
+
+# Tempo máximo de cada chamada ao Oracle (call_timeout do oracledb, em segundos)
+# nas requisições; relatórios e comandos em segundo plano usam
+# PROTHEUS_BACKGROUND_CALL_TIMEOUT. Ao estourar, a resposta vem do cache vencido
+# (marcada como stale) ou é um 503, e o worker é liberado.
+PROTHEUS_CALL_TIMEOUT = float(os.environ.get('PROTHEUS_CALL_TIMEOUT', 30))
+PROTHEUS_ENDPOINT_CALL_TIMEOUTS = {
+    # Agregações de meses de SD1/SD2/SD3
+    'sales': 45,
+    'movement_series': 45,
+}
+PROTHEUS_BACKGROUND_CALL_TIMEOUT = float(os.environ.get('PROTHEUS_BACKGROUND_CALL_TIMEOUT', 600))
+
+# Disjuntor por endpoint (protheus/breaker.py): PROTHEUS_BREAKER_THRESHOLD
+# estouros de tempo em PROTHEUS_BREAKER_WINDOW segundos suspendem as consultas
+# do endpoint por PROTHEUS_BREAKER_COOLDOWN segundos
+PROTHEUS_BREAKER_ENABLED = env_bool('PROTHEUS_BREAKER_ENABLED', True)
+PROTHEUS_BREAKER_THRESHOLD = int(os.environ.get('PROTHEUS_BREAKER_THRESHOLD', 3))
+PROTHEUS_BREAKER_WINDOW = int(os.environ.get('PROTHEUS_BREAKER_WINDOW', 300))
+PROTHEUS_BREAKER_COOLDOWN = int(os.environ.get('PROTHEUS_BREAKER_COOLDOWN', 120))
+
+# Métricas do Prometheus em GET /metrics (core/metrics.py), somadas entre os
+# processos pelos arquivos de PROMETHEUS_MULTIPROC_DIR. O prometheus_client lê a
+# variável de ambiente, por isso ela é definida aqui antes do primeiro import.
+METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', str(BASE_DIR / 'var' / 'metrics'))
+
+# Perfil de requisição sob demanda para staff (?_profile=1, core/profiling.py):
+# amostragem da pilha a cada PROFILING_INTERVAL segundos e os últimos
+# PROFILING_KEEP perfis de cada endpoint guardados em PROFILING_DIR
+PROFILING_ENABLED = env_bool('PROFILING_ENABLED', True)
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', 0.001))
+PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', 10))
+PROFILING_DIR = BASE_DIR / 'var' / 'profiles'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -168,3 +337,25 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Logs dos apps (o SQL completo das consultas sai em nível DEBUG)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'protheus': {
+            'handlers': ['console'],
+            'level': os.environ.get('PROTHEUS_LOG_LEVEL', 'INFO' if DEBUG else 'WARNING'),
+        },
+        'reports': {
+            'handlers': ['console'],
+            'level': os.environ.get('PROTHEUS_LOG_LEVEL', 'INFO' if DEBUG else 'WARNING'),
+        },
+    },
+}
@@ -6,11 +6,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 
     # path('api/v1/', include('uploads.urls')),
     path('api/v1/', include('protheus.urls')),
+    path('api/v1/', include('reports.urls')),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,108 @@
+# gunicorn.conf.py - CONFIGURAÇÃO DO GUNICORN (carregada automaticamente a partir deste diretório)
+#
+# Tudo ajustável por variável de ambiente (ou .env). Perfil padrão: workers
+# gthread (o tempo das requisições é quase todo espera no Oracle), reciclagem
+# por número de requisições e por memória (RSS).
+
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+# Métricas do Prometheus somadas entre os workers (ver core/metrics.py). O import
+# fica aqui, no master: feito dentro do child_exit ele pode ser interrompido por
+# outro SIGCHLD no meio
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(BASE_DIR, 'var', 'metrics'))
+from prometheus_client import multiprocess  # noqa: E402
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Processos: padrão 2 x CPUs + 1, limitado a 8 (cada worker abre suas sessões no Oracle)
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# "gthread" (WSGI, padrão) ou "uvicorn" (ASGI: core.asgi com workers assíncronos)
+if os.environ.get('GUNICORN_WORKER', 'gthread') == 'uvicorn':
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'core.wsgi:application'
+    worker_class = 'gthread'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Reciclagem: cada worker é substituído após N requisições (com jitter para não
+# reiniciarem todos juntos) ou ao passar de GUNICORN_MAX_RSS_MB de memória residente
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+max_rss_mb = int(os.environ.get('GUNICORN_MAX_RSS_MB', 512))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None  # vazio desliga o access log
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def current_rss_mb():
+    """
+    Memória residente atual do processo (MB); fora do Linux usa o pico (ru_maxrss)
+    """
+    try:
+        with open('/proc/self/statm') as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def post_request(worker, req, environ, resp):
+    """
+    Ao passar do limite de memória o worker termina a requisição atual e é
+    substituído pelo master (mesmo mecanismo do max_requests).
+    """
+    if not max_rss_mb or not worker.alive:
+        return
+    rss = current_rss_mb()
+    if rss > max_rss_mb:
+        worker.log.warning(f"Worker {worker.pid} com {rss:.0f} MB (limite {max_rss_mb} MB): reciclando")
+        worker.alive = False
+
+
+def on_starting(server):
+    """
+    Começa as métricas do zero: arquivos de workers de uma execução anterior
+    seriam somados para sempre no /metrics
+    """
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """
+    Worker encerrado (reciclado ou morto): os gauges dele deixam de contar
+    """
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """
+    Ao subir o master, aquece o cache compartilhado em segundo plano (um único
+    processo para todos os workers) para o primeiro acesso não pegar cache frio.
+    """
+    if os.environ.get('PROTHEUS_WARMUP_ON_BOOT', '1') != '1':
+        return
+
+    subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, 'manage.py'), 'warm_cache'],
+        cwd=BASE_DIR,
+    )
+    server.log.info("warm_cache iniciado em segundo plano")
@@ -0,0 +1,284 @@
+# protheus/admission.py - CONTROLE DE ADMISSÃO DAS CONSULTAS AO ORACLE
+#
+# Limita quantas consultas rodam ao mesmo tempo no banco de produção, somando
+# todos os workers do gunicorn, o report_worker e o warm_cache: um limite global
+# e um por endpoint. Cada vaga é um arquivo em PROTHEUS_ADMISSION_DIR travado com
+# flock; a trava é do descritor aberto, então vale entre threads e processos e é
+# liberada pelo sistema se o processo morrer no meio da consulta.
+#
+# Cada consulta também tem um tempo máximo no Oracle (call_timeout do oracledb,
+# por endpoint) e passa pelo disjuntor do endpoint (ver breaker.py).
+
+import fcntl
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from core import metrics, profiling
+from protheus import breaker
+from protheus.explain import wrap_cursor
+from protheus.replica import PRIMARY, database_for
+
+logger = logging.getLogger(__name__)
+
+_held = threading.local()
+
+# Erros de estouro do call_timeout: modo thin, modo thick e cancelamento da chamada
+CALL_TIMEOUT_ERRORS = ('DPY-4024', 'DPI-1067', 'ORA-03156', 'ORA-01013')
+
+
+class QueryUnavailable(Exception):
+    """
+    O Oracle não atendeu a consulta (sem vaga, estouro de tempo ou disjuntor
+    aberto); ``cached_result`` responde com o cache vencido, se houver
+    """
+    reason = None
+    retry_after = None
+
+
+class QueryRejected(QueryUnavailable):
+    """
+    Sem vaga para consultar o Oracle dentro do tempo de espera
+    """
+    reason = 'sem_vaga'
+
+    def __init__(self, endpoint, waited):
+        self.endpoint = endpoint
+        self.waited = waited
+        super().__init__(f"Banco Protheus sobrecarregado: sem vaga para '{endpoint}' após {waited:.1f}s")
+
+
+class QueryTimeout(QueryUnavailable):
+    """
+    A consulta passou do call_timeout do endpoint
+    """
+    reason = 'tempo_esgotado'
+
+    def __init__(self, endpoint, seconds):
+        self.endpoint = endpoint
+        self.seconds = seconds
+        super().__init__(f"Banco Protheus lento: consulta '{endpoint}' passou de {seconds:.0f}s")
+
+
+class CircuitOpen(QueryUnavailable):
+    """
+    Disjuntor do endpoint aberto após estouros de tempo seguidos (ver breaker.py)
+    """
+    reason = 'disjuntor_aberto'
+
+    def __init__(self, endpoint, retry_in):
+        self.endpoint = endpoint
+        self.retry_after = max(math.ceil(retry_in), 1)
+        super().__init__(
+            f"Banco Protheus lento: consultas '{endpoint}' suspensas por mais {self.retry_after}s"
+        )
+
+
+def endpoint_limit(endpoint):
+    return settings.PROTHEUS_ENDPOINT_QUERY_LIMITS.get(endpoint, settings.PROTHEUS_ENDPOINT_DEFAULT_LIMIT)
+
+
+def global_limit(database):
+    if database == PRIMARY:
+        return settings.PROTHEUS_MAX_CONCURRENT_QUERIES
+    return settings.PROTHEUS_REPLICA_MAX_CONCURRENT_QUERIES
+
+
+def _try_slot(pool, limit):
+    """
+    Trava a primeira vaga livre de ``pool``; retorna o descritor ou None
+    """
+    directory = Path(settings.PROTHEUS_ADMISSION_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Começa em uma vaga diferente por processo/thread para não disputarem sempre a primeira
+    offset = (os.getpid() + threading.get_ident()) % limit
+    for i in range(limit):
+        fd = os.open(directory / f'{pool}.{(offset + i) % limit}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _acquire(pool, limit, deadline):
+    delay = 0.02
+    while True:
+        fd = _try_slot(pool, limit)
+        if fd is not None:
+            return fd
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, 0.5)
+
+
+def _release(fd):
+    # Fechar o descritor libera a trava
+    os.close(fd)
+
+
+@contextmanager
+def admission(endpoint, timeout=None, database=PRIMARY):
+    """
+    Reserva uma vaga do endpoint e uma vaga global enquanto o bloco executa.
+    Cada banco (principal e réplica) tem as próprias vagas.
+
+    Espera até ``timeout`` segundos (padrão PROTHEUS_QUERY_QUEUE_TIMEOUT) e então
+    levanta QueryRejected. Chamadas aninhadas na mesma thread reaproveitam a vaga
+    já reservada.
+    """
+    if not settings.PROTHEUS_ADMISSION_ENABLED or getattr(_held, 'depth', 0):
+        _held.depth = getattr(_held, 'depth', 0) + 1
+        try:
+            yield
+        finally:
+            _held.depth -= 1
+        return
+
+    timeout = settings.PROTHEUS_QUERY_QUEUE_TIMEOUT if timeout is None else timeout
+    started = time.monotonic()
+    deadline = started + timeout
+
+    pool_prefix = '' if database == PRIMARY else f'{database}-'
+    endpoint_fd = _acquire(f'{pool_prefix}endpoint-{endpoint}', endpoint_limit(endpoint), deadline)
+    if endpoint_fd is None:
+        metrics.record_unavailable(endpoint, QueryRejected.reason)
+        raise QueryRejected(endpoint, time.monotonic() - started)
+
+    global_fd = _acquire(f'{pool_prefix}global', global_limit(database), deadline)
+    if global_fd is None:
+        _release(endpoint_fd)
+        metrics.record_unavailable(endpoint, QueryRejected.reason)
+        raise QueryRejected(endpoint, time.monotonic() - started)
+
+    waited = time.monotonic() - started
+    if waited > 1:
+        logger.info(f"Consulta '{endpoint}' aguardou {waited:.1f}s na fila do Oracle")
+    metrics.record_admission(database, waited=waited)
+
+    _held.depth = 1
+    try:
+        yield
+    finally:
+        _held.depth = 0
+        _release(global_fd)
+        _release(endpoint_fd)
+        metrics.record_admission(database, delta=-1)
+
+
+def query_call_timeout(endpoint):
+    """
+    Tempo máximo (segundos) de cada chamada ao Oracle do endpoint
+    """
+    override = getattr(_held, 'call_timeout', None)
+    if override is not None:
+        return override
+    return settings.PROTHEUS_ENDPOINT_CALL_TIMEOUTS.get(endpoint, settings.PROTHEUS_CALL_TIMEOUT)
+
+
+@contextmanager
+def call_timeout(seconds):
+    """
+    Troca o tempo máximo das consultas feitas nesta thread (relatórios e comandos
+    em segundo plano, que não seguram uma requisição)
+    """
+    previous = getattr(_held, 'call_timeout', None)
+    _held.call_timeout = seconds
+    try:
+        yield
+    finally:
+        _held.call_timeout = previous
+
+
+def is_call_timeout(error):
+    return any(code in str(error) for code in CALL_TIMEOUT_ERRORS)
+
+
+def _set_call_timeout(raw_connection, seconds):
+    """
+    Define o call_timeout (ms) da conexão oracledb e devolve o anterior (None
+    para bancos sem call_timeout, como o SQLite dos testes locais)
+    """
+    previous = getattr(raw_connection, 'call_timeout', None)
+    if previous is not None:
+        raw_connection.call_timeout = int(seconds * 1000)
+    return previous
+
+
+@contextmanager
+def oracle_session(endpoint, database=PRIMARY, timeout=None, method=None):
+    """
+    Conexão de ``database`` pronta para consultar ``endpoint``: disjuntor
+    consultado antes (CircuitOpen), vaga reservada (``admission``) e cada chamada
+    ao Oracle limitada a ``query_call_timeout(endpoint)`` segundos. Um estouro de
+    tempo descarta a sessão, conta no disjuntor e vira QueryTimeout.
+
+    Usada pelo ``protheus_cursor`` e pelas listagens via ORM.
+    """
+    retry_in = breaker.check(endpoint)
+    if retry_in is not None:
+        metrics.record_unavailable(endpoint, CircuitOpen.reason)
+        raise CircuitOpen(endpoint, retry_in)
+
+    seconds = query_call_timeout(endpoint)
+    with admission(endpoint, timeout=timeout, database=database):
+        connection = connections[database]
+        try:
+            connection.ensure_connection()
+            previous = _set_call_timeout(connection.connection, seconds)
+            try:
+                yield connection
+            finally:
+                if previous is not None and connection.connection is not None:
+                    connection.connection.call_timeout = previous
+        except DatabaseError as e:
+            if not is_call_timeout(e):
+                raise
+            logger.warning(f"Consulta '{endpoint}' ({method or '?'}) interrompida após {seconds:.0f}s: {e}")
+            # A sessão interrompida é descartada; a próxima consulta abre outra
+            connection.close()
+            breaker.record_timeout(endpoint)
+            metrics.record_unavailable(endpoint, QueryTimeout.reason)
+            raise QueryTimeout(endpoint, seconds) from e
+
+    breaker.record_success(endpoint)
+
+
+@contextmanager
+def protheus_cursor(endpoint, timeout=None):
+    """
+    Cursor do banco Protheus aberto somente com vaga reservada (ver ``admission``),
+    no principal ou na réplica de leitura conforme o endpoint (ver ``replica``).
+    Dentro de ``explain.capturing_plans()`` as consultas só têm o plano capturado.
+
+    Disjuntor e tempo máximo de cada chamada ao Oracle como em ``oracle_session``
+    (CircuitOpen / QueryTimeout).
+
+    O tempo do bloco (consulta e leitura das linhas, sem a espera por vaga) vai
+    para a métrica ``protheus_query_duration_seconds`` e para o perfil da
+    requisição (``core.profiling``) com o nome do método que abriu o cursor.
+    """
+    # Quadro 0: este gerador; 1: __enter__ do contextmanager; 2: quem abriu o cursor
+    method = sys._getframe(2).f_code.co_name
+
+    database = database_for(endpoint)
+    with oracle_session(endpoint, database, timeout=timeout, method=method) as connection:
+        with connection.cursor() as cursor:
+            started = time.perf_counter()
+            try:
+                yield wrap_cursor(endpoint, cursor)
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.record_query(method, database, elapsed)
+                profiling.add_phase(f'oracle:{method}', elapsed)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProtheusConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'protheus'
+
+    def ready(self):
+        from protheus import lookups  # noqa: F401 - registra o lookup __charprefix
@@ -0,0 +1,97 @@
+# protheus/arrow.py - LEITURA DO ORACLE DIRETO EM COLUNAS ARROW
+#
+# O ``fetch_df_all`` do python-oracledb 3.x devolve o resultado já em colunas
+# Arrow, sem criar uma tupla por linha nem um objeto Python por valor. As funções
+# abaixo levam essas colunas para arrays numpy (strings de largura fixa, floats,
+# datas) também sem passar por objetos Python, para os caminhos de volume:
+# catálogo de estoque e reconstrução de saldos.
+
+from core.lazy import lazy_import
+from protheus.explain import ExplainCursor
+
+np = lazy_import('numpy')
+pa = lazy_import('pyarrow')
+pc = lazy_import('pyarrow.compute')
+
+# Linhas por ida ao banco no fetch_df_all
+ARROW_ARRAYSIZE = 10000
+
+
+def oracle_binds(connection, sql, params):
+    """
+    SQL com binds no formato do Django (``%(nome)s``) para o formato do oracledb
+    (``:nome``), convertendo listas em coleção (StringArrayParam)
+    """
+    params = params or {}
+    binds = {}
+    for name, value in params.items():
+        to_oracle = getattr(value, 'to_oracle', None)
+        binds[name] = to_oracle(connection) if to_oracle else value
+    return sql % {name: f':{name}' for name in params}, binds
+
+
+def fetch_arrow(cursor, sql, params=None, arraysize=ARROW_ARRAYSIZE):
+    """
+    Executa ``sql`` na conexão do cursor (ver ``protheus_cursor``) e retorna uma
+    ``pyarrow.Table`` com as colunas em minúsculas
+    """
+    if isinstance(cursor, ExplainCursor):
+        # explain_queries: só o plano é capturado
+        cursor.execute(sql, params)
+        return pa.table({})
+
+    connection = cursor.db.connection
+    statement, binds = oracle_binds(connection, sql, params)
+    frame = connection.fetch_df_all(statement=statement, parameters=binds, arraysize=arraysize)
+    return pa.Table.from_arrays(
+        frame.column_arrays(),
+        names=[name.lower() for name in frame.column_names()],
+    )
+
+
+def fixed_bytes(column, strip=True):
+    """
+    Coluna de texto Arrow -> array numpy ``S<n>`` (UTF-8, largura da maior string),
+    montado direto dos buffers de offsets/dados. Nulos viram b''.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if strip:
+        column = pc.utf8_trim_whitespace(column)
+    column = pc.fill_null(column.cast(pa.large_binary()), b'')
+
+    n = len(column)
+    if n == 0:
+        return np.array([], dtype='S1')
+
+    _, offsets_buffer, data_buffer = column.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64)[column.offset:column.offset + n + 1]
+    lengths = np.diff(offsets)
+    width = max(int(lengths.max()), 1)
+
+    out = np.zeros((n, width), dtype=np.uint8)
+    total = int(lengths.sum())
+    if total:
+        data = np.frombuffer(data_buffer, dtype=np.uint8)[offsets[0]:offsets[-1]]
+        rows = np.repeat(np.arange(n), lengths)
+        positions = np.arange(total) - np.repeat(offsets[:-1] - offsets[0], lengths)
+        out[rows, positions] = data
+    return out.view(f'S{width}').reshape(n)
+
+
+def floats(column):
+    """
+    Coluna numérica Arrow (NUMBER) -> float64, nulos como 0
+    """
+    return pc.fill_null(column.cast(pa.float64()), 0.0).to_numpy()
+
+
+def days(column):
+    """
+    Coluna de datas ISO (texto) ou DATE -> número de dias desde 1970-01-01
+    """
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        column = column.cast(pa.date32())
+    else:
+        column = column.cast(pa.timestamp('s')).cast(pa.date32())
+    return column.cast(pa.int32()).to_numpy().astype(np.int64)
@@ -0,0 +1,201 @@
+# protheus/atp.py - DISPONÍVEL PARA PROMESSA (ATP) POR FILIAL
+#
+# Para cada filial|produto|local:
+#
+#   livre           = B2_QATU - B2_RESERVA (a reserva já inclui as liberações SC9
+#                     pendentes de faturamento)
+#   carteira        = SC6 em aberto ainda não liberado, por data de entrega
+#                     (entregas atrasadas contam como hoje)
+#   projetado(d)    = livre - carteira acumulada até d
+#   disponível hoje = projetado(hoje)
+#   prometível      = menor projetado do horizonte (sem entradas previstas, o
+#                     último: livre - carteira total)
+#   falta em        = primeiro dia com projetado < 0
+#
+# A filial inteira vem de uma consulta (``fetch_atp_positions_arrow``) e é
+# calculada numa passada vetorizada. O resultado fica em colunas numpy ordenadas
+# pela chave, e o perfil de cada chave é o intervalo ``starts[i]:starts[i + 1]``
+# dos vetores de demanda. Cada worker guarda a última versão de cada filial (e o
+# cache compartilhado a dos demais), então consultar um produto é uma busca
+# binária nas chaves.
+
+import datetime
+import logging
+import time
+
+from core.lazy import lazy_import
+from protheus import arrow
+from protheus.balances import _keys, _match, split_key
+from protheus.cache import cached_result
+from protheus.services import ProtheusService
+
+np = lazy_import('numpy')
+pa = lazy_import('pyarrow')
+
+logger = logging.getLogger(__name__)
+
+# Tempo (s) que o ATP de uma filial vale (por worker e no cache compartilhado)
+ATP_CACHE_TIMEOUT = 120
+
+EPOCH = datetime.date(1970, 1, 1)
+
+COLUMNS = ('on_hand', 'reserved', 'released', 'backlog', 'free', 'available_now', 'promisable')
+
+
+def _iso(days):
+    return (EPOCH + datetime.timedelta(days=int(days))).isoformat()
+
+
+class AvailableToPromise:
+    """
+    ATP de uma filial em colunas (ver o topo do módulo)
+    """
+
+    # Última versão por filial neste processo
+    _memo = {}
+
+    def __init__(self, filial, keys, columns, shortage, starts, demand_days, demand, projected):
+        self.filial = filial
+        self.keys = keys
+        self.columns = columns
+        self.shortage = shortage
+        self.starts = starts
+        self.demand_days = demand_days
+        self.demand = demand
+        self.projected = projected
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def age(self):
+        return time.time() - self.built_at
+
+    @classmethod
+    def current(cls, filial, refresh=False):
+        """
+        ATP da filial: a versão deste processo, a do cache compartilhado ou uma
+        nova consulta ao Oracle, nessa ordem
+        """
+        atp = cls._memo.get(filial)
+        if atp is None or refresh or atp.age > ATP_CACHE_TIMEOUT:
+            atp = cached_result('atp', cls.build, timeout=ATP_CACHE_TIMEOUT, refresh=refresh, filial=filial)
+            cls._memo[filial] = atp
+        return atp
+
+    @classmethod
+    def build(cls, filial):
+        """
+        Calcula o ATP da filial inteira a partir das posições do Oracle
+        """
+        table = ProtheusService.fetch_atp_positions_arrow(filial)
+        today = (datetime.date.today() - EPOCH).days
+
+        keys = _keys(table)
+        if len(keys):
+            unique, inverse = np.unique(keys, return_inverse=True)
+        else:
+            unique, inverse = keys, np.array([], dtype=np.int64)
+        n = len(unique)
+
+        def total(values, index=inverse):
+            return np.bincount(index, weights=values, minlength=n)
+
+        on_hand = total(arrow.floats(table['on_hand']))
+        reserved = total(arrow.floats(table['reserved']))
+        released = total(arrow.floats(table['released']))
+        free = on_hand - reserved
+
+        # Demanda: linhas com dia de entrega, ordenadas por chave e dia
+        backlog_rows = arrow.floats(table['backlog'])
+        is_demand = np.asarray(table['day'].is_valid()) & (backlog_rows > 0) if n else np.zeros(0, dtype=bool)
+        demand_key = inverse[is_demand]
+        demand = backlog_rows[is_demand]
+        demand_days = (
+            arrow.days(table['day'].filter(pa.array(is_demand))) if is_demand.any()
+            else np.array([], dtype=np.int64)
+        )
+        order = np.lexsort((demand_days, demand_key))
+        demand_key, demand, demand_days = demand_key[order], demand[order], demand_days[order]
+        if len(demand):
+            # Um ponto por chave e dia
+            first = np.flatnonzero(np.r_[True, (np.diff(demand_key) != 0) | (np.diff(demand_days) != 0)])
+            demand = np.add.reduceat(demand, first)
+            demand_key, demand_days = demand_key[first], demand_days[first]
+        starts = np.searchsorted(demand_key, np.arange(n + 1))
+
+        # Carteira acumulada dentro de cada chave
+        cumulative = np.cumsum(demand)
+        before_key = np.r_[0.0, cumulative][starts[:-1]]
+        projected = free[demand_key] - (cumulative - before_key[demand_key])
+
+        backlog = total(demand, demand_key)
+        due_today = demand_days == today
+        available_now = free - total(demand[due_today], demand_key[due_today])
+        promisable = free - backlog
+
+        # Primeiro dia com projetado negativo (reserva acima do saldo: hoje)
+        shortage = np.full(n, -1, dtype=np.int64)
+        negative = np.flatnonzero(projected < 0)
+        if len(negative):
+            short_keys, first = np.unique(demand_key[negative], return_index=True)
+            shortage[short_keys] = demand_days[negative[first]]
+        shortage[free < 0] = today
+
+        columns = {
+            'on_hand': on_hand,
+            'reserved': reserved,
+            'released': released,
+            'backlog': backlog,
+            'free': free,
+            'available_now': available_now,
+            'promisable': promisable,
+        }
+        logger.info(f"ATP filial {filial}: {n} chaves, {len(demand)} entregas em carteira")
+        return cls(filial, unique, columns, shortage, starts, demand_days, demand, projected)
+
+    def find(self, code=None, local=None, shortage_only=False):
+        """
+        Índices das chaves (ordenadas) dos produtos ``code`` - busca binária pelo
+        prefixo ``filial|produto|`` - ou de todas, filtradas por ``local``
+        """
+        if code:
+            codes = [code] if isinstance(code, str) else code
+            ranges = []
+            for value in codes:
+                prefix = f'{self.filial}|{value.strip()}|'.encode('utf-8')
+                lo = int(np.searchsorted(self.keys, prefix, side='left'))
+                hi = int(np.searchsorted(self.keys, prefix + b'\xff', side='left'))
+                ranges.append(np.arange(lo, hi))
+            indices = np.unique(np.concatenate(ranges)) if ranges else np.array([], dtype=np.int64)
+        else:
+            indices = np.arange(len(self.keys))
+
+        if local:
+            indices = indices[_match(self.keys[indices], local=local)]
+        if shortage_only:
+            indices = indices[self.shortage[indices] >= 0]
+        return indices
+
+    def rows(self, indices):
+        """
+        Linhas da API com o perfil de disponibilidade por dia de entrega
+        """
+        rows = []
+        for i in np.asarray(indices).tolist():
+            start, end = int(self.starts[i]), int(self.starts[i + 1])
+            row = split_key(self.keys[i])
+            for name in COLUMNS:
+                row[name] = float(self.columns[name][i])
+            row['shortage_date'] = _iso(self.shortage[i]) if self.shortage[i] >= 0 else None
+            row['profile'] = [
+                {'date': _iso(day), 'demand': demand, 'projected': projected}
+                for day, demand, projected in zip(
+                    self.demand_days[start:end].tolist(),
+                    self.demand[start:end].tolist(),
+                    self.projected[start:end].tolist(),
+                )
+            ]
+            rows.append(row)
+        return rows
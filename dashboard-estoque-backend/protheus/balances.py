@@ -0,0 +1,290 @@
+# protheus/balances.py - SALDO EM DATA (RECONSTRUÇÃO DO SB2 POR REPLAY DAS MOVIMENTAÇÕES)
+
+import datetime
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+from core.lazy import lazy_import
+from protheus import arrow
+from protheus.services import ProtheusService
+
+np = lazy_import('numpy')
+pc = lazy_import('pyarrow.compute')
+
+logger = logging.getLogger(__name__)
+
+KEY_SEPARATOR = b'|'
+
+
+def _keys(table):
+    """
+    Chaves ``filial|produto|local`` (bytes) das colunas Arrow (filial, code, local),
+    montadas sem criar objetos Python por linha
+    """
+    if table.num_rows == 0:
+        return np.array([], dtype='S1')
+    joined = pc.binary_join_element_wise(
+        pc.utf8_trim_whitespace(table['filial']),
+        pc.utf8_trim_whitespace(table['code']),
+        pc.utf8_trim_whitespace(table['local']),
+        KEY_SEPARATOR.decode(),
+        null_handling='replace',
+    )
+    return arrow.fixed_bytes(joined, strip=False)
+
+
+def _sum_by_key(keys, values):
+    """
+    Chaves únicas ordenadas e a soma dos valores por chave
+    """
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.zeros(len(unique), dtype=np.float64)
+    np.add.at(totals, inverse, values)
+    return unique, totals
+
+
+def _merge(base_keys, base_values, delta_keys, delta_values, sign=1):
+    """
+    ``base + sign * delta`` sobre a união das chaves (ambas ordenadas e únicas)
+    """
+    keys = np.union1d(base_keys, delta_keys)
+    values = np.zeros(len(keys), dtype=np.float64)
+    if len(base_keys):
+        values[np.searchsorted(keys, base_keys)] = base_values
+    if len(delta_keys):
+        values[np.searchsorted(keys, delta_keys)] += sign * delta_values
+    return keys, values
+
+
+def _match(keys, filial=None, local=None, code=None):
+    """
+    Máscara vetorizada dos filtros sobre as chaves ``filial|produto|local``
+    """
+    mask = np.ones(len(keys), dtype=bool)
+    if not len(keys) or not (filial or local or code):
+        return mask
+
+    parts = np.char.split(keys.astype(str), KEY_SEPARATOR.decode())
+    fields = np.array(parts.tolist(), dtype=str).reshape(len(keys), 3)
+    for column, values in ((0, filial), (1, code), (2, local)):
+        if values:
+            if isinstance(values, str):
+                values = [values]
+            mask &= np.isin(fields[:, column], [v.strip() for v in values])
+    return mask
+
+
+def split_key(key):
+    filial, code, local = key.decode('utf-8').split(KEY_SEPARATOR.decode())
+    return {'filial': filial, 'code': code, 'local': local}
+
+
+class BalanceHistory:
+    """
+    Saldo de estoque em datas passadas.
+
+    O SB2 só guarda o saldo atual (B2_QATU); o saldo no fim do dia D é obtido a
+    partir de uma âncora conhecida (saldo atual ou um checkpoint gravado em disco)
+    somando/subtraindo a movimentação líquida (SD3 + SD1/SD2 que atualizam estoque)
+    entre D e a âncora. Com checkpoints periódicos qualquer data é resolvida
+    replicando no máximo meio intervalo de movimentação.
+    """
+
+    @staticmethod
+    def directory():
+        return Path(settings.PROTHEUS_BALANCE_DIR)
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def checkpoints(cls):
+        """
+        Datas com checkpoint gravado (ordenadas)
+        """
+        directory = cls.directory()
+        if not directory.exists():
+            return []
+        dates = []
+        for path in directory.glob('saldo_*.npz'):
+            try:
+                dates.append(datetime.date.fromisoformat(path.stem[len('saldo_'):]))
+            except ValueError:
+                continue
+        return sorted(dates)
+
+    @classmethod
+    def load_checkpoint(cls, date):
+        with np.load(cls.directory() / f'saldo_{date.isoformat()}.npz') as data:
+            return data['keys'], data['balance']
+
+    @classmethod
+    def save_checkpoint(cls, date, keys, balance):
+        directory = cls.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f'saldo_{date.isoformat()}.npz'
+        tmp_path = directory / f'.saldo_{date.isoformat()}.tmp.npz'
+        np.savez_compressed(tmp_path, keys=keys, balance=balance)
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def prune(cls, keep_after):
+        for date in cls.checkpoints():
+            if date < keep_after:
+                (cls.directory() / f'saldo_{date.isoformat()}.npz').unlink(missing_ok=True)
+
+    @classmethod
+    def build_checkpoints(cls, dates):
+        """
+        Gera checkpoints para ``dates`` com um único replay reverso: saldo atual
+        menos a movimentação acumulada de cada dia, do mais recente ao mais antigo.
+        """
+        today = datetime.date.today()
+        dates = sorted({d for d in dates if d < today}, reverse=True)
+        if not dates:
+            return []
+
+        current = ProtheusService.get_current_balances(as_arrow=True)
+        keys, balance = _sum_by_key(_keys(current), arrow.floats(current['balance']))
+
+        movements = ProtheusService.get_net_movements(
+            dates[-1].isoformat(), today.isoformat(), by_day=True, as_arrow=True
+        )
+        movement_keys, movement_days, movement_qty = _daily_columns(movements)
+
+        # Mais recente primeiro: cada checkpoint desfaz só os dias até o anterior
+        order = np.argsort(movement_days, kind='stable')[::-1]
+        movement_keys = movement_keys[order]
+        movement_qty = movement_qty[order]
+        negated_days = -movement_days[order]
+
+        written = []
+        position = 0
+        for date in dates:
+            # Movimentos com dia > date (negated_days está em ordem crescente)
+            end = int(np.searchsorted(negated_days, -np.datetime64(date, 'D').astype(np.int64), side='left'))
+            if end > position:
+                delta_keys, delta = _sum_by_key(movement_keys[position:end], movement_qty[position:end])
+                keys, balance = _merge(keys, balance, delta_keys, delta, sign=-1)
+            position = end
+
+            cls.save_checkpoint(date, keys, balance)
+            written.append(date)
+            logger.info(f"Checkpoint de saldo {date}: {len(keys)} chaves")
+
+        return written
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def anchor_for(cls, date):
+        """
+        Âncora mais próxima de ``date``: um checkpoint ou None (saldo atual)
+        """
+        today = datetime.date.today()
+        best, distance = None, (today - date).days
+        for checkpoint in cls.checkpoints():
+            if abs((checkpoint - date).days) < distance:
+                best, distance = checkpoint, abs((checkpoint - date).days)
+        return best
+
+    @classmethod
+    def balances_at(cls, date, filial=None, local=None, code=None):
+        """
+        Saldo no fim do dia ``date`` por filial/produto/local.
+
+        Retorna (chaves ordenadas, saldos, âncora usada).
+        """
+        today = datetime.date.today()
+        if date > today:
+            date = today
+
+        anchor = cls.anchor_for(date)
+        if anchor is None:
+            current = ProtheusService.get_current_balances(filial=filial, local=local, code=code, as_arrow=True)
+            keys, balance = _sum_by_key(_keys(current), arrow.floats(current['balance']))
+            anchor_date = today
+        else:
+            keys, balance = cls.load_checkpoint(anchor)
+            mask = _match(keys, filial=filial, local=local, code=code)
+            keys, balance = keys[mask], balance[mask]
+            anchor_date = anchor
+
+        if anchor_date != date:
+            start, end = sorted((date, anchor_date))
+            movements = ProtheusService.get_net_movements(
+                start.isoformat(), end.isoformat(), filial=filial, local=local, code=code, as_arrow=True
+            )
+            delta_keys, delta = _sum_by_key(_keys(movements), arrow.floats(movements['quantity']))
+            # Âncora depois da data: desfaz a movimentação; antes: aplica
+            keys, balance = _merge(keys, balance, delta_keys, delta, sign=-1 if anchor_date > date else 1)
+
+        return keys, balance, anchor
+
+    @classmethod
+    def daily_series(cls, start, end, filial=None, local=None, code=None):
+        """
+        Saldo diário de ``start`` a ``end``: saldo inicial + soma acumulada da
+        movimentação por chave. Retorna, por chave, apenas os dias em que o saldo
+        muda (série em degraus), precedidos do saldo em ``start``.
+        """
+        keys, balance, anchor = cls.balances_at(start, filial=filial, local=local, code=code)
+
+        movements = ProtheusService.get_net_movements(
+            start.isoformat(), end.isoformat(), filial=filial, local=local, code=code, by_day=True, as_arrow=True
+        )
+        movement_keys, movement_days, movement_qty = _daily_columns(movements)
+
+        # Ordena por chave + dia e acumula dentro de cada chave
+        order = np.lexsort((movement_days, movement_keys))
+        movement_keys = movement_keys[order]
+        movement_days = movement_days[order]
+        movement_qty = movement_qty[order]
+
+        all_keys = np.union1d(keys, movement_keys)
+        initial = np.zeros(len(all_keys), dtype=np.float64)
+        if len(keys):
+            initial[np.searchsorted(all_keys, keys)] = balance
+
+        running = np.empty(0, dtype=np.float64)
+        boundaries = np.empty(0, dtype=np.int64)
+        if len(movement_keys):
+            new_group = np.r_[True, movement_keys[1:] != movement_keys[:-1]]
+            group_id = np.cumsum(new_group) - 1
+            cumulative = np.cumsum(movement_qty)
+            group_offset = (cumulative - movement_qty)[new_group]
+            running = cumulative - group_offset[group_id] + initial[np.searchsorted(all_keys, movement_keys)]
+            boundaries = np.flatnonzero(new_group)
+
+        # Séries por chave (chaves sem movimento ficam só com o saldo inicial)
+        moved = dict(zip(movement_keys[boundaries].tolist(), np.r_[boundaries, len(movement_keys)][1:].tolist()))
+        starts = dict(zip(movement_keys[boundaries].tolist(), boundaries.tolist()))
+
+        results = []
+        for i, key in enumerate(all_keys.tolist()):
+            points = [{'date': start.isoformat(), 'balance': float(initial[i]), 'movement': 0.0}]
+            if key in starts:
+                for j in range(starts[key], moved[key]):
+                    points.append({
+                        'date': str(movement_days[j].astype('datetime64[D]')),
+                        'balance': float(running[j]),
+                        'movement': float(movement_qty[j]),
+                    })
+            results.append({**split_key(key), 'series': points})
+
+        return results, anchor
+
+
+def _daily_columns(movements):
+    """
+    Colunas (chaves, dia como número de dias, quantidade) da movimentação por dia
+    """
+    if movements.num_rows == 0:
+        return np.array([], dtype='S1'), np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+    return _keys(movements), arrow.days(movements['day']), arrow.floats(movements['quantity'])
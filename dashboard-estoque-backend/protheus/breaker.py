@@ -0,0 +1,94 @@
+# protheus/breaker.py - DISJUNTOR (CIRCUIT BREAKER) POR CLASSE DE CONSULTA
+#
+# Cada endpoint do protheus_cursor (sales, deliveries, ...) tem um disjuntor no
+# cache compartilhado, válido para todos os workers. Depois de
+# PROTHEUS_BREAKER_THRESHOLD estouros de call_timeout em PROTHEUS_BREAKER_WINDOW
+# segundos o disjuntor abre: por PROTHEUS_BREAKER_COOLDOWN segundos as consultas
+# daquele endpoint nem vão ao Oracle (CircuitOpen) e a resposta sai do cache
+# vencido. Passado esse tempo uma única consulta de teste é liberada; se ela
+# terminar o disjuntor fecha, se estourar o tempo de novo ele volta a abrir.
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+def _key(endpoint):
+    return f'protheus:breaker:{endpoint}'
+
+
+def _cache():
+    return caches['protheus']
+
+
+def check(endpoint):
+    """
+    Segundos até o disjuntor de ``endpoint`` fechar, ou None se a consulta pode
+    seguir (fechado, ou meio-aberto e esta é a consulta de teste)
+    """
+    if not settings.PROTHEUS_BREAKER_ENABLED:
+        return None
+
+    cache = _cache()
+    state = cache.get(_key(endpoint))
+    if not state or not state.get('opened_until'):
+        return None
+
+    remaining = state['opened_until'] - time.time()
+    if remaining > 0:
+        return remaining
+
+    # Meio-aberto: só quem criar a chave de teste consulta o Oracle
+    if cache.add(f'{_key(endpoint)}:probe', True, settings.PROTHEUS_BREAKER_COOLDOWN):
+        logger.info(f"Disjuntor '{endpoint}': consulta de teste liberada")
+        return None
+    return settings.PROTHEUS_BREAKER_COOLDOWN
+
+
+def record_timeout(endpoint):
+    """
+    Conta um estouro de tempo; abre o disjuntor ao atingir o limite (ou de
+    imediato se a consulta de teste do meio-aberto estourou)
+    """
+    if not settings.PROTHEUS_BREAKER_ENABLED:
+        return
+
+    cache = _cache()
+    now = time.time()
+    state = cache.get(_key(endpoint)) or {'failures': [], 'opened_until': None}
+    failures = [t for t in state['failures'] if now - t < settings.PROTHEUS_BREAKER_WINDOW] + [now]
+
+    opened_until = None
+    if state.get('opened_until') or len(failures) >= settings.PROTHEUS_BREAKER_THRESHOLD:
+        opened_until = now + settings.PROTHEUS_BREAKER_COOLDOWN
+        logger.warning(
+            f"Disjuntor '{endpoint}' aberto por {settings.PROTHEUS_BREAKER_COOLDOWN}s: "
+            f"{len(failures)} estouros de tempo em {settings.PROTHEUS_BREAKER_WINDOW}s"
+        )
+
+    cache.set(
+        _key(endpoint),
+        {'failures': failures, 'opened_until': opened_until},
+        settings.PROTHEUS_BREAKER_WINDOW + settings.PROTHEUS_BREAKER_COOLDOWN,
+    )
+    cache.delete(f'{_key(endpoint)}:probe')
+
+
+def record_success(endpoint):
+    """
+    Consulta concluída: fecha o disjuntor (se havia falhas registradas)
+    """
+    if not settings.PROTHEUS_BREAKER_ENABLED:
+        return
+
+    cache = _cache()
+    state = cache.get(_key(endpoint))
+    if state is None:
+        return
+    if state.get('opened_until'):
+        logger.info(f"Disjuntor '{endpoint}' fechado")
+    cache.delete_many([_key(endpoint), f'{_key(endpoint)}:probe'])
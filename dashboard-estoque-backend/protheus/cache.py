@@ -0,0 +1,138 @@
+# protheus/cache.py - CACHE DE RESULTADOS DAS CONSULTAS PROTHEUS
+
+import datetime
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core import metrics
+from protheus.admission import QueryUnavailable
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'protheus'
+
+# Dados vencidos servidos na requisição atual (ver StaleDataMiddleware)
+_stale = threading.local()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def cache_key(namespace, **params):
+    """
+    Chave estável para (namespace, parâmetros); listas são normalizadas
+    """
+    normalized = []
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, (list, tuple, set)):
+            value = ','.join(sorted(str(v) for v in value))
+        normalized.append(f"{name}={value}")
+    digest = hashlib.md5('&'.join(normalized).encode('utf-8')).hexdigest()
+    return f"protheus:{namespace}:{digest}"
+
+
+def seconds_until_midnight():
+    now = datetime.datetime.now()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min)
+    return max(int((midnight - now).total_seconds()), 60)
+
+
+def cached_result(namespace, func, timeout=300, per_day=False, refresh=False, **params):
+    """
+    Retorna ``func(**params)`` do cache compartilhado entre os workers.
+
+    Com ``per_day=True`` o resultado vale até a meia-noite (a chave inclui a data),
+    útil para análises que dependem de SYSDATE em dias. Com ``refresh=True`` a
+    consulta é refeita e o cache sobrescrito (usado pelo ``warm_cache``).
+
+    Cada resultado também fica guardado por PROTHEUS_STALE_TTL segundos como cópia
+    "vencida": se o Oracle não atender a consulta (sem vaga, tempo esgotado ou
+    disjuntor aberto - ver ``QueryUnavailable``), ela é devolvida no lugar do erro
+    e a resposta sai marcada como ``stale`` (ver ``mark_stale``).
+    """
+    key_params = dict(params)
+    if per_day:
+        key_params['_day'] = datetime.date.today().isoformat()
+        timeout = seconds_until_midnight()
+
+    cache = get_cache()
+    key = cache_key(namespace, **key_params)
+    result = None if refresh else cache.get(key)
+    if result is not None:
+        logger.debug(f"Cache hit: {namespace}")
+        metrics.record_cache(namespace, 'hit')
+        return result
+
+    metrics.record_cache(namespace, 'refresh' if refresh else 'miss')
+    try:
+        result = func(**params)
+    except QueryUnavailable as e:
+        stale = cache.get(f"{key}:stale")
+        if stale is None or refresh:
+            raise
+        stored_at, result = stale
+        logger.warning(f"Oracle indisponível ({e.reason}): servindo {namespace} do cache vencido")
+        metrics.record_cache(namespace, 'stale')
+        mark_stale(stored_at, e.reason)
+        return result
+
+    cache.set(key, result, timeout)
+    cache.set(f"{key}:stale", (time.time(), result), max(settings.PROTHEUS_STALE_TTL, timeout))
+    return result
+
+
+def cached_value(namespace, **params):
+    """
+    Resultado já guardado por ``cached_result`` (sem ``per_day``) ou None
+    """
+    return get_cache().get(cache_key(namespace, **params))
+
+
+def mark_stale(stored_at, reason):
+    """
+    Marca a requisição atual como servida com dados vencidos; ``stored_at`` é o
+    instante (epoch) da última consulta bem-sucedida. Com mais de uma fonte
+    vencida vale a mais antiga.
+    """
+    current = getattr(_stale, 'info', None)
+    if current is None or stored_at < current[0]:
+        _stale.info = (stored_at, reason)
+
+
+class StaleDataMiddleware:
+    """
+    Respostas montadas com dados vencidos (ver ``cached_result``) recebem
+    ``stale``, ``stale_age`` (segundos) e ``stale_reason`` no corpo, quando ele é
+    um objeto, e os cabeçalhos ``X-Data-Stale``/``X-Data-Age``
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _stale.info = None
+        try:
+            response = self.get_response(request)
+        finally:
+            info, _stale.info = _stale.info, None
+        if info is not None:
+            response['X-Data-Stale'] = info[1]
+            response['X-Data-Age'] = str(int(time.time() - info[0]))
+        return response
+
+    def process_template_response(self, request, response):
+        # Antes da renderização: o corpo (response.data) ainda pode ser alterado
+        info = getattr(_stale, 'info', None)
+        if info is not None and isinstance(getattr(response, 'data', None), dict):
+            stored_at, reason = info
+            response.data['stale'] = True
+            response.data['stale_age'] = int(time.time() - stored_at)
+            response.data['stale_reason'] = reason
+        return response
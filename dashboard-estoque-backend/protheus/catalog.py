@@ -0,0 +1,284 @@
+# protheus/catalog.py - CATÁLOGO COLUNAR DE ESTOQUE (SB1/SB2) COMPARTILHADO ENTRE WORKERS
+
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from core.lazy import lazy_import
+from protheus import arrow
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'current.json'
+
+# Colunas gravadas em disco (uma por arquivo .npy)
+CATALOG_COLUMNS = (
+    'code',
+    'description_id',
+    'descriptions',
+    'filial_id',
+    'filiais',
+    'local_id',
+    'locais',
+    'balance',
+)
+
+
+def _intern(values):
+    """
+    Converte uma lista de strings em (tabela de strings únicas, índices por linha)
+    """
+    return _intern_bytes(np.array([(value or '').strip().encode('utf-8') for value in values]))
+
+
+def _intern_bytes(encoded):
+    """
+    Mesmo que ``_intern`` para um array numpy de bytes já codificado
+    """
+    if encoded.size == 0:
+        return np.array([], dtype='S1'), np.array([], dtype=np.int32)
+    table, ids = np.unique(encoded, return_inverse=True)
+    return table, ids.astype(np.int32)
+
+
+class StockCatalog:
+    """
+    Snapshot colunar do resultado de ``get_stock_summary``.
+
+    Cada coluna é um array numpy mapeado em memória (somente leitura), de forma que
+    todos os workers do gunicorn compartilham as mesmas páginas do arquivo. Strings
+    repetidas (descrição, filial, local) ficam em tabelas internadas e as linhas
+    guardam apenas o índice.
+    """
+
+    _loaded = None
+    _loaded_version = None
+
+    def __init__(self, path, manifest):
+        self.path = Path(path)
+        self.manifest = manifest
+        self.columns = {
+            name: np.load(self.path / f'{name}.npy', mmap_mode='r')
+            for name in CATALOG_COLUMNS
+        }
+
+    @property
+    def generated_at(self):
+        return self.manifest['generated_at']
+
+    @property
+    def age(self):
+        return time.time() - self.generated_at
+
+    def __len__(self):
+        return int(self.manifest['rows'])
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def directory(cls):
+        return Path(settings.PROTHEUS_CATALOG_DIR)
+
+    @classmethod
+    def current(cls, max_age=None):
+        """
+        Retorna o catálogo vigente ou None se não existir / estiver vencido
+        """
+        manifest_path = cls.directory() / MANIFEST_NAME
+        try:
+            with open(manifest_path) as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+        if max_age is None:
+            max_age = settings.PROTHEUS_CATALOG_MAX_AGE
+        if max_age and time.time() - manifest['generated_at'] > max_age:
+            return None
+
+        if cls._loaded_version != manifest['version']:
+            try:
+                cls._loaded = cls(cls.directory() / manifest['version'], manifest)
+            except OSError as e:
+                logger.warning(f"Catálogo {manifest['version']} indisponível: {e}")
+                return None
+            cls._loaded_version = manifest['version']
+
+        return cls._loaded
+
+    def _lookup(self, table_name, value):
+        table = self.columns[table_name]
+        idx = np.searchsorted(table, value.encode('utf-8'))
+        if idx < len(table) and table[idx] == value.encode('utf-8'):
+            return int(idx)
+        return None
+
+    def _lookup_ids(self, table_name, values):
+        """
+        Índices na tabela internada para um ou vários valores (ignora inexistentes)
+        """
+        if isinstance(values, str):
+            values = [values]
+        ids = (self._lookup(table_name, value) for value in values)
+        return np.array([i for i in ids if i is not None], dtype=np.int64)
+
+    def mask(self, filial=None, armazem=None, code_prefix=None):
+        """
+        Máscara booleana vetorizada para os filtros informados
+        (``filial`` e ``armazem`` aceitam um valor ou uma lista)
+        """
+        mask = np.ones(len(self), dtype=bool)
+
+        if filial:
+            filial_ids = self._lookup_ids('filiais', filial)
+            if filial_ids.size == 0:
+                return np.zeros(len(self), dtype=bool)
+            mask &= np.isin(self.columns['filial_id'], filial_ids)
+
+        if armazem:
+            local_ids = self._lookup_ids('locais', armazem)
+            if local_ids.size == 0:
+                return np.zeros(len(self), dtype=bool)
+            mask &= np.isin(self.columns['local_id'], local_ids)
+
+        if code_prefix:
+            mask &= np.char.startswith(self.columns['code'], code_prefix.encode('utf-8'))
+
+        return mask
+
+    def filter(self, filial=None, armazem=None, code_prefix=None):
+        """
+        Índices (ordenados) das linhas que atendem aos filtros; os dicts são
+        montados só para as linhas pedidas, com ``rows``
+        """
+        return np.flatnonzero(self.mask(filial, armazem, code_prefix))
+
+    def rows(self, indices):
+        """
+        Mesmo formato de ``ProtheusService.query_stock_summary`` (lista de dicts)
+        para as linhas ``indices``
+        """
+        code = self.columns['code']
+        description_id = self.columns['description_id']
+        descriptions = self.columns['descriptions']
+        filial_id = self.columns['filial_id']
+        filiais = self.columns['filiais']
+        local_id = self.columns['local_id']
+        locais = self.columns['locais']
+        balance = self.columns['balance']
+
+        results = []
+        for i in indices:
+            results.append({
+                'code': code[i].decode('utf-8'),
+                'description': descriptions[description_id[i]].decode('utf-8'),
+                'balance': float(balance[i]),
+                'filial': filiais[filial_id[i]].decode('utf-8'),
+                'local': locais[local_id[i]].decode('utf-8') or '01',
+            })
+        return results
+
+    # ------------------------------------------------------------------
+    # Escrita (usada pelo comando sync_stock_catalog)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def write(cls, codes, descriptions, filiais, locais, balances, keep=2, publish=True):
+        """
+        Grava uma nova versão do catálogo e troca o manifesto de forma atômica.
+
+        Os argumentos são listas paralelas, já ordenadas por filial + código.
+        Com ``publish=False`` a versão é gravada mas não passa a ser a vigente
+        (permite gerar arquivos derivados, como o índice de busca, antes da troca).
+        """
+        description_table, description_ids = _intern(descriptions)
+        filial_table, filial_ids = _intern(filiais)
+        local_table, local_ids = _intern(locais)
+
+        columns = {
+            'code': np.array([(code or '').strip().encode('utf-8') for code in codes]),
+            'description_id': description_ids,
+            'descriptions': description_table,
+            'filial_id': filial_ids.astype(np.uint16),
+            'filiais': filial_table,
+            'local_id': local_ids.astype(np.uint16),
+            'locais': local_table,
+            'balance': np.array([float(b or 0) for b in balances], dtype=np.float64),
+        }
+        return cls._write_columns(columns, len(codes), keep, publish)
+
+    @classmethod
+    def write_arrow(cls, table, keep=2, publish=True):
+        """
+        Mesmo que ``write`` a partir de uma ``pyarrow.Table`` (code, description,
+        balance, filial, local), sem criar objetos Python por linha
+        """
+        description_table, description_ids = _intern_bytes(arrow.fixed_bytes(table['description']))
+        filial_table, filial_ids = _intern_bytes(arrow.fixed_bytes(table['filial']))
+        local_table, local_ids = _intern_bytes(arrow.fixed_bytes(table['local']))
+
+        columns = {
+            'code': arrow.fixed_bytes(table['code']),
+            'description_id': description_ids,
+            'descriptions': description_table,
+            'filial_id': filial_ids.astype(np.uint16),
+            'filiais': filial_table,
+            'local_id': local_ids.astype(np.uint16),
+            'locais': local_table,
+            'balance': arrow.floats(table['balance']),
+        }
+        return cls._write_columns(columns, table.num_rows, keep, publish)
+
+    @classmethod
+    def _write_columns(cls, columns, rows, keep, publish):
+        directory = cls.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        version = time.strftime('%Y%m%dT%H%M%S') + f'-{time.time_ns() % 10**9:09d}'
+        target = directory / version
+        target.mkdir()
+
+        if columns['code'].size == 0:
+            columns['code'] = np.array([], dtype='S1')
+
+        for name in CATALOG_COLUMNS:
+            np.save(target / f'{name}.npy', columns[name])
+
+        manifest = {
+            'version': version,
+            'generated_at': time.time(),
+            'rows': rows,
+        }
+        if publish:
+            cls.publish(manifest, keep)
+        return manifest
+
+    @classmethod
+    def publish(cls, manifest, keep=2):
+        """
+        Torna a versão do manifesto a vigente e remove versões antigas
+        """
+        directory = cls.directory()
+        tmp_path = directory / f'{MANIFEST_NAME}.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp_path, directory / MANIFEST_NAME)
+
+        cls._prune(directory, keep)
+
+    @staticmethod
+    def _prune(directory, keep):
+        # Workers que ainda mapeiam versões antigas continuam lendo normalmente
+        # (o arquivo só é liberado quando o último mmap é fechado)
+        versions = sorted(p for p in directory.iterdir() if p.is_dir())
+        for old in versions[:-keep]:
+            shutil.rmtree(old, ignore_errors=True)
@@ -1,3 +1,6 @@
+from protheus.replica import PRIMARY
+
+
 class ProtheusRouter:
     """
     Um roteador de banco de dados para garantir que apenas as models da app 'protheus'
@@ -5,13 +8,19 @@ class ProtheusRouter:
     """
 
     def db_for_read(self, model, **hints):
+        # Leituras ficam no banco do objeto relacionado ou no principal; as
+        # listagens via ORM escolhem a réplica uma vez por requisição, com
+        # ``using()`` (ver ProtheusListView)
         if model._meta.app_label == 'protheus':
-            return 'protheus'
+            instance = hints.get('instance')
+            if instance is not None and instance._state.db:
+                return instance._state.db
+            return PRIMARY
         return None
 
     def db_for_write(self, model, **hints):
         if model._meta.app_label == 'protheus':
-            return 'protheus'
+            return PRIMARY
         return None
 
     def allow_relation(self, obj1, obj2, **hints):
@@ -0,0 +1,203 @@
+# protheus/explain.py - CAPTURA DE PLANOS (EXPLAIN PLAN) E SUGESTÃO DE ÍNDICES
+#
+# Dentro de ``capturing_plans()`` o ``protheus_cursor`` devolve um ExplainCursor:
+# em vez de executar a consulta ele roda EXPLAIN PLAN com os mesmos binds, guarda
+# o plano e responde como uma consulta sem linhas. Assim o SQL analisado é
+# exatamente o que o ProtheusService monta para cada combinação de filtros.
+
+import itertools
+import re
+import threading
+from contextlib import contextmanager
+
+_state = threading.local()
+_statement_ids = itertools.count(1)
+
+PLAN_COLUMNS = (
+    'id', 'parent_id', 'depth', 'operation', 'options', 'object_name', 'object_type',
+    'cost', 'cardinality', 'bytes', 'access_predicates', 'filter_predicates',
+)
+
+# Coluna Protheus entre aspas nos predicados do plano: "SD3"."D3_FILIAL" ou "D3_FILIAL"
+PREDICATE_COLUMN = re.compile(r'"([A-Z][A-Z0-9]{1,2}_[A-Z0-9_]+)"')
+# Campos dentro da chave do SIX: D3_FILIAL+DTOS(D3_EMISSAO)+STR(D3_QUANT,12,2)
+KEY_FIELD = re.compile(r'[A-Z][A-Z0-9]{1,2}_[A-Z0-9_]+')
+
+
+class ExplainCursor:
+    """
+    Cursor que troca a execução por EXPLAIN PLAN e guarda o plano em ``capture``
+    """
+
+    def __init__(self, endpoint, cursor, capture):
+        self.endpoint = endpoint
+        self.cursor = cursor
+        self.capture = capture
+        self.description = []
+
+    def execute(self, sql, params=None):
+        statement_id = f'dash_{next(_statement_ids)}'
+        self.cursor.execute("DELETE FROM PLAN_TABLE WHERE STATEMENT_ID = %(statement_id)s", {
+            'statement_id': statement_id,
+        })
+        self.cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}", params)
+        self.cursor.execute(f"""
+            SELECT {', '.join(PLAN_COLUMNS)}
+            FROM PLAN_TABLE
+            WHERE STATEMENT_ID = %(statement_id)s
+            ORDER BY id
+        """, {'statement_id': statement_id})
+        plan = [dict(zip(PLAN_COLUMNS, row)) for row in self.cursor.fetchall()]
+
+        self.capture.append({
+            'endpoint': self.endpoint,
+            'sql': sql,
+            'params': {k: v if isinstance(v, (str, int, float)) else repr(v) for k, v in (params or {}).items()},
+            'plan': plan,
+        })
+
+    def fetchall(self):
+        return []
+
+    def fetchmany(self, size=None):
+        return []
+
+
+@contextmanager
+def capturing_plans():
+    """
+    Captura os planos das consultas feitas na thread atual (lista de dicts)
+    """
+    capture = []
+    _state.capture = capture
+    try:
+        yield capture
+    finally:
+        _state.capture = None
+
+
+def wrap_cursor(endpoint, cursor):
+    capture = getattr(_state, 'capture', None)
+    return cursor if capture is None else ExplainCursor(endpoint, cursor, capture)
+
+
+# ----------------------------------------------------------------------
+# Análise dos planos
+# ----------------------------------------------------------------------
+
+def table_alias(table_name):
+    """
+    Alias Protheus da tabela física: SD3010 -> SD3
+    """
+    return (table_name or '')[:3].upper()
+
+
+def field_prefix(alias):
+    """
+    Prefixo dos campos: SD3 -> D3_, SB1 -> B1_, ZZ1 -> ZZ1_
+    """
+    return f'{alias[1:]}_' if alias.startswith('S') else f'{alias}_'
+
+
+def predicate_columns(step, alias):
+    """
+    Colunas da tabela ``alias`` citadas nos predicados de acesso/filtro do passo
+    """
+    prefix = field_prefix(alias)
+    text = ' '.join(filter(None, (step.get('access_predicates'), step.get('filter_predicates'))))
+    return list(dict.fromkeys(c for c in PREDICATE_COLUMN.findall(text) if c.startswith(prefix)))
+
+
+def key_fields(chave):
+    """
+    Campos da chave de um índice do SIX, na ordem (funções como DTOS removidas)
+    """
+    return KEY_FIELD.findall((chave or '').upper())
+
+
+def full_scans(plan, table_rows, min_rows):
+    """
+    Passos TABLE ACCESS FULL sobre tabelas com pelo menos ``min_rows`` linhas
+    """
+    scans = []
+    for step in plan:
+        if step.get('operation') != 'TABLE ACCESS' or step.get('options') != 'FULL':
+            continue
+        rows = table_rows.get(step.get('object_name'))
+        if rows is not None and rows < min_rows:
+            continue
+        scans.append({**step, 'num_rows': rows})
+    return scans
+
+
+def leading_match(fields, columns):
+    """
+    Quantos campos iniciais da chave estão entre as colunas do predicado; a
+    filial (primeiro campo de todos os índices do Protheus) não conta
+    """
+    matched = 0
+    for field in fields:
+        if field.endswith('_FILIAL'):
+            continue
+        if field not in columns:
+            break
+        matched += 1
+    return matched
+
+
+def wrapped_columns(step, alias):
+    """
+    Colunas usadas dentro de uma função no predicado (TO_DATE, TRUNC, conversão
+    implícita...), o que impede o uso do índice sobre a coluna
+    """
+    prefix = field_prefix(alias)
+    text = ' '.join(filter(None, (step.get('access_predicates'), step.get('filter_predicates'))))
+    found = re.findall(r'[A-Z_]+\((?:"[A-Z0-9_]+"\.)?"([A-Z][A-Z0-9]{1,2}_[A-Z0-9_]+)"', text)
+    return list(dict.fromkeys(c for c in found if c.startswith(prefix)))
+
+
+def suggest_index(alias, columns, native_indexes, db_indexes):
+    """
+    Índice nativo (SIX) cuja ordem melhor atende ``columns``.
+
+    ``native_indexes``: [{'ordem', 'chave', 'descricao'}] do SIX para o alias;
+    ``db_indexes``: {nome do índice: [colunas]} existentes no banco para a tabela.
+    """
+    best, best_score = None, 0
+    for index in native_indexes:
+        fields = key_fields(index['chave'])
+        score = leading_match(fields, columns)
+        if score > best_score:
+            best, best_score = index, score
+
+    prefix = field_prefix(alias)
+    filial = f'{prefix}FILIAL'
+    wanted = [filial] + [c for c in columns if c != filial]
+
+    if best is None:
+        return {
+            'indice_nativo': None,
+            'existe_no_banco': False,
+            'sugestao': f"Nenhuma ordem do SIX começa pelas colunas filtradas; pedir índice {'+'.join(wanted)}",
+        }
+
+    # Índice físico que começa pelos mesmos campos atendidos da ordem escolhida
+    needed = []
+    for field in key_fields(best['chave']):
+        if not (field.endswith('_FILIAL') or field in columns):
+            break
+        needed.append(field)
+    existing = next((name for name, cols in db_indexes.items() if cols[:len(needed)] == needed), None)
+    if existing:
+        sugestao = (
+            f"Ordem {best['ordem']} ({best['chave']}) existe no banco ({existing}): "
+            f"reescrever o predicado para casar com a chave (mesmas colunas, sem função na coluna)"
+        )
+    else:
+        sugestao = f"Ordem {best['ordem']} ({best['chave']}) não existe no banco: pedir ao DBA"
+    return {
+        'indice_nativo': {**best, 'campos_atendidos': best_score},
+        'existe_no_banco': bool(existing),
+        'indice_banco': existing,
+        'sugestao': sugestao,
+    }
@@ -3,123 +3,97 @@ from django_filters import rest_framework as filters
 from protheus.models import ProtheusSD3, ProtheusSB1, ProtheusSB2, ProtheusSC9
 
 
-class StockMovementFilter(filters.FilterSet):
+class ProtheusCharFilterSet(filters.FilterSet):
     """
-    Filtros personalizados para os campos da tabela ProtheusSD3 (movimentações de estoque).
-
-    Todos os filtros aplicam .strip() e lookup com 'startswith', garantindo compatibilidade
-    com colunas do tipo CHAR no Oracle, que possuem preenchimento por espaços à direita.
+    Base dos filtros das tabelas Protheus (colunas CHAR preenchidas com espaços).
+
+    - Valor completo (ex: ``?B2_COD=PROD001``): igualdade com o valor completado
+      com espaços até o tamanho da coluna, equivalente a ``= RPAD(valor, n)``.
+      É o que permite ao Oracle usar os índices nativos (FILIAL+COD...).
+    - Vários valores separados por vírgula (ex: ``?B2_LOCAL=01,03``): ``IN`` com
+      os valores completados da mesma forma.
+    - Valor terminado em ``*`` (ex: ``?B2_COD=PROD*``): prefixo (``LIKE 'PROD%'``,
+      via lookup ``__charprefix``, sem a conversão NCHAR do ``__startswith``).
     """
 
-    D3_COD = filters.CharFilter(method='filter_cod')
-    D3_DOC = filters.CharFilter(method='filter_doc')
-    D3_LOCAL = filters.CharFilter(method='filter_local')
-    D3_TM = filters.CharFilter(method='filter_tm')
+    PREFIX_WILDCARD = '*'
+    LIST_SEPARATOR = ','
+
+    def filter_char(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
 
-    def filter_cod(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
+        if value.endswith(self.PREFIX_WILDCARD):
+            prefix = value.rstrip(self.PREFIX_WILDCARD)
+            if not prefix:
+                return queryset
+            return queryset.filter(**{f"{name}__charprefix": prefix})
 
-    def filter_doc(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
+        max_length = queryset.model._meta.get_field(name).max_length
+        values = [v.strip().ljust(max_length) for v in value.split(self.LIST_SEPARATOR) if v.strip()]
+        if not values:
+            return queryset
+        if len(values) > 1:
+            return queryset.filter(**{f"{name}__in": values})
+        return queryset.filter(**{name: values[0]})
 
-    def filter_local(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
 
-    def filter_tm(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
+class StockMovementFilter(ProtheusCharFilterSet):
+    """
+    Filtros personalizados para os campos da tabela ProtheusSD3 (movimentações de estoque).
+    """
+
+    D3_FILIAL = filters.CharFilter(method='filter_char')
+    D3_COD = filters.CharFilter(method='filter_char')
+    D3_DOC = filters.CharFilter(method='filter_char')
+    D3_LOCAL = filters.CharFilter(method='filter_char')
+    D3_TM = filters.CharFilter(method='filter_char')
 
     class Meta:
         model = ProtheusSD3
-        fields = ['D3_COD', 'D3_DOC', 'D3_LOCAL', 'D3_TM']
+        fields = ['D3_FILIAL', 'D3_COD', 'D3_DOC', 'D3_LOCAL', 'D3_TM']
 
 
-class ProductFilter(filters.FilterSet):
+class ProductFilter(ProtheusCharFilterSet):
     """
     Filtros personalizados para os campos da tabela ProtheusSB1 (produtos cadastrados).
-    
-    Todos os filtros aplicam .strip() e lookup com 'startswith', garantindo compatibilidade
-    com colunas do tipo CHAR no Oracle, que possuem preenchimento por espaços à direita.
     """
 
-    B1_COD = filters.CharFilter(method='filter_cod')
-    B1_FILIAL = filters.CharFilter(method='filter_filial')
-    B1_TIPO = filters.CharFilter(method='filter_tipo')
-
-    def filter_cod(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_filial(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_tipo(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
+    B1_COD = filters.CharFilter(method='filter_char')
+    B1_FILIAL = filters.CharFilter(method='filter_char')
+    B1_TIPO = filters.CharFilter(method='filter_char')
 
     class Meta:
         model = ProtheusSB1
         fields = ['B1_COD', 'B1_FILIAL', 'B1_TIPO']
 
 
-class StockFilter(filters.FilterSet):
+class StockFilter(ProtheusCharFilterSet):
     """
     Filtros personalizados para os campos da tabela ProtheusSB2 (saldos em estoque).
-
-    Todos os filtros aplicam .strip() e lookup com 'startswith', garantindo compatibilidade
-    com colunas do tipo CHAR no Oracle, que possuem preenchimento por espaços à direita.
     """
 
-    B2_FILIAL = filters.CharFilter(method='filter_filial')
-    B2_COD = filters.CharFilter(method='filter_cod')
-    B2_LOCAL = filters.CharFilter(method='filter_local')
-
-    def filter_filial(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_cod(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_local(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
+    B2_FILIAL = filters.CharFilter(method='filter_char')
+    B2_COD = filters.CharFilter(method='filter_char')
+    B2_LOCAL = filters.CharFilter(method='filter_char')
 
     class Meta:
         model = ProtheusSB2
         fields = ['B2_FILIAL', 'B2_COD', 'B2_LOCAL']
 
-class DeliveryFilter(filters.FilterSet):
+class DeliveryFilter(ProtheusCharFilterSet):
     """
     Filtros personalizados para os campos da tabela ProtheusSC9 (liberações/entregas).
-
-    Todos os filtros aplicam .strip() e lookup com 'startswith', garantindo compatibilidade
-    com colunas do tipo CHAR no Oracle, que possuem preenchimento por espaços à direita.
     """
 
-    C9_PEDIDO = filters.CharFilter(method='filter_pedido')
-    C9_PRODUTO = filters.CharFilter(method='filter_produto')
-    C9_LOCAL = filters.CharFilter(method='filter_local')
-    C9_FILIAL = filters.CharFilter(method='filter_filial')
-    C9_NFISCAL = filters.CharFilter(method='filter_nfiscal')
-    C9_BLEST = filters.CharFilter(method='filter_blest')
-    C9_BLCRED = filters.CharFilter(method='filter_blcred')
-
-    def filter_pedido(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_produto(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_local(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_filial(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_nfiscal(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_blest(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
-
-    def filter_blcred(self, queryset, name, value):
-        return queryset.filter(**{f"{name}__startswith": value.strip()})
+    C9_PEDIDO = filters.CharFilter(method='filter_char')
+    C9_PRODUTO = filters.CharFilter(method='filter_char')
+    C9_LOCAL = filters.CharFilter(method='filter_char')
+    C9_FILIAL = filters.CharFilter(method='filter_char')
+    C9_NFISCAL = filters.CharFilter(method='filter_char')
+    C9_BLEST = filters.CharFilter(method='filter_char')
+    C9_BLCRED = filters.CharFilter(method='filter_char')
 
     class Meta:
         model = ProtheusSC9
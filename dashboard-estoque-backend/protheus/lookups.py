@@ -0,0 +1,22 @@
+from django.db.models import CharField, Lookup
+
+
+@CharField.register_lookup
+class CharPrefix(Lookup):
+    """
+    Prefixo em coluna CHAR: ``coluna LIKE 'valor%'`` simples.
+
+    O ``__startswith`` padrão do Django no Oracle gera
+    ``LIKE TRANSLATE(:p USING NCHAR_CS) ESCAPE TRANSLATE('\\' USING NCHAR_CS)``,
+    e a conversão para NCHAR impede o uso dos índices nativos do Protheus.
+    """
+    lookup_name = 'charprefix'
+
+    def get_db_prep_lookup(self, value, connection):
+        escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return '%s', [f'{escaped}%']
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} LIKE {rhs} ESCAPE '\\'", (*lhs_params, *rhs_params)
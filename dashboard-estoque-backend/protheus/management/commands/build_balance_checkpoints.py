@@ -0,0 +1,49 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from protheus.admission import call_timeout
+from protheus.balances import BalanceHistory
+
+
+class Command(BaseCommand):
+    help = "Gera os checkpoints de saldo (SB2 reconstruído em datas passadas) usados pelo saldo em data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            help='Meses de histórico cobertos pelos checkpoints (padrão: 12)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=7,
+            help='Intervalo em dias entre checkpoints (padrão: 7)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        today = datetime.date.today()
+        oldest = today - datetime.timedelta(days=options['months'] * 31)
+        interval = max(1, options['interval'])
+
+        dates = []
+        date = today - datetime.timedelta(days=interval)
+        while date >= oldest:
+            dates.append(date)
+            date -= datetime.timedelta(days=interval)
+
+        with call_timeout(settings.PROTHEUS_BACKGROUND_CALL_TIMEOUT):
+            written = BalanceHistory.build_checkpoints(dates)
+        BalanceHistory.prune(keep_after=oldest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(written)} checkpoints de saldo gravados "
+            f"({written[-1] if written else '-'} a {written[0] if written else '-'}) "
+            f"em {time.monotonic() - started:.2f}s"
+        ))
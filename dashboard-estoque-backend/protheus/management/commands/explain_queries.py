@@ -0,0 +1,242 @@
+import datetime
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from protheus import explain
+from protheus.services import ProtheusService
+
+
+class Command(BaseCommand):
+    help = (
+        "Captura o EXPLAIN PLAN de todas as consultas do ProtheusService com filtros "
+        "representativos, aponta full scans em tabelas grandes e o índice nativo (SIX) "
+        "que cada predicado deveria usar"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filial',
+            default='',
+            help='Filial usada nos filtros (padrão: a primeira com produtos)',
+        )
+        parser.add_argument(
+            '--local',
+            default='01',
+            help='Armazém usado nos filtros (padrão: 01)',
+        )
+        parser.add_argument(
+            '--code',
+            default='',
+            help='Produto usado nos filtros por produto (padrão: sem filtro por produto)',
+        )
+        parser.add_argument(
+            '--endpoint',
+            default='',
+            help='Analisa só as consultas deste endpoint (ex.: sales, deliveries)',
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=100000,
+            help='Tabelas com pelo menos N linhas (USER_TABLES.NUM_ROWS) contam como grandes (padrão: 100000)',
+        )
+        parser.add_argument(
+            '--output',
+            default='',
+            help='Arquivo JSON com os planos (padrão: var/explain/planos_<data>.json)',
+        )
+
+    def cases(self, filial, local, code):
+        """
+        (endpoint, rótulo, função, parâmetros) - as funções que vão direto ao
+        Oracle, sem passar pelo cache
+        """
+        today = datetime.date.today()
+        month_ago = (today - datetime.timedelta(days=30)).isoformat()
+
+        yield 'stock_summary', 'sem filtro', ProtheusService.query_stock_summary, {}
+        yield 'stock_summary', 'filial+armazém', ProtheusService.query_stock_summary, {
+            'filial': filial, 'armazem': local,
+        }
+        yield 'sales', '4 meses', ProtheusService.get_sales_and_movements_summary, {'months': 4}
+        yield 'sales', '4 meses filial', ProtheusService.get_sales_and_movements_summary, {
+            'months': 4, 'filial': filial,
+        }
+        yield 'stock_movements', 'página 1', ProtheusService.get_stock_movements, {}
+        yield 'stock_movements', 'página 1 filial+armazém', ProtheusService.get_stock_movements, {
+            'filial': filial, 'armazem': local,
+        }
+        yield 'movement_series', 'dia/produto 6 meses', ProtheusService._query_movement_series, {}
+        yield 'movement_series', 'mês/local filial', ProtheusService._query_movement_series, {
+            'period': 'month', 'group': 'local', 'filial': filial,
+        }
+        yield 'balances', 'saldo atual', ProtheusService.get_current_balances, {}
+        yield 'balances', 'saldo atual filial', ProtheusService.get_current_balances, {'filial': filial}
+        yield 'net_movements', '30 dias por dia', ProtheusService.get_net_movements, {
+            'start': month_ago, 'end': today.isoformat(), 'by_day': True,
+        }
+        yield 'net_movements', '30 dias filial', ProtheusService.get_net_movements, {
+            'start': month_ago, 'end': today.isoformat(), 'filial': filial,
+        }
+        yield 'deliveries', '30 dias', ProtheusService._query_deliveries, {'days': 30}
+        yield 'deliveries', '30 dias filial+armazém', ProtheusService._query_deliveries, {
+            'days': 30, 'filial': filial, 'local': local,
+        }
+        yield 'delivery_status', '7 dias filial', ProtheusService.get_delivery_status_summary, {
+            'filial': filial, 'days': 7,
+        }
+        yield 'pending_deliveries', 'pendentes', ProtheusService.get_pending_deliveries, {}
+        yield 'pending_deliveries', 'aging filial', ProtheusService.get_pending_deliveries_aging, {
+            'filial': filial,
+        }
+        yield 'expiry', 'vencimento filial', ProtheusService._query_expiry_exposure, {'filial': filial}
+
+        if code:
+            yield 'movement_series', 'produto', ProtheusService._query_movement_series, {'code': code}
+            yield 'balances', 'produto', ProtheusService.get_current_balances, {'code': code}
+            yield 'net_movements', '30 dias produto', ProtheusService.get_net_movements, {
+                'start': month_ago, 'end': today.isoformat(), 'code': code,
+            }
+
+    def capture(self, cases):
+        captured = []
+        for endpoint, label, func, kwargs in cases:
+            try:
+                with explain.capturing_plans() as plans:
+                    func(**kwargs)
+            except Exception as e:
+                self.stderr.write(f"  {endpoint} [{label}]: erro - {e}")
+                captured.append({'endpoint': endpoint, 'label': label, 'error': str(e)})
+                continue
+
+            if not plans:
+                self.stdout.write(f"  {endpoint} [{label}]: nenhuma consulta (resultado veio do cache)")
+            for plan in plans:
+                captured.append({'label': label, **plan})
+        return captured
+
+    def fetch_metadata(self, tables):
+        """
+        Linhas por tabela (estatísticas), ordens do SIX e índices físicos existentes
+        """
+        table_rows, native, physical = {}, defaultdict(list), defaultdict(dict)
+        if not tables:
+            return table_rows, native, physical
+
+        params = {f't{i}': t for i, t in enumerate(tables)}
+        names = ', '.join(f'%({k})s' for k in params)
+        aliases = {f'a{i}': a for i, a in enumerate(sorted({explain.table_alias(t) for t in tables}))}
+
+        with connections['protheus'].cursor() as cursor:
+            cursor.execute(f"SELECT table_name, num_rows FROM user_tables WHERE table_name IN ({names})", params)
+            table_rows = dict(cursor.fetchall())
+
+            cursor.execute(f"""
+                SELECT index_name, table_name, column_name
+                FROM user_ind_columns
+                WHERE table_name IN ({names})
+                ORDER BY index_name, column_position
+            """, params)
+            for index_name, table_name, column_name in cursor.fetchall():
+                physical[table_name].setdefault(index_name, []).append(column_name)
+
+            try:
+                cursor.execute(f"""
+                    SELECT TRIM(INDICE), TRIM(ORDEM), TRIM(CHAVE), TRIM(DESCRICAO)
+                    FROM SIX010
+                    WHERE D_E_L_E_T_ = ' '
+                    AND INDICE IN ({', '.join(f'%({k})s' for k in aliases)})
+                    ORDER BY INDICE, ORDEM
+                """, aliases)
+                for alias, ordem, chave, descricao in cursor.fetchall():
+                    native[alias].append({'ordem': ordem, 'chave': chave, 'descricao': descricao})
+            except Exception as e:
+                self.stderr.write(f"SIX010 indisponível, sem sugestão de ordem nativa: {e}")
+
+        return table_rows, native, physical
+
+    def analyze(self, captured, min_rows):
+        tables = sorted({
+            step['object_name']
+            for item in captured
+            for step in item.get('plan', [])
+            if step.get('operation') == 'TABLE ACCESS' and step.get('object_name')
+        })
+        table_rows, native, physical = self.fetch_metadata(tables)
+
+        for item in captured:
+            plan = item.get('plan')
+            if not plan:
+                continue
+            item['cost'] = plan[0].get('cost')
+            item['cardinality'] = plan[0].get('cardinality')
+            item['full_scans'] = []
+            for step in explain.full_scans(plan, table_rows, min_rows):
+                table = step['object_name']
+                alias = explain.table_alias(table)
+                columns = explain.predicate_columns(step, alias)
+                item['full_scans'].append({
+                    'table': table,
+                    'num_rows': step['num_rows'],
+                    'cost': step.get('cost'),
+                    'cardinality': step.get('cardinality'),
+                    'columns': columns,
+                    'wrapped_columns': explain.wrapped_columns(step, alias),
+                    'advice': explain.suggest_index(alias, columns, native.get(alias, []), physical.get(table, {})),
+                })
+        return captured
+
+    def report(self, captured):
+        flagged = 0
+        for item in captured:
+            if 'plan' not in item:
+                continue
+            self.stdout.write(
+                f"{item['endpoint']} [{item['label']}]: custo {item['cost']}, "
+                f"cardinalidade {item['cardinality']}"
+            )
+            for scan in item['full_scans']:
+                flagged += 1
+                rows = f"{scan['num_rows']:,}".replace(',', '.') if scan['num_rows'] is not None else '?'
+                columns = ', '.join(scan['columns']) or 'nenhuma coluna filtrada'
+                self.stdout.write(self.style.WARNING(
+                    f"  FULL SCAN {scan['table']} ({rows} linhas, custo {scan['cost']}) - filtro: {columns}"
+                ))
+                if scan['wrapped_columns']:
+                    self.stdout.write(self.style.WARNING(
+                        f"    função/conversão na coluna: {', '.join(scan['wrapped_columns'])} (impede o índice)"
+                    ))
+                self.stdout.write(f"    {scan['advice']['sugestao']}")
+        return flagged
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        filial = options['filial'] or next(iter(ProtheusService.get_filiais()), None)
+        cases = [
+            case for case in self.cases(filial, options['local'], options['code'])
+            if not options['endpoint'] or case[0] == options['endpoint']
+        ]
+        self.stdout.write(f"Capturando planos de {len(cases)} consultas (filial {filial}, armazém {options['local']})")
+
+        captured = self.analyze(self.capture(cases), options['min_rows'])
+        flagged = self.report(captured)
+
+        output = Path(options['output']) if options['output'] else (
+            Path(settings.PROTHEUS_EXPLAIN_DIR) / f"planos_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as fh:
+            json.dump(captured, fh, ensure_ascii=False, indent=2, default=str)
+
+        message = (
+            f"{len(captured)} planos em {time.monotonic() - started:.2f}s, "
+            f"{flagged} full scans em tabelas grandes - {output}"
+        )
+        self.stdout.write(self.style.SUCCESS(message) if not flagged else self.style.WARNING(message))
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Módulos que não devem ser carregados na inicialização (só nos caminhos que os usam)
+HEAVY_MODULES = ('oracledb', 'numpy', 'pandas', 'pyarrow', 'prometheus_client')
+
+
+class Command(BaseCommand):
+    help = "Mede o tempo de importação na inicialização (django.setup + módulos informados)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modules',
+            nargs='*',
+            default=['protheus.urls'],
+            help='Módulos importados após o django.setup (padrão: protheus.urls)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Quantidade de módulos exibidos, pelo tempo acumulado (padrão: 20)',
+        )
+
+    def handle(self, *args, **options):
+        imports = ''.join(f'import {module}; ' for module in options['modules'])
+        code = (
+            "import sys, time; started = time.perf_counter(); "
+            "import django; django.setup(); "
+            f"{imports}"
+            "print('TOTAL', time.perf_counter() - started, file=sys.stderr); "
+            f"print('HEAVY', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules), file=sys.stderr)"
+        )
+
+        # Processo novo: o processo atual já tem tudo importado
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+
+        timings = []
+        total = heavy = None
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:'):
+                # "import time: <próprio us> | <acumulado us> | <módulo>"
+                own, cumulative, name = line.split(':', 1)[1].split('|', 2)
+                try:
+                    timings.append((int(cumulative), int(own), name.strip()))
+                except ValueError:
+                    continue  # cabeçalho
+            elif line.startswith('TOTAL '):
+                total = float(line.split()[1])
+            elif line.startswith('HEAVY'):
+                heavy = line[len('HEAVY'):].strip()
+
+        if result.returncode != 0 or total is None:
+            self.stderr.write(result.stderr[-2000:])
+            return
+
+        self.stdout.write(f"{'acumulado (ms)':>15} {'próprio (ms)':>13}  módulo")
+        for cumulative, own, name in sorted(timings, reverse=True)[:options['top']]:
+            self.stdout.write(f"{cumulative / 1000:>15.1f} {own / 1000:>13.1f}  {name}")
+
+        self.stdout.write(self.style.SUCCESS(f"Inicialização: {total:.3f}s"))
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"Módulos pesados carregados na inicialização: {heavy}"))
+        else:
+            self.stdout.write(f"Nenhum módulo pesado ({', '.join(HEAVY_MODULES)}) carregado na inicialização")
@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara os perfis guardados pelo modo ?_profile=1 (core/profiling.py): "
+        "tempo total e por fase de cada perfil do endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'endpoint',
+            nargs='?',
+            default='',
+            help='Nome da URL (ex.: sales-summary); sem ele lista os endpoints com perfis',
+        )
+        parser.add_argument(
+            '--folded',
+            default='',
+            help='Escreve só as pilhas (formato folded) do perfil informado (nome do arquivo)',
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(settings.PROFILING_DIR)
+
+        if not options['endpoint']:
+            for path in sorted(p for p in directory.glob('*') if p.is_dir()):
+                self.stdout.write(f"{path.name}: {len(list(path.glob('*.json')))} perfis")
+            return
+
+        files = sorted((directory / options['endpoint']).glob('*.json'))
+        if not files:
+            self.stderr.write(f"Nenhum perfil de {options['endpoint']} em {directory}")
+            return
+
+        profiles = []
+        for path in files:
+            with open(path, encoding='utf-8') as fh:
+                profiles.append((path.name, json.load(fh)))
+
+        if options['folded']:
+            profile = dict(profiles).get(options['folded'])
+            if profile is None:
+                self.stderr.write(f"Perfil {options['folded']} não encontrado")
+                return
+            self.stdout.write(profile['folded'])
+            return
+
+        phases = sorted({name for _, profile in profiles for name in profile['phases']})
+        for name, profile in profiles:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{name}  {profile['path']}  status {profile['status']}  total {profile['total']:.3f}s"
+            ))
+            for phase in phases:
+                seconds = profile['phases'].get(phase)
+                if seconds is not None:
+                    share = seconds / profile['total'] * 100 if profile['total'] else 0
+                    self.stdout.write(f"  {phase:<45} {seconds:8.3f}s {share:5.1f}%")
@@ -0,0 +1,34 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from protheus.admission import call_timeout
+from protheus.snapshots import StockSnapshots
+
+
+class Command(BaseCommand):
+    help = "Grava a fotografia diária do saldo de estoque (SB2) usada na diferença entre datas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=400,
+            help='Dias de histórico mantidos em disco (padrão: 400)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        with call_timeout(settings.PROTHEUS_BACKGROUND_CALL_TIMEOUT):
+            kind, written, total = StockSnapshots.capture()
+        removed = StockSnapshots.prune(
+            keep_after=datetime.date.today() - datetime.timedelta(days=options['keep_days'])
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fotografia de estoque ({kind}): {written} de {total} chaves gravadas, "
+            f"{removed} fotografias antigas removidas, em {time.monotonic() - started:.2f}s"
+        ))
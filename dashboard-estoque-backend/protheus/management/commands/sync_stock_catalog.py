@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from protheus.admission import call_timeout
+from protheus.catalog import StockCatalog
+from protheus.search import ProductSearchIndex
+from protheus.services import ProtheusService
+
+
+class Command(BaseCommand):
+    help = "Gera o catálogo colunar de estoque (SB1/SB2) e o índice de busca de produtos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=2,
+            help='Quantidade de versões anteriores mantidas em disco (padrão: 2)',
+        )
+        parser.add_argument(
+            '--no-arrow',
+            action='store_true',
+            help='Lê o Oracle linha a linha (tuplas) em vez de colunas Arrow (fetch_df_all)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        with call_timeout(settings.PROTHEUS_BACKGROUND_CALL_TIMEOUT):
+            if options['no_arrow']:
+                columns = ProtheusService.fetch_stock_catalog_columns()
+            else:
+                table = ProtheusService.fetch_stock_catalog_arrow()
+        fetched = time.monotonic()
+
+        previous = StockCatalog.current(max_age=0)
+        if options['no_arrow']:
+            manifest = StockCatalog.write(publish=False, **columns)
+        else:
+            manifest = StockCatalog.write_arrow(table, publish=False)
+        catalog = StockCatalog(StockCatalog.directory() / manifest['version'], manifest)
+        rebuilt = ProductSearchIndex.build(catalog, previous=previous)
+        StockCatalog.publish(manifest, keep=options['keep'])
+        finished = time.monotonic()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Catálogo {manifest['version']}: {manifest['rows']} registros "
+            f"(consulta {fetched - started:.2f}s, gravação {finished - fetched:.2f}s, "
+            f"índice de busca {'reconstruído' if rebuilt else 'reaproveitado'})"
+        ))
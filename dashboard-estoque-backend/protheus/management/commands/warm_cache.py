@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from protheus.admission import call_timeout
+from protheus.atp import AvailableToPromise
+from protheus.services import ProtheusService, parse_list
+
+
+class Command(BaseCommand):
+    help = "Pré-calcula as consultas mais usadas do dashboard (estoque, vendas e ATP por filial) no cache compartilhado"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.PROTHEUS_WARMUP_CONCURRENCY,
+            help='Consultas simultâneas no Oracle (padrão: PROTHEUS_WARMUP_CONCURRENCY)',
+        )
+        parser.add_argument(
+            '--filial',
+            default='',
+            help='Filiais a aquecer, separadas por vírgula (padrão: todas)',
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=4,
+            help='Meses do resumo de vendas (padrão: 4, o mesmo do /sales/)',
+        )
+
+    def tasks(self, filiais, months):
+        # Visão padrão sem filtro + uma por filial
+        for filial in [None] + filiais:
+            label = filial or 'todas'
+            yield f'estoque [{label}]', ProtheusService.get_stock_summary, {'filial': filial}
+            yield f'vendas {months}m [{label}]', ProtheusService.get_consolidated_sales, {
+                'months': months,
+                'filial': filial,
+            }
+            if filial:
+                yield f'ATP [{label}]', AvailableToPromise.current, {'filial': filial}
+
+    def run_task(self, func, kwargs):
+        started = time.monotonic()
+        try:
+            with call_timeout(settings.PROTHEUS_BACKGROUND_CALL_TIMEOUT):
+                result = func(refresh=True, **kwargs)
+            return time.monotonic() - started, len(result), None
+        except Exception as e:
+            return time.monotonic() - started, 0, e
+        finally:
+            # Cada thread tem as próprias conexões (principal e réplica); não deixa
+            # sessões abertas no Oracle
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        concurrency = max(1, options['concurrency'])
+
+        filiais = parse_list(options['filial']) or ProtheusService.get_filiais()
+        tasks = list(self.tasks(filiais, options['months']))
+        connections.close_all()
+
+        self.stdout.write(f"Aquecendo {len(tasks)} consultas ({len(filiais)} filiais, concorrência {concurrency})")
+
+        errors = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                pool.submit(self.run_task, func, kwargs): label
+                for label, func, kwargs in tasks
+            }
+            for future in as_completed(futures):
+                elapsed, rows, error = future.result()
+                if error:
+                    errors += 1
+                    self.stderr.write(f"  {futures[future]}: erro em {elapsed:.2f}s - {error}")
+                else:
+                    self.stdout.write(f"  {futures[future]}: {rows} registros em {elapsed:.2f}s")
+
+        total = time.monotonic() - started
+        message = f"Cache aquecido em {total:.2f}s ({len(tasks) - errors}/{len(tasks)} consultas)"
+        self.stdout.write(self.style.SUCCESS(message) if not errors else self.style.WARNING(message))
@@ -1,16 +1,44 @@
 from django.db import models
 
 
+class ProtheusQuerySet(models.QuerySet):
+    """
+    QuerySet comum das tabelas Protheus
+    """
+
+    def ativos(self):
+        """Somente registros não deletados (D_E_L_E_T_ = ' ')"""
+        return self.filter(D_E_L_E_T=' ')
+
+    def stable(self):
+        """Garante ordenação total, usando o R_E_C_N_O_ como desempate"""
+        ordering = list(self.query.order_by) if self.ordered else []
+        if 'pk' not in ordering and '-pk' not in ordering:
+            ordering.append('pk')
+        return self.order_by(*ordering)
+
+    def stream(self, chunk_size=2000):
+        """
+        Itera com cursor no servidor, buscando ``chunk_size`` linhas por vez,
+        sem materializar o queryset inteiro em memória
+        """
+        return self.stable().iterator(chunk_size=chunk_size)
+
+
 class ProtheusSB1(models.Model):
     """
     Modelo para mapear a tabela SB1 (Produtos) do Protheus
     """
+    R_E_C_N_O = models.IntegerField(primary_key=True, db_column='R_E_C_N_O_', verbose_name='Recno')
     B1_FILIAL = models.CharField(max_length=2, verbose_name='Filial')
-    B1_COD = models.CharField(max_length=15, primary_key=True, verbose_name='Código do Produto')
+    B1_COD = models.CharField(max_length=15, verbose_name='Código do Produto')
     B1_DESC = models.CharField(max_length=100, verbose_name='Descrição do Produto')
     B1_TIPO = models.CharField(max_length=2, verbose_name='Tipo do Produto')
     B1_UM = models.CharField(max_length=2, verbose_name='Unidade de Medida')
     B1_GRUPO = models.CharField(max_length=4, verbose_name='Grupo do Produto')
+    D_E_L_E_T = models.CharField(max_length=1, db_column='D_E_L_E_T_', blank=True, null=True)
+
+    objects = ProtheusQuerySet.as_manager()
 
     class Meta:
         managed = False
@@ -18,7 +46,9 @@ class ProtheusSB1(models.Model):
         app_label = 'protheus'
         verbose_name = 'Produto'
         verbose_name_plural = 'Produtos'
-        unique_together = ('B1_FILIAL', 'B1_COD')
+        indexes = [
+            models.Index(fields=['B1_FILIAL', 'B1_COD'], name='SB10101'),
+        ]
 
     def __str__(self):
         return f'{self.B1_FILIAL} - {self.B1_COD} ({self.B1_TIPO})'
@@ -28,21 +58,26 @@ class ProtheusSB2(models.Model):
     """
     Modelo para mapear a tabela SB2 (Saldos em Estoque) do Protheus
     """
+    R_E_C_N_O = models.IntegerField(primary_key=True, db_column='R_E_C_N_O_', verbose_name='Recno')
     B2_FILIAL = models.CharField(max_length=2, verbose_name='Filial')
-    B2_COD = models.CharField(max_length=15, primary_key=True, verbose_name='Código do Produto')
+    B2_COD = models.CharField(max_length=15, verbose_name='Código do Produto')
     B2_LOCAL = models.CharField(max_length=2, verbose_name='Local')
     B2_QATU = models.FloatField(verbose_name='Quantidade Atual em Estoque')
     B2_RESERVA = models.FloatField(verbose_name='Quantidade Reservada')
     B2_QPEDVEN = models.FloatField(verbose_name='Quantidade em Pedido de Venda')
     D_E_L_E_T = models.CharField(max_length=1, db_column='D_E_L_E_T_', blank=True, null=True)
 
+    objects = ProtheusQuerySet.as_manager()
+
     class Meta:
         managed = False
         db_table = 'SB2010'
         app_label = 'protheus'
         verbose_name = 'Saldo em Estoque'
         verbose_name_plural = 'Saldos em Estoque'
-        unique_together = ('B2_FILIAL', 'B2_COD', 'B2_LOCAL')
+        indexes = [
+            models.Index(fields=['B2_FILIAL', 'B2_COD', 'B2_LOCAL'], name='SB20101'),
+        ]
 
     def __str__(self):
         return f'{self.B2_FILIAL} - {self.B2_COD} ({self.B2_LOCAL})'
@@ -53,9 +88,10 @@ class ProtheusSD3(models.Model):
     Modelo para mapear a tabela SD3 (Movimentações de Estoque) do Protheus.
     Armazena lançamentos de entradas, saídas, ajustes, transferências, etc.
     """
+    R_E_C_N_O = models.IntegerField(primary_key=True, db_column='R_E_C_N_O_', verbose_name='Recno')
     D3_FILIAL = models.CharField(max_length=2, verbose_name='Filial')
-    D3_COD = models.CharField(max_length=15, primary_key=True, verbose_name='Código do produto')
-    D3_TM = models.CharField(max_length=2, verbose_name='Tipo de movimento')
+    D3_COD = models.CharField(max_length=15, verbose_name='Código do produto')
+    D3_TM = models.CharField(max_length=3, verbose_name='Tipo de movimento')
     D3_EMISSAO = models.DateField(verbose_name='Data da movimentação')
     D3_QUANT = models.FloatField(verbose_name='Quantidade movimentada')
     D3_CF = models.CharField(max_length=10, verbose_name='Código fiscal')
@@ -63,12 +99,19 @@ class ProtheusSD3(models.Model):
     D3_LOCAL = models.CharField(max_length=2, verbose_name='Local (depósito)')
     D_E_L_E_T = models.CharField(max_length=1, db_column='D_E_L_E_T_', blank=True, null=True)
 
+    objects = ProtheusQuerySet.as_manager()
+
     class Meta:
         managed = False
         db_table = 'SD3010'
         app_label = 'protheus'
         verbose_name = 'Movimentação de Estoque'
         verbose_name_plural = 'Movimentações de Estoque'
+        indexes = [
+            models.Index(fields=['D3_FILIAL', 'D3_DOC', 'D3_COD'], name='SD30102'),
+            models.Index(fields=['D3_FILIAL', 'D3_COD', 'D3_LOCAL'], name='SD30103'),
+            models.Index(fields=['D3_FILIAL', 'D3_EMISSAO'], name='SD30106'),
+        ]
 
     def __str__(self):
         return f'{self.D3_DOC} - {self.D3_COD} ({self.D3_TM})'
@@ -78,6 +121,7 @@ class ProtheusSC9(models.Model):
     Modelo para mapear a tabela SC9 (Liberações/Entregas) do Protheus.
     Controla as liberações de pedidos para faturamento e entrega.
     """
+    R_E_C_N_O = models.IntegerField(primary_key=True, db_column='R_E_C_N_O_', verbose_name='Recno')
     C9_FILIAL = models.CharField(max_length=2, verbose_name='Filial')
     C9_PEDIDO = models.CharField(max_length=6, verbose_name='Número do Pedido')
     C9_ITEM = models.CharField(max_length=2, verbose_name='Item do Pedido')
@@ -106,27 +150,31 @@ class ProtheusSC9(models.Model):
     # Campo de deleção
     D_E_L_E_T = models.CharField(max_length=1, db_column='D_E_L_E_T_', blank=True, null=True)
 
+    objects = ProtheusQuerySet.as_manager()
+
     class Meta:
         managed = False
         db_table = 'SC9010'
         app_label = 'protheus'
         verbose_name = 'Liberação/Entrega'
         verbose_name_plural = 'Liberações/Entregas'
-        unique_together = ('C9_FILIAL', 'C9_PEDIDO', 'C9_ITEM', 'C9_SEQUEN')
+        indexes = [
+            models.Index(fields=['C9_FILIAL', 'C9_PEDIDO', 'C9_ITEM', 'C9_SEQUEN', 'C9_PRODUTO'], name='SC90101'),
+        ]
 
     def __str__(self):
         return f'{self.C9_FILIAL} - {self.C9_PEDIDO}/{self.C9_ITEM} - {self.C9_PRODUTO}'
 
     @property
     def status_liberacao(self):
-        """Retorna o status da liberação baseado nos campos de bloqueio"""
-        if self.C9_NFISCAL and self.C9_NFISCAL.strip():
+        """Retorna o status da liberação baseado nos campos de bloqueio (mesma regra de STATUS_LIBERACAO_SQL)"""
+        if self.C9_NFISCAL:
             return 'FATURADO'
-        elif self.C9_BLEST and self.C9_BLEST.strip():
+        elif self.C9_BLEST:
             return 'BLOQ_ESTOQUE'
-        elif self.C9_BLCRED and self.C9_BLCRED.strip():
+        elif self.C9_BLCRED:
             return 'BLOQ_CREDITO'
-        elif self.C9_OK and self.C9_OK.strip() == 'S':
+        elif self.C9_OK == 'S':
             return 'LIBERADO'
         else:
             return 'PENDENTE'
\ No newline at end of file
@@ -0,0 +1,117 @@
+# protheus/replica.py - ESCOLHA ENTRE O ORACLE PRINCIPAL E A RÉPLICA DE LEITURA
+#
+# Com DATABASES['protheus_replica'] configurado (Active Data Guard ou cópia de
+# relatórios), os endpoints de PROTHEUS_REPLICA_ENDPOINTS (agregações pesadas)
+# consultam a réplica enquanto ela estiver acessível e com atraso até
+# PROTHEUS_REPLICA_MAX_LAG segundos; fora disso voltam para o banco principal.
+# O estado da réplica fica no cache compartilhado, verificado por um único
+# processo a cada PROTHEUS_REPLICA_CHECK_INTERVAL segundos.
+
+import datetime
+import logging
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'protheus'
+REPLICA = 'protheus_replica'
+
+HEALTH_KEY = 'protheus:replica:health'
+
+# Atraso no formato do V$DATAGUARD_STATS: "+00 00:00:05"
+INTERVAL_PATTERN = re.compile(r'([+-]?\d+)\s+(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def parse_lag(value):
+    """
+    Atraso em segundos a partir de número, timedelta ou intervalo do Oracle
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    match = INTERVAL_PATTERN.match(text)
+    if match:
+        days, hours, minutes, seconds = match.groups()
+        sign = -1 if days.startswith('-') else 1
+        return sign * (abs(int(days)) * 86400 + int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+    return float(text)
+
+
+def check_replica():
+    """
+    Conecta na réplica e mede o atraso com PROTHEUS_REPLICA_LAG_SQL
+    """
+    checked_at = datetime.datetime.now().isoformat(timespec='seconds')
+    max_lag = settings.PROTHEUS_REPLICA_MAX_LAG
+    try:
+        with connections[REPLICA].cursor() as cursor:
+            lag = None
+            if max_lag:
+                cursor.execute(settings.PROTHEUS_REPLICA_LAG_SQL)
+                row = cursor.fetchone()
+                lag = parse_lag(row[0] if row else None)
+    except Exception as e:
+        return {'ok': False, 'lag': None, 'error': str(e), 'checked_at': checked_at}
+
+    if max_lag and (lag is None or lag > max_lag):
+        return {'ok': False, 'lag': lag, 'error': f"atraso de {lag}s (máximo {max_lag}s)", 'checked_at': checked_at}
+    return {'ok': True, 'lag': lag, 'error': None, 'checked_at': checked_at}
+
+
+def replica_health(refresh=False):
+    """
+    Estado da réplica ({'ok', 'lag', 'error', 'checked_at'}), do cache compartilhado
+    """
+    cache = caches['protheus']
+    health = None if refresh else cache.get(HEALTH_KEY)
+    if health is None:
+        health = check_replica()
+        if not health['ok']:
+            logger.warning(f"Réplica Protheus indisponível, usando o banco principal: {health['error']}")
+        cache.set(HEALTH_KEY, health, settings.PROTHEUS_REPLICA_CHECK_INTERVAL)
+    return health
+
+
+def mark_down(error):
+    """
+    Tira a réplica de uso até a próxima verificação (falha ao conectar)
+    """
+    logger.warning(f"Réplica Protheus fora de uso: {error}")
+    caches['protheus'].set(HEALTH_KEY, {
+        'ok': False,
+        'lag': None,
+        'error': str(error),
+        'checked_at': datetime.datetime.now().isoformat(timespec='seconds'),
+    }, settings.PROTHEUS_REPLICA_CHECK_INTERVAL)
+
+
+def database_for(endpoint):
+    """
+    Alias do banco que deve atender ``endpoint``: a réplica, se o endpoint estiver
+    em PROTHEUS_REPLICA_ENDPOINTS e ela estiver saudável, senão o principal
+    """
+    if not replica_configured() or endpoint not in settings.PROTHEUS_REPLICA_ENDPOINTS:
+        return PRIMARY
+
+    if not replica_health()['ok']:
+        return PRIMARY
+
+    # A conexão é por thread: garante que esta thread também consegue conectar
+    try:
+        connections[REPLICA].ensure_connection()
+    except DatabaseError as e:
+        mark_down(e)
+        return PRIMARY
+    return REPLICA
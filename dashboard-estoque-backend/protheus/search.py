@@ -0,0 +1,353 @@
+# protheus/search.py - ÍNDICE DE BUSCA DE PRODUTOS (CÓDIGO + DESCRIÇÃO)
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import unicodedata
+
+from core.lazy import lazy_import
+from protheus.catalog import StockCatalog
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Arquivos gravados junto de cada versão do catálogo
+INDEX_FILES = (
+    'search_doc_row',
+    'search_doc_key',
+    'search_vocab',
+    'search_token_offsets',
+    'search_token_docs',
+    'search_trigrams',
+    'search_trigram_offsets',
+    'search_trigram_tokens',
+    'search_digest',
+)
+
+# Pesos do ranking por termo: token igual > prefixo de token > substring
+WEIGHT_EXACT = 3.0
+WEIGHT_PREFIX = 2.0
+WEIGHT_SUBSTRING = 1.0
+
+# Bônus quando a busca completa bate com o código do produto
+BONUS_CODE_EXACT = 10.0
+BONUS_CODE_PREFIX = 5.0
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+
+
+def normalize(text):
+    """
+    Remove acentos, converte para maiúsculas e troca pontuação por espaço
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.encode('ascii', 'ignore').decode('ascii').upper()
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def tokenize(text):
+    return normalize(text).split()
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _csr(keys, values, size):
+    """
+    Ordena pares (chave, valor) e devolve (offsets, valores) no formato CSR
+    """
+    order = np.lexsort((values, keys))
+    keys = keys[order]
+    values = values[order]
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, values
+
+
+def _gather(offsets, values, ids):
+    """
+    Concatena as listas de postings dos ids informados (sem loop Python)
+    """
+    starts = offsets[ids]
+    lengths = offsets[ids + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.array([], dtype=values.dtype), lengths
+    shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return values[shift + np.arange(total)], lengths
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido de produtos (SB1) para busca instantânea.
+
+    Cada produto (filial + código) vira um documento com os tokens do código e
+    da descrição normalizados (sem acento). A busca por prefixo usa o vocabulário
+    ordenado; a busca por substring usa um índice de trigramas sobre o
+    vocabulário. Todos os arrays ficam na pasta da versão do catálogo e são
+    mapeados em memória, como as colunas do ``StockCatalog``.
+    """
+
+    _loaded = None
+    _loaded_version = None
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.arrays = {
+            name: np.load(catalog.path / f'{name}.npy', mmap_mode='r')
+            for name in INDEX_FILES
+        }
+        self.doc_row = self.arrays['search_doc_row']
+        self.doc_key = self.arrays['search_doc_key']
+        self.vocab = self.arrays['search_vocab']
+        self.token_offsets = self.arrays['search_token_offsets']
+        self.token_docs = self.arrays['search_token_docs']
+        self.trigrams = self.arrays['search_trigrams']
+        self.trigram_offsets = self.arrays['search_trigram_offsets']
+        self.trigram_tokens = self.arrays['search_trigram_tokens']
+
+    def __len__(self):
+        return len(self.doc_row)
+
+    @classmethod
+    def current(cls):
+        """
+        Índice da versão vigente do catálogo (a busca aceita catálogo antigo,
+        pois descrições mudam muito menos que saldos)
+        """
+        catalog = StockCatalog.current(max_age=0)
+        if catalog is None:
+            return None
+
+        version = catalog.manifest['version']
+        if cls._loaded_version != version:
+            try:
+                cls._loaded = cls(catalog)
+            except OSError as e:
+                logger.warning(f"Índice de busca da versão {version} indisponível: {e}")
+                return None
+            cls._loaded_version = version
+
+        return cls._loaded
+
+    # ------------------------------------------------------------------
+    # Construção (chamada pelo sync_stock_catalog)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _documents(catalog):
+        """
+        Um documento por filial + código (primeira linha do catálogo)
+        """
+        columns = catalog.columns
+        keys = np.char.add(
+            columns['filiais'][columns['filial_id']],
+            np.char.add(b'|', columns['code']),
+        )
+        _, first_rows = np.unique(keys, return_index=True)
+        return np.sort(first_rows).astype(np.int32)
+
+    @classmethod
+    def build(cls, catalog, previous=None):
+        """
+        Grava os arrays do índice na pasta da versão do catálogo.
+
+        Se o conjunto de produtos não mudou desde a versão anterior, os arquivos
+        anteriores são reaproveitados (as sincronizações de minuto a minuto
+        normalmente só alteram saldos).
+        """
+        columns = catalog.columns
+        doc_row = cls._documents(catalog)
+
+        codes = columns['code'][doc_row]
+        descriptions = columns['descriptions'][columns['description_id'][doc_row]]
+        filial_ids = columns['filial_id'][doc_row]
+
+        digest = hashlib.sha1()
+        for array in (doc_row, codes, descriptions, filial_ids):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest = np.array([digest.hexdigest().encode('ascii')])
+
+        if previous is not None and previous.path != catalog.path:
+            try:
+                previous_digest = np.load(previous.path / 'search_digest.npy')
+            except OSError:
+                previous_digest = None
+            if previous_digest is not None and previous_digest[0] == digest[0]:
+                for name in INDEX_FILES:
+                    source = previous.path / f'{name}.npy'
+                    target = catalog.path / f'{name}.npy'
+                    try:
+                        os.link(source, target)
+                    except OSError:
+                        shutil.copyfile(source, target)
+                return False
+
+        doc_keys = []
+        token_ids = {}
+        pair_tokens = []
+        pair_docs = []
+        for doc_id, (code, description) in enumerate(zip(codes, descriptions)):
+            code = code.decode('utf-8')
+            key = normalize(code).replace(' ', '')
+            doc_keys.append(key.encode('ascii'))
+
+            tokens = set(tokenize(code))
+            tokens.update(tokenize(description.decode('utf-8')))
+            if key:
+                tokens.add(key)
+            for token in tokens:
+                token_ids.setdefault(token, len(token_ids))
+                pair_tokens.append(token_ids[token])
+                pair_docs.append(doc_id)
+
+        # Vocabulário ordenado (necessário para busca por prefixo)
+        vocab_unsorted = list(token_ids)
+        order = sorted(range(len(vocab_unsorted)), key=vocab_unsorted.__getitem__)
+        remap = np.empty(len(order), dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        vocab = [vocab_unsorted[i] for i in order]
+
+        token_offsets, token_docs = _csr(
+            remap[np.array(pair_tokens, dtype=np.int32)] if pair_tokens else np.array([], dtype=np.int32),
+            np.array(pair_docs, dtype=np.int32),
+            len(vocab),
+        )
+
+        trigram_ids = {}
+        tri_keys = []
+        tri_tokens = []
+        for token_id, token in enumerate(vocab):
+            for trigram in _trigrams(token):
+                trigram_ids.setdefault(trigram, len(trigram_ids))
+                tri_keys.append(trigram_ids[trigram])
+                tri_tokens.append(token_id)
+
+        trigram_unsorted = list(trigram_ids)
+        order = sorted(range(len(trigram_unsorted)), key=trigram_unsorted.__getitem__)
+        tri_remap = np.empty(len(order), dtype=np.int32)
+        tri_remap[order] = np.arange(len(order), dtype=np.int32)
+        trigrams = [trigram_unsorted[i] for i in order]
+
+        trigram_offsets, trigram_tokens = _csr(
+            tri_remap[np.array(tri_keys, dtype=np.int32)] if tri_keys else np.array([], dtype=np.int32),
+            np.array(tri_tokens, dtype=np.int32),
+            len(trigrams),
+        )
+
+        def _bytes(values):
+            return np.array([v.encode('ascii') for v in values]) if values else np.array([], dtype='S1')
+
+        arrays = {
+            'search_doc_row': doc_row,
+            'search_doc_key': np.array(doc_keys) if doc_keys else np.array([], dtype='S1'),
+            'search_vocab': _bytes(vocab),
+            'search_token_offsets': token_offsets,
+            'search_token_docs': token_docs,
+            'search_trigrams': _bytes(trigrams),
+            'search_trigram_offsets': trigram_offsets,
+            'search_trigram_tokens': trigram_tokens,
+            'search_digest': digest,
+        }
+        for name in INDEX_FILES:
+            np.save(catalog.path / f'{name}.npy', arrays[name])
+
+        logger.info(f"Índice de busca: {len(doc_row)} produtos, {len(vocab)} tokens, {len(trigrams)} trigramas")
+        return True
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _match_tokens(self, term):
+        """
+        Retorna (ids de tokens, peso de cada token) que casam com o termo
+        """
+        encoded = term.encode('ascii')
+
+        if len(term) < 3:
+            # Termos curtos: somente prefixo, via faixa no vocabulário ordenado
+            lo = np.searchsorted(self.vocab, encoded, side='left')
+            hi = np.searchsorted(self.vocab, encoded + b'\xff', side='left')
+            token_ids = np.arange(lo, hi)
+        else:
+            candidates = None
+            for trigram in _trigrams(term):
+                tri_id = np.searchsorted(self.trigrams, trigram.encode('ascii'))
+                if tri_id >= len(self.trigrams) or self.trigrams[tri_id] != trigram.encode('ascii'):
+                    return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+                tokens = self.trigram_tokens[self.trigram_offsets[tri_id]:self.trigram_offsets[tri_id + 1]]
+                candidates = tokens if candidates is None else np.intersect1d(candidates, tokens, assume_unique=True)
+                if candidates.size == 0:
+                    break
+            found = self.vocab[candidates]
+            token_ids = candidates[np.char.find(found, encoded) >= 0]
+
+        words = self.vocab[token_ids]
+        weights = np.full(len(token_ids), WEIGHT_SUBSTRING, dtype=np.float32)
+        weights[np.char.startswith(words, encoded)] = WEIGHT_PREFIX
+        weights[words == encoded] = WEIGHT_EXACT
+        return token_ids.astype(np.int64), weights
+
+    def search(self, query, filial=None):
+        """
+        Retorna os índices dos documentos encontrados, ordenados por relevância
+        (``filial`` aceita um valor ou uma lista)
+        """
+        terms = tokenize(query)
+        if not terms or len(self) == 0:
+            return np.array([], dtype=np.int64)
+
+        score = np.zeros(len(self), dtype=np.float32)
+        hits = np.zeros(len(self), dtype=np.int16)
+
+        for term in dict.fromkeys(terms):
+            token_ids, weights = self._match_tokens(term)
+            if token_ids.size == 0:
+                return np.array([], dtype=np.int64)
+            docs, lengths = _gather(self.token_offsets, self.token_docs, token_ids)
+            term_score = np.zeros(len(self), dtype=np.float32)
+            np.maximum.at(term_score, docs, np.repeat(weights, lengths))
+            score += term_score
+            hits += term_score > 0
+
+        matched = np.flatnonzero(hits == len(dict.fromkeys(terms)))
+
+        if filial:
+            columns = self.catalog.columns
+            filial_ids = self.catalog._lookup_ids('filiais', filial)
+            if filial_ids.size == 0:
+                return np.array([], dtype=np.int64)
+            matched = matched[np.isin(columns['filial_id'][self.doc_row[matched]], filial_ids)]
+
+        if matched.size == 0:
+            return matched
+
+        key = ''.join(terms).encode('ascii')
+        keys = self.doc_key[matched]
+        ranked = score[matched]
+        ranked += np.where(np.char.startswith(keys, key), BONUS_CODE_PREFIX, 0)
+        ranked += np.where(keys == key, BONUS_CODE_EXACT - BONUS_CODE_PREFIX, 0)
+
+        # Maior pontuação primeiro; empate mantém a ordem do catálogo (filial + código)
+        return matched[np.argsort(-ranked, kind='stable')]
+
+    def documents(self, doc_ids):
+        """
+        Converte índices de documentos em dicts (somente a página solicitada)
+        """
+        columns = self.catalog.columns
+        results = []
+        for doc_id in doc_ids:
+            row = self.doc_row[doc_id]
+            results.append({
+                'code': columns['code'][row].decode('utf-8'),
+                'description': columns['descriptions'][columns['description_id'][row]].decode('utf-8'),
+                'filial': columns['filiais'][columns['filial_id'][row]].decode('utf-8'),
+            })
+        return results
@@ -1,5 +1,19 @@
+import datetime
+
 from rest_framework import serializers
 
+from protheus.models import ProtheusSB1, ProtheusSB2, ProtheusSD3, ProtheusSC9
+
+
+class OracleDateField(serializers.DateField):
+    """
+    DateField que aceita o ``datetime`` devolvido pelo Oracle para colunas DATE
+    """
+
+    def to_representation(self, value):
+        if isinstance(value, datetime.datetime):
+            value = value.date()
+        return super().to_representation(value)
 
 
 class StockSummarySerializer(serializers.Serializer):
@@ -10,6 +24,62 @@ class StockSummarySerializer(serializers.Serializer):
     local = serializers.CharField(required=False, allow_blank=True)
 
 
+class BalanceAtSerializer(serializers.Serializer):
+    filial = serializers.CharField(allow_blank=True)
+    code = serializers.CharField()
+    local = serializers.CharField(allow_blank=True)
+    balance = serializers.FloatField()
+
+
+class StockDiffSerializer(serializers.Serializer):
+    filial = serializers.CharField(allow_blank=True)
+    code = serializers.CharField()
+    local = serializers.CharField(allow_blank=True)
+    before = serializers.FloatField()
+    after = serializers.FloatField()
+    change = serializers.FloatField()
+
+
+class AtpPointSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    demand = serializers.FloatField()
+    projected = serializers.FloatField()
+
+
+class AtpSerializer(serializers.Serializer):
+    filial = serializers.CharField(allow_blank=True)
+    code = serializers.CharField()
+    local = serializers.CharField(allow_blank=True)
+    on_hand = serializers.FloatField()
+    reserved = serializers.FloatField()
+    released = serializers.FloatField()
+    backlog = serializers.FloatField()
+    free = serializers.FloatField()
+    available_now = serializers.FloatField()
+    promisable = serializers.FloatField()
+    shortage_date = serializers.DateField(allow_null=True)
+    profile = AtpPointSerializer(many=True)
+
+
+class BalancePointSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    balance = serializers.FloatField()
+    movement = serializers.FloatField()
+
+
+class BalanceSeriesSerializer(serializers.Serializer):
+    filial = serializers.CharField(allow_blank=True)
+    code = serializers.CharField()
+    local = serializers.CharField(allow_blank=True)
+    series = BalancePointSerializer(many=True)
+
+
+class ProductSearchSerializer(serializers.Serializer):
+    code = serializers.CharField()
+    description = serializers.CharField(required=False, allow_blank=True)
+    filial = serializers.CharField(required=False, allow_blank=True)
+
+
 class SalesSumarySerializer(serializers.Serializer):
     code = serializers.CharField()
     description = serializers.CharField()
@@ -30,6 +100,19 @@ class StockMovementSerializer(serializers.Serializer):
     filial = serializers.CharField(required=False, allow_blank=True)
 
 
+class LocationSerializer(serializers.Serializer):
+    location = serializers.CharField(allow_blank=True)
+    movement_count = serializers.IntegerField()
+
+
+class MovementSeriesPointSerializer(serializers.Serializer):
+    periodo = serializers.DateField()
+    entradas = serializers.FloatField()
+    saidas = serializers.FloatField()
+    saldo = serializers.FloatField()
+    movimentos = serializers.IntegerField()
+
+
 class DeliverySummarySerializer(serializers.Serializer):
     """
     Serializer para dados de liberação/entrega (SC9)
@@ -42,14 +125,101 @@ class DeliverySummarySerializer(serializers.Serializer):
     quantidade_liberada = serializers.FloatField()
     preco_venda = serializers.FloatField()
     valor_total = serializers.FloatField()
-    data_liberacao = serializers.DateField(required=False, allow_null=True)
+    data_liberacao = OracleDateField(required=False, allow_null=True)
     local = serializers.CharField()
     lote = serializers.CharField(required=False, allow_blank=True)
-    data_validade = serializers.DateField(required=False, allow_null=True)
+    data_validade = OracleDateField(required=False, allow_null=True)
     ordem_separacao = serializers.CharField(required=False, allow_blank=True)
     nota_fiscal = serializers.CharField(required=False, allow_blank=True)
     serie_nf = serializers.CharField(required=False, allow_blank=True)
     status_liberacao = serializers.CharField()
     bloqueio_estoque = serializers.CharField(required=False, allow_blank=True)
     bloqueio_credito = serializers.CharField(required=False, allow_blank=True)
-    filial = serializers.CharField(required=False, allow_blank=True)
\ No newline at end of file
+    filial = serializers.CharField(required=False, allow_blank=True)
+
+
+class DeliveryStatusSerializer(serializers.Serializer):
+    """
+    Serializer para o resumo de liberações por status
+    """
+    status = serializers.CharField()
+    quantidade = serializers.IntegerField()
+    valor_total = serializers.FloatField()
+
+
+class PendingDeliverySerializer(serializers.Serializer):
+    """
+    Serializer para liberações pendentes de faturamento agrupadas por pedido/produto
+    """
+    filial = serializers.CharField(required=False, allow_blank=True)
+    pedido = serializers.CharField()
+    produto = serializers.CharField()
+    descricao = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    local = serializers.CharField()
+    total_liberado = serializers.FloatField()
+    valor_total = serializers.FloatField()
+    primeira_liberacao = OracleDateField(required=False, allow_null=True)
+    ultima_liberacao = OracleDateField(required=False, allow_null=True)
+    total_itens = serializers.IntegerField()
+
+
+class PendingAgingOrderSerializer(serializers.Serializer):
+    """
+    Serializer para os pedidos mais antigos do aging de pendências
+    """
+    posicao = serializers.IntegerField()
+    pedido = serializers.CharField()
+    faixa = serializers.CharField()
+    dias = serializers.IntegerField()
+    primeira_liberacao = serializers.DateField(required=False, allow_null=True)
+    total_liberado = serializers.FloatField()
+    valor_total = serializers.FloatField()
+    total_itens = serializers.IntegerField()
+
+
+class ExpiryExposureSerializer(serializers.Serializer):
+    """
+    Serializer para exposição a vencimento (FEFO) por produto/local/lote
+    """
+    filial = serializers.CharField(required=False, allow_blank=True)
+    produto = serializers.CharField()
+    descricao = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    local = serializers.CharField()
+    lote = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    faixa_validade = serializers.CharField()
+    data_validade = serializers.DateField(required=False, allow_null=True)
+    dias_para_vencer = serializers.IntegerField()
+    quantidade = serializers.FloatField()
+    valor_total = serializers.FloatField()
+    total_itens = serializers.IntegerField()
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProtheusSB1
+        fields = ['B1_FILIAL', 'B1_COD', 'B1_DESC', 'B1_TIPO', 'B1_UM', 'B1_GRUPO']
+
+
+class StockBalanceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProtheusSB2
+        fields = ['B2_FILIAL', 'B2_COD', 'B2_LOCAL', 'B2_QATU', 'B2_RESERVA', 'B2_QPEDVEN']
+
+
+class StockMovementRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProtheusSD3
+        fields = ['D3_FILIAL', 'D3_COD', 'D3_TM', 'D3_EMISSAO', 'D3_QUANT', 'D3_CF', 'D3_DOC', 'D3_LOCAL']
+
+
+class DeliveryRecordSerializer(serializers.ModelSerializer):
+    status_liberacao = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ProtheusSC9
+        fields = [
+            'C9_FILIAL', 'C9_PEDIDO', 'C9_ITEM', 'C9_SEQUEN', 'C9_PRODUTO',
+            'C9_QTDLIB', 'C9_PRCVEN', 'C9_DATALIB', 'C9_LOCAL', 'C9_LOTECTL',
+            'C9_DTVALID', 'C9_ORDSEP', 'C9_BLEST', 'C9_BLCRED', 'C9_OK',
+            'C9_NFISCAL', 'C9_SERIENF', 'status_liberacao',
+        ]
@@ -1,49 +1,240 @@
 # protheus/services.py - INCLUINDO MOVIMENTAÇÕES PARA MÉDIA MENSAL
 
-from django.db import connections
+import datetime
 import logging
 
+from core import profiling
+from protheus.admission import QueryUnavailable, protheus_cursor
+from protheus.arrow import fetch_arrow
+from protheus.cache import cached_result, cached_value, mark_stale
+from protheus.catalog import StockCatalog
+
 logger = logging.getLogger(__name__)
 
+# Listas maiores que isso vão como um único bind (coleção Oracle) em vez de
+# um placeholder por valor
+IN_LIST_ARRAY_THRESHOLD = 50
+
+# Tamanhos das listas IN até IN_LIST_ARRAY_THRESHOLD (ver in_filter)
+IN_LIST_SIZES = (2, 4, 8, 16, 32, IN_LIST_ARRAY_THRESHOLD)
+
+# Tamanho das colunas CHAR de código de produto (B1_COD, B2_COD, D3_COD...)
+PRODUCT_CODE_WIDTH = 15
+
+
+class StringArrayParam:
+    """
+    Bind de uma lista de strings como coleção ``SYS.ODCIVARCHAR2LIST``,
+    usada com ``IN (SELECT COLUMN_VALUE FROM TABLE(:lista))``
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def bind_parameter(self, cursor):
+        return self.to_oracle(cursor.cursor.connection)
+
+    def to_oracle(self, connection):
+        collection_type = connection.gettype('SYS.ODCIVARCHAR2LIST')
+        return collection_type.newobject(self.values)
+
+
+# Liberação pendente de faturamento: sem nota fiscal e sem bloqueios
+PENDING_DELIVERY_CONDITIONS = """
+                AND (SC9.C9_NFISCAL IS NULL OR SC9.C9_NFISCAL = ' ')
+                AND (SC9.C9_BLEST IS NULL OR SC9.C9_BLEST = '  ')
+                AND (SC9.C9_BLCRED IS NULL OR SC9.C9_BLCRED = '  ')
+"""
+
+# Status da liberação (mesma regra de ProtheusSC9.status_liberacao)
+STATUS_LIBERACAO_SQL = """
+                    CASE 
+                        WHEN SC9.C9_NFISCAL IS NOT NULL AND SC9.C9_NFISCAL != ' ' THEN 'FATURADO'
+                        WHEN SC9.C9_BLEST IS NOT NULL AND SC9.C9_BLEST != '  ' THEN 'BLOQ_ESTOQUE'
+                        WHEN SC9.C9_BLCRED IS NOT NULL AND SC9.C9_BLCRED != '  ' THEN 'BLOQ_CREDITO'
+                        WHEN SC9.C9_OK = 'S' THEN 'LIBERADO'
+                        ELSE 'PENDENTE'
+                    END"""
+
+# Tempo (s) que a varredura de liberações fica no cache compartilhado
+DELIVERY_SCAN_TIMEOUT = 120
+
+# Períodos (dias) das varreduras de liberações procuradas no cache para o resumo
+# de status de um período menor ou igual (30 é o padrão do /deliveries/)
+DELIVERY_SCAN_PERIODS = (30, 60, 90)
+
+# Tempo (s) de cache do estoque direto do Oracle (sem catálogo) e das vendas
+STOCK_CACHE_TIMEOUT = 300
+SALES_CACHE_TIMEOUT = 15 * 60
+
+# Períodos das séries de movimentação -> formato do TRUNC do Oracle
+MOVEMENT_SERIES_PERIODS = {
+    'day': 'DD',
+    'week': 'IW',
+    'month': 'MM',
+}
+
+# Agrupamentos das séries de movimentação -> coluna da SD3
+MOVEMENT_SERIES_GROUPS = {
+    'product': 'SD3.D3_COD',
+    'local': 'SD3.D3_LOCAL',
+}
+
+# Faixas de aging (dias desde a primeira liberação) das pendências
+PENDING_AGING_BUCKETS = ('0-2', '3-7', '8-15', '>15')
+
+
+def parse_list(value):
+    """
+    Normaliza filtros de múltiplos valores: "01,02", ["01", "02"] ou "01"
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return list(dict.fromkeys(v.strip() for v in value if v and v.strip()))
+
+
+def in_filter(column, values, params, name, width=None):
+    """
+    Monta o predicado (= / IN / coleção) para um filtro de um ou vários valores
+    e acrescenta os binds nomeados (``name``, ``name_0``, ``name_1``...) em ``params``.
+
+    Com ``width`` os valores são completados com espaços até o tamanho da coluna
+    CHAR (como o ``ProtheusCharFilterSet``): um bind VARCHAR2 compara sem
+    completar espaços, e ``TRIM`` na coluna impediria o uso do índice.
+
+    O texto do SQL não depende dos valores: listas IN são completadas (repetindo
+    o último valor) até o próximo tamanho de IN_LIST_SIZES, então cada filtro
+    gera só alguns textos possíveis e o Oracle reaproveita o cursor já
+    compilado (sem hard parse).
+    """
+    values = parse_list(values)
+    if not values:
+        return ""
+    if width:
+        values = [value.ljust(width) for value in values]
+    
+    if len(values) == 1:
+        params[name] = values[0]
+        return f" AND {column} = %({name})s"
+    
+    if len(values) > IN_LIST_ARRAY_THRESHOLD:
+        params[name] = StringArrayParam(values)
+        return f" AND {column} IN (SELECT COLUMN_VALUE FROM TABLE(%({name})s))"
+    
+    size = next(size for size in IN_LIST_SIZES if size >= len(values))
+    values = values + [values[-1]] * (size - len(values))
+    placeholders = []
+    for i, value in enumerate(values):
+        params[f"{name}_{i}"] = value
+        placeholders.append(f"%({name}_{i})s")
+    return f" AND {column} IN ({', '.join(placeholders)})"
+
 
 class ProtheusService:
     
     @staticmethod
-    def get_stock_summary(filial=None, armazem=None):
+    def _stock_summary_query(filial=None, armazem=None, code_prefix=None):
         """
-        Consulta estoque com informações completas de filial e armazém
+        Monta o SQL de estoque (SB1 + SB2) com os filtros informados
         """
-        with connections['protheus'].cursor() as cursor:
-            sql = """
-                SELECT 
-                    SB1.B1_COD as code,
-                    SB1.B1_DESC as description,
-                    COALESCE(SB2.B2_QATU, 0) as balance,
-                    SB1.B1_FILIAL as filial,
-                    COALESCE(SB2.B2_LOCAL, '01') as local
-                FROM SB1010 SB1
-                LEFT JOIN SB2010 SB2 ON (
-                    SB1.B1_FILIAL = SB2.B2_FILIAL 
-                    AND SB1.B1_COD = SB2.B2_COD
-                    AND SB2.D_E_L_E_T_ = ' '
-                )
-                WHERE SB1.D_E_L_E_T_ = ' '
-                AND SB1.B1_MSBLQL != '1'
-            """
-            
-            params = []
-            
-            if filial:
-                sql += " AND SB1.B1_FILIAL = %s"
-                params.append(filial)
-            
-            if armazem:
-                sql += " AND SB2.B2_LOCAL = %s"
-                params.append(armazem)
-            
-            sql += " ORDER BY SB1.B1_FILIAL, SB1.B1_COD"
+        sql = """
+            SELECT 
+                SB1.B1_COD as code,
+                SB1.B1_DESC as description,
+                COALESCE(SB2.B2_QATU, 0) as balance,
+                SB1.B1_FILIAL as filial,
+                COALESCE(SB2.B2_LOCAL, '01') as local
+            FROM SB1010 SB1
+            LEFT JOIN SB2010 SB2 ON (
+                SB1.B1_FILIAL = SB2.B2_FILIAL 
+                AND SB1.B1_COD = SB2.B2_COD
+                AND SB2.D_E_L_E_T_ = ' '
+            )
+            WHERE SB1.D_E_L_E_T_ = ' '
+            AND SB1.B1_MSBLQL != '1'
+        """
+        
+        params = {}
+        
+        sql += in_filter("SB1.B1_FILIAL", filial, params, 'filial')
+        
+        sql += in_filter("SB2.B2_LOCAL", armazem, params, 'armazem')
+        
+        if code_prefix:
+            sql += " AND SB1.B1_COD LIKE %(prefixo)s"
+            params['prefixo'] = f"{code_prefix}%"
+        
+        sql += " ORDER BY SB1.B1_FILIAL, SB1.B1_COD"
+        return sql, params
+
+    @staticmethod
+    def get_stock_summary(filial=None, armazem=None, code_prefix=None, refresh=False):
+        """
+        Consulta estoque com informações completas de filial e armazém (lista de
+        dicts; ver ``select_stock``)
+        """
+        items, rows = ProtheusService.select_stock(filial, armazem, code_prefix, refresh=refresh)
+        return rows(items)
+
+    @staticmethod
+    def select_stock(filial=None, armazem=None, code_prefix=None, refresh=False):
+        """
+        Linhas de estoque filtradas, sem montar os dicts: retorna ``(items, rows)``,
+        onde ``rows(items[a:b])`` dá os dicts de um trecho (para paginar antes de
+        montar as linhas).
+
+        Usa o catálogo colunar compartilhado (``sync_stock_catalog``) quando ele
+        estiver atualizado - ``items`` são os índices das linhas no catálogo;
+        caso contrário consulta o Oracle (resultado guardado no cache
+        compartilhado por ``STOCK_CACHE_TIMEOUT``) e ``items`` já são os dicts.
+        Se o Oracle não atender e não houver cópia no cache, serve o último
+        catálogo gerado, mesmo vencido.
+        """
+        catalog = StockCatalog.current()
+        if catalog is not None:
+            indices = catalog.filter(
+                filial=parse_list(filial),
+                armazem=parse_list(armazem),
+                code_prefix=code_prefix
+            )
+            logger.info(f"Estoque (catálogo {catalog.manifest['version']}): {len(indices)} registros")
+            return indices, catalog.rows
+        
+        try:
+            results = cached_result(
+                'stock_summary',
+                ProtheusService.query_stock_summary,
+                timeout=STOCK_CACHE_TIMEOUT,
+                refresh=refresh,
+                filial=filial,
+                armazem=armazem,
+                code_prefix=code_prefix,
+            )
+            return results, list
+        except QueryUnavailable as e:
+            catalog = StockCatalog.current(max_age=0)
+            if catalog is None or refresh:
+                raise
+            logger.warning(f"Oracle indisponível ({e.reason}): estoque do catálogo {catalog.manifest['version']}")
+            mark_stale(catalog.generated_at, e.reason)
+            indices = catalog.filter(
+                filial=parse_list(filial),
+                armazem=parse_list(armazem),
+                code_prefix=code_prefix
+            )
+            return indices, catalog.rows
+
+    @staticmethod
+    def query_stock_summary(filial=None, armazem=None, code_prefix=None):
+        """
+        Consulta estoque direto no Oracle (SB1/SB2)
+        """
+        with protheus_cursor('stock_summary') as cursor:
+            sql, params = ProtheusService._stock_summary_query(filial, armazem, code_prefix)
             
-            logger.info(f"Query estoque: {sql}")
+            logger.debug(f"Query estoque: {sql}")
             cursor.execute(sql, params)
             columns = [col[0].lower() for col in cursor.description]
             
@@ -53,13 +244,71 @@ class ProtheusService:
             
             logger.info(f"Estoque: {len(results)} registros")
             return results
+
+    @staticmethod
+    def get_filiais():
+        """
+        Filiais com produtos cadastrados (do catálogo, se existir, ou do SB1)
+        """
+        catalog = StockCatalog.current(max_age=0)
+        if catalog is not None:
+            return [f.decode('utf-8') for f in catalog.columns['filiais'] if f]
+
+        with protheus_cursor('filiais') as cursor:
+            cursor.execute("""
+                SELECT DISTINCT SB1.B1_FILIAL
+                FROM SB1010 SB1
+                WHERE SB1.D_E_L_E_T_ = ' '
+                ORDER BY SB1.B1_FILIAL
+            """)
+            return [row[0] for row in cursor.fetchall() if row[0]]
+
+    @staticmethod
+    def fetch_stock_catalog_columns():
+        """
+        Lê o estoque completo em listas por coluna (sem criar um dict por linha),
+        no formato esperado por ``StockCatalog.write``
+        """
+        with protheus_cursor('stock_catalog') as cursor:
+            sql, params = ProtheusService._stock_summary_query()
+            cursor.execute(sql, params)
+            
+            codes, descriptions, balances, filiais, locais = [], [], [], [], []
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                for code, description, balance, filial, local in rows:
+                    codes.append(code)
+                    descriptions.append(description)
+                    balances.append(balance)
+                    filiais.append(filial)
+                    locais.append(local)
+            
+            return {
+                'codes': codes,
+                'descriptions': descriptions,
+                'filiais': filiais,
+                'locais': locais,
+                'balances': balances,
+            }
     
+    @staticmethod
+    def fetch_stock_catalog_arrow():
+        """
+        Estoque completo como ``pyarrow.Table`` (code, description, balance,
+        filial, local), no formato de ``StockCatalog.write_arrow``
+        """
+        with protheus_cursor('stock_catalog') as cursor:
+            sql, params = ProtheusService._stock_summary_query()
+            return fetch_arrow(cursor, sql, params)
+
     @staticmethod
     def get_sales_and_movements_summary(months=4, filial=None, armazem=None):
         """
         Busca vendas (SC5/SC6) + movimentações de saída (SD3) para cálculo da média mensal
         """
-        with connections['protheus'].cursor() as cursor:
+        with protheus_cursor('sales') as cursor:
             # PARTE 1: Vendas dos pedidos (SC5/SC6)
             sql_vendas = """
                 SELECT 
@@ -83,20 +332,17 @@ class ProtheusService:
                 )
                 WHERE SC6.D_E_L_E_T_ = ' '
                 AND SC6.C6_QTDVEN > 0
-                AND SC5.C5_EMISSAO >= ADD_MONTHS(SYSDATE, -%s)
+                AND SC5.C5_EMISSAO >= ADD_MONTHS(SYSDATE, -%(meses)s)
                 AND SC5.C5_TIPO = 'N'
                 AND SC5.C5_NOTA != ' '
             """
             
-            params_vendas = [months]
+            # Binds nomeados: as duas partes usam os mesmos (:meses, :filial...)
+            params = {'meses': months}
             
-            if filial:
-                sql_vendas += " AND SC6.C6_FILIAL = %s"
-                params_vendas.append(filial)
+            sql_vendas += in_filter("SC6.C6_FILIAL", filial, params, 'filial')
             
-            if armazem:
-                sql_vendas += " AND SC6.C6_LOCAL = %s"
-                params_vendas.append(armazem)
+            sql_vendas += in_filter("SC6.C6_LOCAL", armazem, params, 'armazem')
             
             sql_vendas += """
                 GROUP BY SC6.C6_PRODUTO, SB1.B1_DESC, SC6.C6_FILIAL, SC6.C6_LOCAL
@@ -122,20 +368,14 @@ class ProtheusService:
                     AND SB1.D_E_L_E_T_ = ' '
                 )
                 WHERE SD3.D_E_L_E_T_ = ' '
-                AND SD3.D3_EMISSAO >= ADD_MONTHS(SYSDATE, -%s)
+                AND SD3.D3_EMISSAO >= ADD_MONTHS(SYSDATE, -%(meses)s)
                 AND SD3.D3_TM IN ('501', '502', '503', '999')  -- Tipos de saída
                 AND SD3.D3_QUANT > 0
             """
             
-            params_movimentos = [months]
+            sql_movimentos += in_filter("SD3.D3_FILIAL", filial, params, 'filial')
             
-            if filial:
-                sql_movimentos += " AND SD3.D3_FILIAL = %s"
-                params_movimentos.append(filial)
-            
-            if armazem:
-                sql_movimentos += " AND SD3.D3_LOCAL = %s"
-                params_movimentos.append(armazem)
+            sql_movimentos += in_filter("SD3.D3_LOCAL", armazem, params, 'armazem')
             
             sql_movimentos += """
                 GROUP BY SD3.D3_COD, SB1.B1_DESC, SD3.D3_FILIAL, SD3.D3_LOCAL
@@ -144,10 +384,9 @@ class ProtheusService:
             
             # Combinar as duas queries
             sql_final = sql_vendas + sql_movimentos
-            params_final = params_vendas + params_movimentos
             
-            logger.info(f"Query vendas + movimentos: {sql_final}")
-            cursor.execute(sql_final, params_final)
+            logger.debug(f"Query vendas + movimentos: {sql_final}")
+            cursor.execute(sql_final, params)
             columns = [col[0].lower() for col in cursor.description]
             
             results = []
@@ -157,6 +396,53 @@ class ProtheusService:
             logger.info(f"Vendas + Movimentos: {len(results)} registros")
             return results
     
+    @staticmethod
+    def get_consolidated_sales(months=4, filial=None, armazem=None, refresh=False):
+        """
+        Vendas + movimentações de saída consolidadas por produto + filial + armazém
+        (guardadas no cache compartilhado por ``SALES_CACHE_TIMEOUT``)
+        """
+        return cached_result(
+            'sales',
+            ProtheusService._consolidate_sales,
+            timeout=SALES_CACHE_TIMEOUT,
+            refresh=refresh,
+            months=months,
+            filial=filial,
+            armazem=armazem,
+        )
+
+    @staticmethod
+    def _consolidate_sales(months=4, filial=None, armazem=None):
+        raw_data = ProtheusService.get_sales_and_movements_summary(
+            months=months,
+            filial=filial,
+            armazem=armazem
+        )
+
+        consolidated_data = {}
+        
+        with profiling.phase('consolidacao'):
+            for item in raw_data:
+                # Criar chave única por produto + filial + armazém
+                key = (item["code"], item["filial"], item["local"])
+            
+                if key not in consolidated_data:
+                    consolidated_data[key] = {
+                        "code": item["code"],
+                        "description": item["description"],
+                        "quantity": 0.0,
+                        "value": 0.0,
+                        "filial": item["filial"],
+                        "local": item["local"],
+                    }
+            
+                # Somar quantidades e valores (vendas + movimentações)
+                consolidated_data[key]["quantity"] += item["quantity"] or 0
+                consolidated_data[key]["value"] += item["value"] or 0
+
+        return list(consolidated_data.values())
+
     @staticmethod
     def get_sales_summary(months=4, filial=None):
         """
@@ -169,7 +455,7 @@ class ProtheusService:
         """
         Movimentações de estoque para visualização (mantém original)
         """
-        with connections['protheus'].cursor() as cursor:
+        with protheus_cursor('stock_movements') as cursor:
             offset = (page - 1) * page_size
             
             sql = """
@@ -189,17 +475,72 @@ class ProtheusService:
                     AND SD3.D3_EMISSAO >= ADD_MONTHS(SYSDATE, -6)
             """
             
-            params = []
+            params = {}
+            
+            sql += in_filter("SD3.D3_FILIAL", filial, params, 'filial')
+            
+            sql += in_filter("SD3.D3_LOCAL", armazem, params, 'armazem')
+            
+            # Página também como bind: o mesmo texto serve para todas as páginas
+            sql += ") WHERE rn > %(linha_inicio)s AND rn <= %(linha_fim)s"
+            params['linha_inicio'] = offset
+            params['linha_fim'] = offset + page_size
+            
+            cursor.execute(sql, params)
+            columns = [col[0].lower() for col in cursor.description]
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append(dict(zip(columns, row)))
+            
+            return results
+
+    @staticmethod
+    def get_movement_series(period='day', group='product', code=None, filial=None, local=None, months=6):
+        """
+        Entradas/saídas da SD3 por período (``TRUNC(D3_EMISSAO)`` por dia, semana ISO
+        ou mês) e por produto ou local. Tipos de movimento até 499 são entradas,
+        a partir de 500 saídas (padrão do Protheus).
+        """
+        return cached_result(
+            'movement_series',
+            ProtheusService._query_movement_series,
+            period=period,
+            group=group,
+            code=code,
+            filial=filial,
+            local=local,
+            months=months,
+        )
+
+    @staticmethod
+    def _query_movement_series(period='day', group='product', code=None, filial=None, local=None, months=6):
+        trunc_format = MOVEMENT_SERIES_PERIODS[period]
+        group_column = MOVEMENT_SERIES_GROUPS[group]
+
+        with protheus_cursor('movement_series') as cursor:
+            sql = f"""
+                SELECT 
+                    {group_column} as chave,
+                    TO_CHAR(TRUNC(SD3.D3_EMISSAO, '{trunc_format}'), 'YYYY-MM-DD') as periodo,
+                    SUM(CASE WHEN SD3.D3_TM <= '499' THEN SD3.D3_QUANT ELSE 0 END) as entradas,
+                    SUM(CASE WHEN SD3.D3_TM >= '500' THEN SD3.D3_QUANT ELSE 0 END) as saidas,
+                    COUNT(*) as movimentos
+                FROM SD3010 SD3
+                WHERE SD3.D_E_L_E_T_ = ' '
+                AND SD3.D3_EMISSAO >= ADD_MONTHS(TRUNC(SYSDATE), -%(meses)s)
+            """
             
-            if filial:
-                sql += " AND SD3.D3_FILIAL = %s"
-                params.append(filial)
+            params = {'meses': months}
             
-            if armazem:
-                sql += " AND SD3.D3_LOCAL = %s"
-                params.append(armazem)
+            sql += in_filter("SD3.D3_COD", code, params, 'produto', width=PRODUCT_CODE_WIDTH)
+            sql += in_filter("SD3.D3_FILIAL", filial, params, 'filial')
+            sql += in_filter("SD3.D3_LOCAL", local, params, 'armazem')
             
-            sql += f") WHERE rn > {offset} AND rn <= {offset + page_size}"
+            sql += f"""
+                GROUP BY {group_column}, TRUNC(SD3.D3_EMISSAO, '{trunc_format}')
+                ORDER BY {group_column}, TRUNC(SD3.D3_EMISSAO, '{trunc_format}')
+            """
             
             cursor.execute(sql, params)
             columns = [col[0].lower() for col in cursor.description]
@@ -208,6 +549,217 @@ class ProtheusService:
             for row in cursor.fetchall():
                 results.append(dict(zip(columns, row)))
             
+            logger.info(f"Série de movimentações SD3 ({period}/{group}): {len(results)} pontos")
+            return results
+
+    @staticmethod
+    def get_current_balances(filial=None, local=None, code=None, as_arrow=False):
+        """
+        Saldo atual (B2_QATU) por filial/produto/local: tuplas ou, com
+        ``as_arrow=True``, uma ``pyarrow.Table`` (filial, code, local, balance)
+        """
+        with protheus_cursor('balances') as cursor:
+            sql = """
+                SELECT 
+                    SB2.B2_FILIAL as filial,
+                    SB2.B2_COD as code,
+                    SB2.B2_LOCAL as local,
+                    SB2.B2_QATU as balance
+                FROM SB2010 SB2
+                WHERE SB2.D_E_L_E_T_ = ' '
+            """
+            
+            params = {}
+            
+            sql += in_filter("SB2.B2_FILIAL", filial, params, 'filial')
+            sql += in_filter("SB2.B2_LOCAL", local, params, 'armazem')
+            sql += in_filter("SB2.B2_COD", code, params, 'produto', width=PRODUCT_CODE_WIDTH)
+            
+            if as_arrow:
+                return fetch_arrow(cursor, sql, params)
+
+            cursor.execute(sql, params)
+            
+            results = []
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                results.extend(rows)
+
+            return results
+
+    @staticmethod
+    def fetch_atp_positions_arrow(filial):
+        """
+        Posições do disponível para promessa de uma filial numa única consulta,
+        como ``pyarrow.Table`` (filial, code, local, day, on_hand, reserved,
+        released, backlog):
+
+        - linhas sem ``day``: saldo (B2_QATU), reservado (B2_RESERVA) e
+          liberações SC9 pendentes de faturamento (já contidas na reserva);
+        - linhas com ``day`` (entrega do SC6, atrasadas contam como hoje): carteira
+          em aberto ainda não liberada, C6_QTDVEN - C6_QTDENT - liberado no SC9.
+        """
+        with protheus_cursor('atp') as cursor:
+            sql = f"""
+                SELECT
+                    filial, code, local, day,
+                    SUM(on_hand) as on_hand,
+                    SUM(reserved) as reserved,
+                    SUM(released) as released,
+                    SUM(backlog) as backlog
+                FROM (
+                    SELECT
+                        SB2.B2_FILIAL as filial,
+                        SB2.B2_COD as code,
+                        SB2.B2_LOCAL as local,
+                        CAST(NULL AS VARCHAR2(10)) as day,
+                        SB2.B2_QATU as on_hand,
+                        SB2.B2_RESERVA as reserved,
+                        0 as released,
+                        0 as backlog
+                    FROM SB2010 SB2
+                    WHERE SB2.D_E_L_E_T_ = ' '
+                    AND SB2.B2_FILIAL = %(filial)s
+
+                    UNION ALL
+
+                    SELECT
+                        SC9.C9_FILIAL, SC9.C9_PRODUTO, SC9.C9_LOCAL, NULL,
+                        0, 0, SC9.C9_QTDLIB, 0
+                    FROM SC9010 SC9
+                    WHERE SC9.D_E_L_E_T_ = ' '
+                    AND SC9.C9_QTDLIB > 0
+                    AND SC9.C9_FILIAL = %(filial)s
+                    {PENDING_DELIVERY_CONDITIONS}
+                    UNION ALL
+
+                    SELECT
+                        SC6.C6_FILIAL, SC6.C6_PRODUTO, SC6.C6_LOCAL,
+                        TO_CHAR(GREATEST(NVL(TRUNC(SC6.C6_ENTREG), TRUNC(SYSDATE)), TRUNC(SYSDATE)), 'YYYY-MM-DD'),
+                        0, 0, 0,
+                        GREATEST(SC6.C6_QTDVEN - SC6.C6_QTDENT - NVL(LIB.liberado, 0), 0)
+                    FROM SC6010 SC6
+                    LEFT JOIN (
+                        SELECT SC9.C9_FILIAL, SC9.C9_PEDIDO, SC9.C9_ITEM, SUM(SC9.C9_QTDLIB) as liberado
+                        FROM SC9010 SC9
+                        WHERE SC9.D_E_L_E_T_ = ' '
+                        AND SC9.C9_QTDLIB > 0
+                        AND SC9.C9_FILIAL = %(filial)s
+                        {PENDING_DELIVERY_CONDITIONS}
+                        GROUP BY SC9.C9_FILIAL, SC9.C9_PEDIDO, SC9.C9_ITEM
+                    ) LIB ON (
+                        LIB.C9_FILIAL = SC6.C6_FILIAL
+                        AND LIB.C9_PEDIDO = SC6.C6_NUM
+                        AND LIB.C9_ITEM = SC6.C6_ITEM
+                    )
+                    WHERE SC6.D_E_L_E_T_ = ' '
+                    AND SC6.C6_FILIAL = %(filial)s
+                    AND SC6.C6_QTDVEN > SC6.C6_QTDENT
+                    AND (SC6.C6_BLQ IS NULL OR SC6.C6_BLQ <> 'R')
+                ) posicoes
+                GROUP BY filial, code, local, day
+                HAVING SUM(on_hand) <> 0 OR SUM(reserved) <> 0 OR SUM(released) <> 0 OR SUM(backlog) <> 0
+            """
+
+            results = fetch_arrow(cursor, sql, {'filial': filial})
+            logger.info(f"Posições ATP filial {filial}: {results.num_rows} linhas")
+            return results
+
+    @staticmethod
+    def get_net_movements(start, end, filial=None, local=None, code=None, by_day=False, as_arrow=False):
+        """
+        Movimentação líquida de estoque (entradas positivas, saídas negativas) no
+        intervalo ``(start, end]`` (datas ISO) por filial/produto/local:
+
+        - SD3: tipos até 499 entram, a partir de 500 saem (estornos ignorados)
+        - SD1: notas de entrada cuja TES atualiza estoque (F4_ESTOQUE = 'S')
+        - SD2: notas de saída cuja TES atualiza estoque
+
+        Com ``by_day=True`` também agrupa por dia (coluna ``day``, ISO). Com
+        ``as_arrow=True`` retorna uma ``pyarrow.Table`` em vez de tuplas.
+        """
+        with protheus_cursor('net_movements') as cursor:
+            sources = []
+            params = {'inicio': start, 'fim': end}
+
+            sd3 = """
+                SELECT SD3.D3_FILIAL as filial, SD3.D3_COD as code, SD3.D3_LOCAL as local,
+                       SD3.D3_EMISSAO as dia,
+                       CASE WHEN SD3.D3_TM <= '499' THEN SD3.D3_QUANT ELSE -SD3.D3_QUANT END as quantidade
+                FROM SD3010 SD3
+                WHERE SD3.D_E_L_E_T_ = ' '
+                AND SD3.D3_ESTORNO <> 'S'
+                AND SD3.D3_EMISSAO >= TO_DATE(%(inicio)s, 'YYYY-MM-DD') + 1
+                AND SD3.D3_EMISSAO < TO_DATE(%(fim)s, 'YYYY-MM-DD') + 1
+            """
+            sd3 += in_filter("SD3.D3_FILIAL", filial, params, 'filial')
+            sd3 += in_filter("SD3.D3_LOCAL", local, params, 'armazem')
+            sd3 += in_filter("SD3.D3_COD", code, params, 'produto', width=PRODUCT_CODE_WIDTH)
+            sources.append(sd3)
+
+            sd1 = """
+                SELECT SD1.D1_FILIAL, SD1.D1_COD, SD1.D1_LOCAL, SD1.D1_DTDIGIT, SD1.D1_QUANT
+                FROM SD1010 SD1
+                INNER JOIN SF4010 SF4 ON (
+                    SF4.F4_FILIAL IN (SD1.D1_FILIAL, ' ')
+                    AND SF4.F4_CODIGO = SD1.D1_TES
+                    AND SF4.F4_ESTOQUE = 'S'
+                    AND SF4.D_E_L_E_T_ = ' '
+                )
+                WHERE SD1.D_E_L_E_T_ = ' '
+                AND SD1.D1_DTDIGIT >= TO_DATE(%(inicio)s, 'YYYY-MM-DD') + 1
+                AND SD1.D1_DTDIGIT < TO_DATE(%(fim)s, 'YYYY-MM-DD') + 1
+            """
+            sd1 += in_filter("SD1.D1_FILIAL", filial, params, 'filial')
+            sd1 += in_filter("SD1.D1_LOCAL", local, params, 'armazem')
+            sd1 += in_filter("SD1.D1_COD", code, params, 'produto', width=PRODUCT_CODE_WIDTH)
+            sources.append(sd1)
+
+            sd2 = """
+                SELECT SD2.D2_FILIAL, SD2.D2_COD, SD2.D2_LOCAL, SD2.D2_EMISSAO, -SD2.D2_QUANT
+                FROM SD2010 SD2
+                INNER JOIN SF4010 SF4 ON (
+                    SF4.F4_FILIAL IN (SD2.D2_FILIAL, ' ')
+                    AND SF4.F4_CODIGO = SD2.D2_TES
+                    AND SF4.F4_ESTOQUE = 'S'
+                    AND SF4.D_E_L_E_T_ = ' '
+                )
+                WHERE SD2.D_E_L_E_T_ = ' '
+                AND SD2.D2_EMISSAO >= TO_DATE(%(inicio)s, 'YYYY-MM-DD') + 1
+                AND SD2.D2_EMISSAO < TO_DATE(%(fim)s, 'YYYY-MM-DD') + 1
+            """
+            sd2 += in_filter("SD2.D2_FILIAL", filial, params, 'filial')
+            sd2 += in_filter("SD2.D2_LOCAL", local, params, 'armazem')
+            sd2 += in_filter("SD2.D2_COD", code, params, 'produto', width=PRODUCT_CODE_WIDTH)
+            sources.append(sd2)
+
+            day_column = ", TO_CHAR(TRUNC(dia), 'YYYY-MM-DD') as day" if by_day else ""
+            day_group = ", TRUNC(dia)" if by_day else ""
+
+            sql = f"""
+                SELECT filial, code, local{day_column}, SUM(quantidade) as quantity
+                FROM ({' UNION ALL '.join(sources)}) movimentos
+                GROUP BY filial, code, local{day_group}
+                HAVING SUM(quantidade) <> 0
+            """
+            
+            if as_arrow:
+                results = fetch_arrow(cursor, sql, params)
+                logger.info(f"Movimentação líquida {start} a {end}: {results.num_rows} linhas")
+                return results
+
+            cursor.execute(sql, params)
+            
+            results = []
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                results.extend(rows)
+            
+            logger.info(f"Movimentação líquida {start} a {end}: {len(results)} linhas")
             return results
 
     @staticmethod
@@ -215,7 +767,28 @@ class ProtheusService:
         """
         Busca liberações/entregas (SC9) com informações completas
         """
-        with connections['protheus'].cursor() as cursor:
+        return ProtheusService.get_deliveries_with_status(filial=filial, local=local, days=days)['rows']
+
+    @staticmethod
+    def get_deliveries_with_status(filial=None, local=None, days=30):
+        """
+        Liberações (SC9) e o resumo por status (quantidade, valor) de uma única
+        varredura, guardada no cache compartilhado por ``DELIVERY_SCAN_TIMEOUT``.
+
+        Retorna ``{'rows': [...], 'status': [...]}``.
+        """
+        return cached_result(
+            'deliveries',
+            ProtheusService._query_deliveries,
+            timeout=DELIVERY_SCAN_TIMEOUT,
+            filial=filial,
+            local=local,
+            days=days,
+        )
+
+    @staticmethod
+    def _query_deliveries(filial=None, local=None, days=30):
+        with protheus_cursor('deliveries') as cursor:
             sql = """
                 SELECT 
                     SC9.C9_FILIAL as filial,
@@ -239,13 +812,7 @@ class ProtheusService:
                     SC9.C9_OK as liberacao_ok,
                     
                     -- STATUS CALCULADO
-                    CASE 
-                        WHEN SC9.C9_NFISCAL IS NOT NULL AND SC9.C9_NFISCAL != ' ' THEN 'FATURADO'
-                        WHEN SC9.C9_BLEST IS NOT NULL AND SC9.C9_BLEST != '  ' THEN 'BLOQ_ESTOQUE'
-                        WHEN SC9.C9_BLCRED IS NOT NULL AND SC9.C9_BLCRED != '  ' THEN 'BLOQ_CREDITO'
-                        WHEN SC9.C9_OK = 'S' THEN 'LIBERADO'
-                        ELSE 'PENDENTE'
-                    END as status_liberacao
+                    """ + STATUS_LIBERACAO_SQL + """ as status_liberacao
                     
                 FROM SC9010 SC9
                 LEFT JOIN SB1010 SB1 ON (
@@ -257,72 +824,88 @@ class ProtheusService:
                 AND SC9.C9_QTDLIB > 0
             """
             
-            params = []
+            params = {}
             
             # Filtro por período (últimos N dias)
             if days:
-                sql += " AND SC9.C9_DATALIB >= SYSDATE - %s"
-                params.append(days)
+                sql += " AND SC9.C9_DATALIB >= SYSDATE - %(dias)s"
+                params['dias'] = days
             
-            if filial:
-                sql += " AND SC9.C9_FILIAL = %s"
-                params.append(filial)
+            sql += in_filter("SC9.C9_FILIAL", filial, params, 'filial')
             
-            if local:
-                sql += " AND SC9.C9_LOCAL = %s"
-                params.append(local)
+            sql += in_filter("SC9.C9_LOCAL", local, params, 'armazem')
             
-            sql += " ORDER BY SC9.C9_DATALIB DESC, SC9.C9_PEDIDO, SC9.C9_ITEM"
+            # Totais por status calculados na mesma varredura (funções analíticas)
+            sql = f"""
+                SELECT 
+                    liberacoes.*,
+                    COUNT(*) OVER (PARTITION BY status_liberacao) as status_quantidade,
+                    SUM(valor_total) OVER (PARTITION BY status_liberacao) as status_valor
+                FROM ({sql}) liberacoes
+                ORDER BY data_liberacao DESC, pedido, item
+            """
             
-            logger.info(f"Query liberações SC9: {sql}")
+            logger.debug(f"Query liberações SC9: {sql}")
             cursor.execute(sql, params)
             columns = [col[0].lower() for col in cursor.description]
             
             results = []
+            status = {}
             for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
+                item = dict(zip(columns, row))
+                quantidade = item.pop('status_quantidade')
+                valor = item.pop('status_valor')
+                status.setdefault(item['status_liberacao'], {
+                    'status': item['status_liberacao'],
+                    'quantidade': quantidade,
+                    'valor_total': valor,
+                })
+                results.append(item)
             
             logger.info(f"Liberações SC9: {len(results)} registros")
-            return results
+            return {
+                'rows': results,
+                'status': sorted(status.values(), key=lambda s: s['valor_total'] or 0, reverse=True),
+            }
 
     @staticmethod
     def get_delivery_status_summary(filial=None, days=7):
         """
-        Resumo de status das liberações por período
+        Resumo de status das liberações por período.
+
+        Se houver no cache uma varredura de liberações da filial (sem filtro de
+        local) do mesmo período ou de um maior (ver DELIVERY_SCAN_PERIODS), o
+        resumo sai dela sem nova consulta.
         """
-        with connections['protheus'].cursor() as cursor:
+        if days:
+            scan = cached_value('deliveries', filial=filial, local=None, days=days)
+            if scan is not None:
+                return scan['status']
+            for period in DELIVERY_SCAN_PERIODS:
+                if period <= days:
+                    continue
+                scan = cached_value('deliveries', filial=filial, local=None, days=period)
+                if scan is not None:
+                    return ProtheusService._delivery_status_since(scan['rows'], days)
+
+        with protheus_cursor('delivery_status') as cursor:
             sql = """
                 SELECT 
-                    CASE 
-                        WHEN SC9.C9_NFISCAL IS NOT NULL AND SC9.C9_NFISCAL != ' ' THEN 'FATURADO'
-                        WHEN SC9.C9_BLEST IS NOT NULL AND SC9.C9_BLEST != '  ' THEN 'BLOQ_ESTOQUE'
-                        WHEN SC9.C9_BLCRED IS NOT NULL AND SC9.C9_BLCRED != '  ' THEN 'BLOQ_CREDITO'
-                        WHEN SC9.C9_OK = 'S' THEN 'LIBERADO'
-                        ELSE 'PENDENTE'
-                    END as status,
+                    """ + STATUS_LIBERACAO_SQL + """ as status,
                     COUNT(*) as quantidade,
                     SUM(SC9.C9_QTDLIB * SC9.C9_PRCVEN) as valor_total
                 FROM SC9010 SC9
                 WHERE SC9.D_E_L_E_T_ = ' '
                 AND SC9.C9_QTDLIB > 0
-                AND SC9.C9_DATALIB >= SYSDATE - %s
+                AND SC9.C9_DATALIB >= SYSDATE - %(dias)s
             """
             
-            params = [days]
+            params = {'dias': days}
             
-            if filial:
-                sql += " AND SC9.C9_FILIAL = %s"
-                params.append(filial)
+            sql += in_filter("SC9.C9_FILIAL", filial, params, 'filial')
             
             sql += """
-                GROUP BY 
-                    CASE 
-                        WHEN SC9.C9_NFISCAL IS NOT NULL AND SC9.C9_NFISCAL != ' ' THEN 'FATURADO'
-                        WHEN SC9.C9_BLEST IS NOT NULL AND SC9.C9_BLEST != '  ' THEN 'BLOQ_ESTOQUE'
-                        WHEN SC9.C9_BLCRED IS NOT NULL AND SC9.C9_BLCRED != '  ' THEN 'BLOQ_CREDITO'
-                        WHEN SC9.C9_OK = 'S' THEN 'LIBERADO'
-                        ELSE 'PENDENTE'
-                    END
+                GROUP BY """ + STATUS_LIBERACAO_SQL + """
                 ORDER BY valor_total DESC
             """
             
@@ -335,12 +918,34 @@ class ProtheusService:
             
             return results
 
+    @staticmethod
+    def _delivery_status_since(rows, days):
+        """
+        Resumo por status das liberações dos últimos ``days`` dias a partir das
+        linhas de uma varredura de período maior (mesmo corte de
+        ``C9_DATALIB >= SYSDATE - dias``)
+        """
+        since = datetime.datetime.now() - datetime.timedelta(days=days)
+        status = {}
+        for row in rows:
+            released = row['data_liberacao']
+            if released is None or released < since:
+                continue
+            entry = status.setdefault(row['status_liberacao'], {
+                'status': row['status_liberacao'],
+                'quantidade': 0,
+                'valor_total': 0.0,
+            })
+            entry['quantidade'] += 1
+            entry['valor_total'] += row['valor_total'] or 0
+        return sorted(status.values(), key=lambda s: s['valor_total'], reverse=True)
+
     @staticmethod
     def get_pending_deliveries(filial=None, local=None):
         """
         Busca liberações pendentes de faturamento
         """
-        with connections['protheus'].cursor() as cursor:
+        with protheus_cursor('pending_deliveries') as cursor:
             sql = """
                 SELECT 
                     SC9.C9_FILIAL as filial,
@@ -361,20 +966,13 @@ class ProtheusService:
                 )
                 WHERE SC9.D_E_L_E_T_ = ' '
                 AND SC9.C9_QTDLIB > 0
-                AND (SC9.C9_NFISCAL IS NULL OR SC9.C9_NFISCAL = ' ')
-                AND (SC9.C9_BLEST IS NULL OR SC9.C9_BLEST = '  ')
-                AND (SC9.C9_BLCRED IS NULL OR SC9.C9_BLCRED = '  ')
-            """
+            """ + PENDING_DELIVERY_CONDITIONS
             
-            params = []
+            params = {}
             
-            if filial:
-                sql += " AND SC9.C9_FILIAL = %s"
-                params.append(filial)
+            sql += in_filter("SC9.C9_FILIAL", filial, params, 'filial')
             
-            if local:
-                sql += " AND SC9.C9_LOCAL = %s"
-                params.append(local)
+            sql += in_filter("SC9.C9_LOCAL", local, params, 'armazem')
             
             sql += """
                 GROUP BY SC9.C9_FILIAL, SC9.C9_PEDIDO, SC9.C9_PRODUTO, 
@@ -389,4 +987,146 @@ class ProtheusService:
             for row in cursor.fetchall():
                 results.append(dict(zip(columns, row)))
             
-            return results
\ No newline at end of file
+            return results
+
+    @staticmethod
+    def get_expiry_exposure(filial=None, local=None):
+        """
+        Exposição a vencimento (FEFO) das liberações ainda não faturadas,
+        agrupada por produto/local/lote e faixa de validade. Cacheado por dia.
+        """
+        return cached_result(
+            'expiry_exposure',
+            ProtheusService._query_expiry_exposure,
+            per_day=True,
+            filial=parse_list(filial),
+            local=parse_list(local),
+        )
+
+    @staticmethod
+    def _query_expiry_exposure(filial=None, local=None):
+        with protheus_cursor('expiry') as cursor:
+            sql = """
+                SELECT 
+                    SC9.C9_FILIAL as filial,
+                    SC9.C9_PRODUTO as produto,
+                    SB1.B1_DESC as descricao,
+                    SC9.C9_LOCAL as local,
+                    SC9.C9_LOTECTL as lote,
+                    SC9.C9_DTVALID as data_validade,
+                    SC9.C9_QTDLIB as quantidade,
+                    (SC9.C9_QTDLIB * SC9.C9_PRCVEN) as valor,
+                    CASE 
+                        WHEN SC9.C9_DTVALID < TRUNC(SYSDATE) THEN 'VENCIDO'
+                        WHEN SC9.C9_DTVALID < TRUNC(SYSDATE) + 30 THEN 'ATE_30'
+                        WHEN SC9.C9_DTVALID < TRUNC(SYSDATE) + 60 THEN 'ATE_60'
+                        ELSE 'ATE_90'
+                    END as faixa_validade
+                FROM SC9010 SC9
+                LEFT JOIN SB1010 SB1 ON (
+                    SC9.C9_FILIAL = SB1.B1_FILIAL 
+                    AND SC9.C9_PRODUTO = SB1.B1_COD
+                    AND SB1.D_E_L_E_T_ = ' '
+                )
+                WHERE SC9.D_E_L_E_T_ = ' '
+                AND SC9.C9_QTDLIB > 0
+                AND (SC9.C9_NFISCAL IS NULL OR SC9.C9_NFISCAL = ' ')
+                AND SC9.C9_DTVALID IS NOT NULL
+                AND SC9.C9_DTVALID < TRUNC(SYSDATE) + 90
+            """
+            
+            params = {}
+            
+            sql += in_filter("SC9.C9_FILIAL", filial, params, 'filial')
+            sql += in_filter("SC9.C9_LOCAL", local, params, 'armazem')
+            
+            # Agregação feita no Oracle: só as linhas produto/local/lote/faixa voltam
+            sql = f"""
+                SELECT 
+                    filial, produto, descricao, local, lote, faixa_validade,
+                    TO_CHAR(MIN(data_validade), 'YYYY-MM-DD') as data_validade,
+                    TRUNC(MIN(data_validade)) - TRUNC(SYSDATE) as dias_para_vencer,
+                    SUM(quantidade) as quantidade,
+                    SUM(valor) as valor_total,
+                    COUNT(*) as total_itens
+                FROM ({sql})
+                GROUP BY filial, produto, descricao, local, lote, faixa_validade
+                ORDER BY dias_para_vencer ASC, filial, produto, local, lote
+            """
+            
+            cursor.execute(sql, params)
+            columns = [col[0].lower() for col in cursor.description]
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append(dict(zip(columns, row)))
+            
+            logger.info(f"Exposição a vencimento SC9: {len(results)} lotes")
+            return results
+
+    @staticmethod
+    def get_pending_deliveries_aging(filial=None, local=None, top=10):
+        """
+        Aging das liberações pendentes por pedido, numa única consulta:
+        valor pendente por faixa de dias desde a primeira liberação
+        (0-2, 3-7, 8-15, >15) e os ``top`` pedidos mais antigos de cada filial.
+
+        Retorna as linhas dos top-N pedidos mais uma linha representante por
+        filial/faixa (``faixa_rn = 1``) com os totais da faixa (funções analíticas).
+        """
+        with protheus_cursor('pending_deliveries') as cursor:
+            sql = """
+                SELECT 
+                    SC9.C9_FILIAL as filial,
+                    SC9.C9_PEDIDO as pedido,
+                    SUM(SC9.C9_QTDLIB) as total_liberado,
+                    SUM(SC9.C9_QTDLIB * SC9.C9_PRCVEN) as valor_total,
+                    MIN(SC9.C9_DATALIB) as primeira_liberacao,
+                    COUNT(*) as total_itens
+                FROM SC9010 SC9
+                WHERE SC9.D_E_L_E_T_ = ' '
+                AND SC9.C9_QTDLIB > 0
+            """ + PENDING_DELIVERY_CONDITIONS
+            
+            params = {}
+            
+            sql += in_filter("SC9.C9_FILIAL", filial, params, 'filial')
+            sql += in_filter("SC9.C9_LOCAL", local, params, 'armazem')
+            
+            sql += " GROUP BY SC9.C9_FILIAL, SC9.C9_PEDIDO"
+            
+            sql = f"""
+                SELECT * FROM (
+                    SELECT 
+                        filial, pedido, total_liberado, valor_total, total_itens, dias, faixa,
+                        TO_CHAR(primeira_liberacao, 'YYYY-MM-DD') as primeira_liberacao,
+                        ROW_NUMBER() OVER (PARTITION BY filial ORDER BY primeira_liberacao ASC, pedido) as posicao,
+                        ROW_NUMBER() OVER (PARTITION BY filial, faixa ORDER BY pedido) as faixa_rn,
+                        SUM(valor_total) OVER (PARTITION BY filial, faixa) as faixa_valor,
+                        COUNT(*) OVER (PARTITION BY filial, faixa) as faixa_pedidos
+                    FROM (
+                        SELECT 
+                            pedidos.*,
+                            TRUNC(SYSDATE) - TRUNC(primeira_liberacao) as dias,
+                            CASE 
+                                WHEN TRUNC(SYSDATE) - TRUNC(primeira_liberacao) <= 2 THEN '0-2'
+                                WHEN TRUNC(SYSDATE) - TRUNC(primeira_liberacao) <= 7 THEN '3-7'
+                                WHEN TRUNC(SYSDATE) - TRUNC(primeira_liberacao) <= 15 THEN '8-15'
+                                ELSE '>15'
+                            END as faixa
+                        FROM ({sql}) pedidos
+                    )
+                )
+                WHERE posicao <= %(top_n)s OR faixa_rn = 1
+                ORDER BY filial, posicao
+            """
+            params['top_n'] = top
+            
+            cursor.execute(sql, params)
+            columns = [col[0].lower() for col in cursor.description]
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append(dict(zip(columns, row)))
+            
+            return results
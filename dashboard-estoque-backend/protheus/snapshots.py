@@ -0,0 +1,298 @@
+# protheus/snapshots.py - HISTÓRICO DIÁRIO DO SALDO (SB2) E DIFERENÇA ENTRE DATAS
+#
+# O ``manage.py snapshot_stock`` grava, uma vez por dia, o B2_QATU de todas as
+# chaves filial|produto|local em PROTHEUS_SNAPSHOT_DIR, em colunas comprimidas:
+#
+# - ``chaves.npy``: dicionário das chaves já vistas; cada chave ganha um id
+#   (posição no arquivo) na primeira captura em que aparece e nunca muda;
+# - ``estoque_<data>.npz``: ids em ordem crescente e saldo. A cada
+#   PROTHEUS_SNAPSHOT_FULL_EVERY dias o arquivo é completo; nos demais traz só os
+#   ids que mudaram ou surgiram (``ids``, ``balance``) e os que sumiram
+#   (``removed``) em relação ao dia ``base``.
+#
+# Um dia é remontado aplicando os deltas sobre o último completo; a diferença
+# entre dois dias junta as colunas de ids por endereço direto (ver ``compare``),
+# e só as chaves que mudaram são lidas do dicionário.
+
+import datetime
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from core.lazy import lazy_import
+from protheus import arrow
+from protheus.balances import _keys, _match, _sum_by_key, split_key
+from protheus.services import ProtheusService
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'estoque_'
+DICTIONARY_NAME = 'chaves.npy'
+
+
+def _lookup(keys, wanted):
+    """
+    Posições de ``wanted`` em ``keys`` (ordenadas) e a máscara das encontradas
+    """
+    positions = np.searchsorted(keys, wanted)
+    if not len(keys):
+        return positions, np.zeros(len(wanted), dtype=bool)
+    found = keys[np.minimum(positions, len(keys) - 1)] == wanted
+    found &= positions < len(keys)
+    return positions, found
+
+
+def compare(ids_a, balance_a, ids_b, balance_b, threshold=0.0, presence=False):
+    """
+    Junta dois saldos por id: ids cujo saldo variou mais que ``threshold``
+    (ausente = 0) e, com ``presence=True``, também os que só surgiram ou sumiram.
+    Retorna (ids ordenados, antes, depois).
+
+    Os ids são posições no dicionário (densos), então a junção é por endereço
+    direto: cada lado é espalhado num vetor do tamanho do dicionário, sem busca
+    nem ordenação.
+    """
+    size = int(max(ids_a[-1] if len(ids_a) else -1, ids_b[-1] if len(ids_b) else -1)) + 1
+    before = np.zeros(size, dtype=np.float64)
+    after = np.zeros(size, dtype=np.float64)
+    before[ids_a] = balance_a
+    after[ids_b] = balance_b
+
+    changed = np.abs(after - before) > threshold
+    if presence:
+        in_a = np.zeros(size, dtype=bool)
+        in_b = np.zeros(size, dtype=bool)
+        in_a[ids_a] = True
+        in_b[ids_b] = True
+        changed |= in_a != in_b
+
+    ids = np.flatnonzero(changed).astype(np.int32)
+    return ids, before[ids], after[ids]
+
+
+class StockSnapshots:
+    """
+    Fotografias diárias do SB2 (ver o topo do módulo)
+    """
+
+    @staticmethod
+    def directory():
+        return Path(settings.PROTHEUS_SNAPSHOT_DIR)
+
+    @classmethod
+    def path(cls, date):
+        return cls.directory() / f'{PREFIX}{date.isoformat()}.npz'
+
+    @classmethod
+    def dates(cls):
+        """
+        Datas com fotografia gravada (ordenadas)
+        """
+        directory = cls.directory()
+        if not directory.exists():
+            return []
+        dates = []
+        for path in directory.glob(f'{PREFIX}*.npz'):
+            try:
+                dates.append(datetime.date.fromisoformat(path.stem[len(PREFIX):]))
+            except ValueError:
+                continue
+        return sorted(dates)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def dictionary(cls):
+        """
+        Chaves ``filial|produto|local`` por id (mmap), vazio antes da primeira captura
+        """
+        path = cls.directory() / DICTIONARY_NAME
+        if not path.exists():
+            return np.array([], dtype='S1')
+        return _load_dictionary(str(path), path.stat().st_mtime_ns)
+
+    @classmethod
+    def load(cls, date):
+        """
+        Saldo (ids em ordem crescente, B2_QATU) da fotografia de ``date``
+        """
+        path = cls.path(date)
+        return _load(str(path), path.stat().st_mtime_ns)
+
+    @classmethod
+    def on_or_before(cls, date):
+        """
+        Fotografia mais recente até ``date`` (dias sem captura usam a anterior) ou None
+        """
+        dates = [d for d in cls.dates() if d <= date]
+        return dates[-1] if dates else None
+
+    @classmethod
+    def base_of(cls, date):
+        """
+        Dia sobre o qual a fotografia de ``date`` é um delta (None se completa)
+        """
+        with np.load(cls.path(date)) as data:
+            if 'base' not in data:
+                return None
+            return datetime.date.fromisoformat(str(data['base']))
+
+    @classmethod
+    def diff(cls, start, end, threshold=0.0, filial=None, local=None, code=None):
+        """
+        Chaves cujo saldo variou mais que ``threshold`` de ``start`` para ``end``.
+        Retorna (chaves, saldo em start, saldo em end).
+        """
+        ids_a, balance_a = cls.load(start)
+        ids_b, balance_b = cls.load(end)
+        ids, before, after = compare(ids_a, balance_a, ids_b, balance_b, threshold=threshold)
+        keys = cls.dictionary()[ids]
+        mask = _match(keys, filial=filial, local=local, code=code)
+        return keys[mask], before[mask], after[mask]
+
+    # ------------------------------------------------------------------
+    # Captura
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def encode(cls, keys):
+        """
+        Ids das ``keys`` no dicionário, acrescentando (e gravando) as chaves novas
+        """
+        dictionary = np.asarray(cls.dictionary())
+        ids = np.empty(len(keys), dtype=np.int32)
+        found = np.zeros(len(keys), dtype=bool)
+        if len(dictionary):
+            order = np.argsort(dictionary, kind='stable')
+            positions, found = _lookup(dictionary[order], keys)
+            ids[found] = order[positions[found]]
+
+        new = keys[~found]
+        if len(new):
+            ids[~found] = len(dictionary) + np.arange(len(new), dtype=np.int32)
+            width = max(dictionary.dtype.itemsize, new.dtype.itemsize)
+            merged = np.concatenate([dictionary.astype(f'S{width}'), new.astype(f'S{width}')])
+
+            directory = cls.directory()
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = directory / f'.{DICTIONARY_NAME}.tmp.npy'
+            np.save(tmp_path, merged)
+            os.replace(tmp_path, directory / DICTIONARY_NAME)
+        return ids
+
+    @classmethod
+    def capture(cls):
+        """
+        Grava o SB2 atual como a fotografia de hoje (regravando a de hoje, se
+        houver). Retorna (tipo gravado, ids gravados, total de chaves).
+        """
+        date = datetime.date.today()
+        current = ProtheusService.get_current_balances(as_arrow=True)
+        keys, balance = _sum_by_key(_keys(current), arrow.floats(current['balance']))
+        ids = cls.encode(keys)
+        order = np.argsort(ids, kind='stable')
+        ids, balance = ids[order], balance[order]
+
+        previous = [d for d in cls.dates() if d < date]
+        full = not previous
+        if previous:
+            length, day = 1, previous[-1]
+            while (day := cls.base_of(day)) is not None:
+                length += 1
+            full = length >= settings.PROTHEUS_SNAPSHOT_FULL_EVERY
+
+        directory = cls.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = directory / f'.{PREFIX}{date.isoformat()}.tmp.npz'
+        if full:
+            np.savez_compressed(tmp_path, ids=ids, balance=balance)
+            kind, written = 'completo', len(ids)
+        else:
+            base = previous[-1]
+            base_ids, base_balance = cls.load(base)
+            changed, _, values = compare(base_ids, base_balance, ids, balance, presence=True)
+            _, present = _lookup(ids, changed)
+            np.savez_compressed(
+                tmp_path,
+                base=np.array(base.isoformat()),
+                ids=changed[present],
+                balance=values[present],
+                removed=changed[~present],
+            )
+            kind, written = f'delta de {base}', len(changed)
+        os.replace(tmp_path, cls.path(date))
+
+        logger.info(f"Fotografia de estoque {date} ({kind}): {written} de {len(ids)} chaves")
+        return kind, written, len(ids)
+
+    @classmethod
+    def prune(cls, keep_after):
+        """
+        Remove as fotografias anteriores a ``keep_after``, preservando o completo
+        de que os deltas mantidos dependem (o dicionário de chaves só cresce)
+        """
+        dates = cls.dates()
+        kept = [d for d in dates if d >= keep_after]
+        if not kept:
+            return 0
+        oldest = kept[0]
+        while (base := cls.base_of(oldest)) is not None:
+            oldest = base
+
+        removed = 0
+        for date in dates:
+            if date < oldest:
+                cls.path(date).unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+@lru_cache(maxsize=2)
+def _load_dictionary(path, mtime_ns):
+    return np.load(path, mmap_mode='r')
+
+
+@lru_cache(maxsize=8)
+def _load(path, mtime_ns):
+    """
+    Remonta a fotografia de ``path`` (completo + deltas); memorizada por arquivo
+    e mtime, já que as fotografias gravadas não mudam
+    """
+    with np.load(path) as data:
+        if 'base' not in data:
+            return data['ids'], data['balance']
+        base = StockSnapshots.path(datetime.date.fromisoformat(str(data['base'])))
+        changed, values, removed = data['ids'], data['balance'], data['removed']
+
+    ids, balance = _load(str(base), base.stat().st_mtime_ns)
+    balance = balance.copy()
+
+    positions, found = _lookup(ids, changed)
+    balance[positions[found]] = values[found]
+    ids = np.insert(ids, positions[~found], changed[~found])
+    balance = np.insert(balance, positions[~found], values[~found])
+
+    if len(removed):
+        positions, found = _lookup(ids, removed)
+        keep = np.ones(len(ids), dtype=bool)
+        keep[positions[found]] = False
+        ids, balance = ids[keep], balance[keep]
+
+    return ids, balance
+
+
+def key_rows(keys, before, after):
+    """
+    Linhas da API (filial, code, local, before, after, change)
+    """
+    return [
+        {**split_key(key), 'before': b, 'after': a, 'change': a - b}
+        for key, b, a in zip(keys.tolist(), before.tolist(), after.tolist())
+    ]
@@ -0,0 +1,152 @@
+import datetime
+from unittest import mock
+
+import pyarrow as pa
+from django.test import SimpleTestCase
+
+from protheus.atp import AvailableToPromise
+from protheus.services import ProtheusService
+
+TODAY = datetime.date.today()
+
+COLUMNS = ('filial', 'code', 'local', 'day', 'on_hand', 'reserved', 'released', 'backlog')
+
+
+def day(offset):
+    return (TODAY + datetime.timedelta(days=offset)).isoformat()
+
+
+def positions(rows):
+    """
+    Tabela no formato de ``fetch_atp_positions_arrow`` (CHAR completado com espaços)
+    """
+    data = {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+    return pa.table({
+        'filial': pa.array([f.ljust(2) for f in data['filial']], pa.string()),
+        'code': pa.array([c.ljust(15) for c in data['code']], pa.string()),
+        'local': pa.array(data['local'], pa.string()),
+        'day': pa.array(data['day'], pa.string()),
+        **{name: pa.array(data[name], pa.float64()) for name in COLUMNS[4:]},
+    })
+
+
+def sb2(code, local, on_hand, reserved):
+    return ('01', code, local, None, on_hand, reserved, 0.0, 0.0)
+
+
+def sc9(code, local, released):
+    return ('01', code, local, None, 0.0, 0.0, released, 0.0)
+
+
+def sc6(code, local, offset, backlog):
+    return ('01', code, local, day(offset), 0.0, 0.0, 0.0, backlog)
+
+
+class AvailableToPromiseTests(SimpleTestCase):
+
+    def build(self, rows):
+        with mock.patch.object(ProtheusService, 'fetch_atp_positions_arrow', return_value=positions(rows)):
+            return AvailableToPromise.build('01')
+
+    def row(self, atp, code, local='01'):
+        rows = atp.rows(atp.find(code=code, local=local))
+        self.assertEqual(len(rows), 1)
+        return rows[0]
+
+    def test_several_days_per_key(self):
+        atp = self.build([
+            sb2('PROD001', '01', 100.0, 20.0),
+            sc9('PROD001', '01', 5.0),
+            # Fora de ordem e dois pedidos no mesmo dia
+            sc6('PROD001', '01', 10, 30.0),
+            sc6('PROD001', '01', 0, 15.0),
+            sc6('PROD001', '01', 3, 20.0),
+            sc6('PROD001', '01', 3, 10.0),
+            sc6('PROD001', '01', 20, 40.0),
+        ])
+        row = self.row(atp, 'PROD001')
+        self.assertEqual(row['on_hand'], 100.0)
+        self.assertEqual(row['reserved'], 20.0)
+        self.assertEqual(row['released'], 5.0)
+        self.assertEqual(row['free'], 80.0)
+        self.assertEqual(row['backlog'], 115.0)
+        self.assertEqual(row['available_now'], 65.0)
+        self.assertEqual(row['promisable'], -35.0)
+        self.assertEqual(row['shortage_date'], day(20))
+        self.assertEqual(row['profile'], [
+            {'date': day(0), 'demand': 15.0, 'projected': 65.0},
+            {'date': day(3), 'demand': 30.0, 'projected': 35.0},
+            {'date': day(10), 'demand': 30.0, 'projected': 5.0},
+            {'date': day(20), 'demand': 40.0, 'projected': -35.0},
+        ])
+
+    def test_profiles_do_not_leak_between_keys(self):
+        atp = self.build([
+            sb2('PROD001', '01', 10.0, 0.0),
+            sb2('PROD001', '02', 50.0, 0.0),
+            sb2('PROD002', '01', 5.0, 0.0),
+            sc6('PROD001', '01', 2, 4.0),
+            sc6('PROD001', '02', 1, 60.0),
+            sc6('PROD002', '01', 1, 1.0),
+            sc6('PROD001', '01', 5, 4.0),
+        ])
+        self.assertEqual(len(atp), 3)
+        first = self.row(atp, 'PROD001', '01')
+        self.assertEqual([p['projected'] for p in first['profile']], [6.0, 2.0])
+        self.assertIsNone(first['shortage_date'])
+        self.assertEqual(first['available_now'], 10.0)
+
+        second = self.row(atp, 'PROD001', '02')
+        self.assertEqual(second['shortage_date'], day(1))
+        self.assertEqual(second['promisable'], -10.0)
+
+        self.assertEqual(self.row(atp, 'PROD002')['promisable'], 4.0)
+        self.assertEqual(len(atp.find(shortage_only=True)), 1)
+
+    def test_demand_without_sb2_row(self):
+        atp = self.build([
+            sb2('PROD001', '01', 10.0, 0.0),
+            sc6('SEMSALDO', '01', 4, 7.0),
+            sc6('SEMSALDO', '01', 0, 2.0),
+        ])
+        row = self.row(atp, 'SEMSALDO')
+        self.assertEqual(row['on_hand'], 0.0)
+        self.assertEqual(row['free'], 0.0)
+        self.assertEqual(row['available_now'], -2.0)
+        self.assertEqual(row['promisable'], -9.0)
+        self.assertEqual(row['shortage_date'], day(0))
+        self.assertEqual([p['projected'] for p in row['profile']], [-2.0, -9.0])
+
+    def test_reserve_above_on_hand_is_shortage_today(self):
+        atp = self.build([
+            sb2('PROD001', '01', 10.0, 12.0),
+            sb2('PROD002', '01', 3.0, 5.0),
+            sc6('PROD002', '01', 9, 1.0),
+        ])
+        row = self.row(atp, 'PROD001')
+        self.assertEqual(row['free'], -2.0)
+        self.assertEqual(row['available_now'], -2.0)
+        self.assertEqual(row['shortage_date'], day(0))
+        self.assertEqual(row['profile'], [])
+
+        # A falta é hoje mesmo com a primeira entrega no futuro
+        self.assertEqual(self.row(atp, 'PROD002')['shortage_date'], day(0))
+
+    def test_empty_filial(self):
+        atp = self.build([])
+        self.assertEqual(len(atp), 0)
+        self.assertEqual(len(atp.find()), 0)
+        self.assertEqual(len(atp.find(code='PROD001', local='01', shortage_only=True)), 0)
+        self.assertEqual(atp.rows(atp.find()), [])
+
+    def test_find_by_code_prefix_is_exact(self):
+        atp = self.build([
+            sb2('PROD1', '01', 1.0, 0.0),
+            sb2('PROD10', '01', 1.0, 0.0),
+            sb2('PROD1', '02', 1.0, 0.0),
+        ])
+        self.assertEqual(
+            [(r['code'], r['local']) for r in atp.rows(atp.find(code='PROD1'))],
+            [('PROD1', '01'), ('PROD1', '02')],
+        )
+        self.assertEqual(len(atp.find(code=['PROD1', 'PROD10'], local='01')), 2)
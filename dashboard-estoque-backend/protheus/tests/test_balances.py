@@ -0,0 +1,199 @@
+import datetime
+import tempfile
+from unittest import mock
+
+import pyarrow as pa
+from django.test import SimpleTestCase, override_settings
+
+from protheus.balances import BalanceHistory
+from protheus.services import ProtheusService
+
+TODAY = datetime.date.today()
+
+
+def day(offset):
+    return TODAY - datetime.timedelta(days=offset)
+
+
+class FakeProtheus:
+    """
+    SB2 atual e movimentação por dia em memória, com CHAR completado com
+    espaços como no Oracle e a janela ``(start, end]`` do get_net_movements
+    """
+
+    def __init__(self, current, movements):
+        self.current = current  # {(filial, code, local): saldo}
+        self.movements = movements  # [(filial, code, local, dia, quantidade)]
+
+    @staticmethod
+    def _wanted(key, filial, local, code):
+        def accepts(value, wanted):
+            if not wanted:
+                return True
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            return value in [w.strip() for w in wanted]
+        return accepts(key[0], filial) and accepts(key[1], code) and accepts(key[2], local)
+
+    @staticmethod
+    def _table(rows, columns):
+        data = {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+        data['filial'] = [f.ljust(2) for f in data['filial']]
+        data['code'] = [c.ljust(15) for c in data['code']]
+        return pa.table(data) if rows else pa.table({name: pa.array([], pa.string()) for name in columns})
+
+    def get_current_balances(self, filial=None, local=None, code=None, as_arrow=False):
+        rows = [(*key, value) for key, value in self.current.items() if self._wanted(key, filial, local, code)]
+        table = self._table(rows, ('filial', 'code', 'local', 'balance'))
+        return table.set_column(3, 'balance', table['balance'].cast(pa.float64()))
+
+    def get_net_movements(self, start, end, filial=None, local=None, code=None, by_day=False, as_arrow=False):
+        start, end = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+        totals = {}
+        for filial_, code_, local_, date, quantity in self.movements:
+            if start < date <= end and self._wanted((filial_, code_, local_), filial, local, code):
+                group = (filial_, code_, local_) + ((date.isoformat(),) if by_day else ())
+                totals[group] = totals.get(group, 0.0) + quantity
+        columns = ('filial', 'code', 'local') + (('day',) if by_day else ()) + ('quantity',)
+        rows = [(*group, quantity) for group, quantity in totals.items() if quantity]
+        table = self._table(rows, columns)
+        return table.set_column(len(columns) - 1, 'quantity', table['quantity'].cast(pa.float64()))
+
+    def truth(self, date):
+        """
+        Saldo no fim de ``date``: atual menos tudo o que entrou/saiu depois
+        """
+        balances = dict(self.current)
+        for filial, code, local, moved_on, quantity in self.movements:
+            if moved_on > date:
+                key = (filial, code, local)
+                balances[key] = balances.get(key, 0.0) - quantity
+        return balances
+
+
+class BalanceHistoryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.fake = FakeProtheus(
+            current={
+                ('01', 'PROD001', '01'): 100.0,
+                ('01', 'PROD001', '02'): 7.0,
+                ('01', 'PROD002', '01'): 40.0,
+                ('02', 'PROD001', '01'): 0.0,
+            },
+            movements=[
+                ('01', 'PROD001', '01', day(1), 10.0),
+                ('01', 'PROD001', '01', day(4), -25.0),
+                ('01', 'PROD001', '01', day(4), 5.0),
+                ('01', 'PROD001', '01', day(9), 30.0),
+                ('01', 'PROD001', '02', day(6), -3.0),
+                ('01', 'PROD002', '01', day(12), 8.0),
+                ('02', 'PROD001', '01', day(2), -4.0),
+                ('02', 'PROD001', '01', day(7), 4.0),
+                # Só na movimentação (sem linha no SB2): zerada hoje
+                ('01', 'PROD003', '01', day(8), 6.0),
+                ('01', 'PROD003', '01', day(3), -6.0),
+                # Saída sem linha no SB2: saldo atual fica fora do SB2, mas o
+                # passado é reconstruído
+                ('02', 'PROD009', '05', day(5), -2.0),
+            ],
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROTHEUS_BALANCE_DIR=directory.name))
+        self.enterContext(mock.patch.object(
+            ProtheusService, 'get_current_balances', side_effect=self.fake.get_current_balances
+        ))
+        self.enterContext(mock.patch.object(
+            ProtheusService, 'get_net_movements', side_effect=self.fake.get_net_movements
+        ))
+
+    def balances(self, date, **filters):
+        keys, balance, anchor = BalanceHistory.balances_at(date, **filters)
+        result = {}
+        for key, value in zip(keys.tolist(), balance.tolist()):
+            filial, code, local = key.decode().split('|')
+            result[(filial, code, local)] = value
+        return result, anchor
+
+    def expected(self, date, **filters):
+        return {
+            key: value for key, value in self.fake.truth(date).items()
+            if FakeProtheus._wanted(key, filters.get('filial'), filters.get('local'), filters.get('code'))
+        }
+
+    def assertBalances(self, got, expected):
+        # Chaves ausentes de um lado valem zero
+        for key in set(got) | set(expected):
+            self.assertAlmostEqual(got.get(key, 0.0), expected.get(key, 0.0), msg=key)
+
+    def test_current_balance_anchor(self):
+        for offset in range(0, 14):
+            got, anchor = self.balances(day(offset))
+            self.assertIsNone(anchor)
+            self.assertBalances(got, self.expected(day(offset)))
+
+    def test_checkpoint_anchors_match_current_anchor(self):
+        date = day(6)
+        from_current, _ = self.balances(date)
+
+        # Checkpoint antes da data (aplica a movimentação) e depois (desfaz)
+        written = BalanceHistory.build_checkpoints([day(8), day(5)])
+        self.assertEqual(written, [day(5), day(8)])
+
+        with mock.patch.object(BalanceHistory, 'checkpoints', return_value=[day(8)]):
+            before, anchor = self.balances(date)
+            self.assertEqual(anchor, day(8))
+        with mock.patch.object(BalanceHistory, 'checkpoints', return_value=[day(5)]):
+            after, anchor = self.balances(date)
+            self.assertEqual(anchor, day(5))
+
+        self.assertBalances(before, from_current)
+        self.assertBalances(after, from_current)
+        self.assertBalances(from_current, self.expected(date))
+
+    def test_checkpoints_match_truth(self):
+        dates = [day(offset) for offset in (1, 2, 4, 7, 11, 13)]
+        BalanceHistory.build_checkpoints(dates + [TODAY])
+        self.assertEqual(BalanceHistory.checkpoints(), sorted(dates))
+        for date in dates:
+            keys, balance = BalanceHistory.load_checkpoint(date)
+            got = {tuple(k.decode().split('|')): v for k, v in zip(keys.tolist(), balance.tolist())}
+            self.assertBalances(got, self.fake.truth(date))
+
+    def test_keys_only_in_movements(self):
+        got, _ = self.balances(day(5))
+        self.assertAlmostEqual(got[('01', 'PROD003', '01')], 6.0)
+        # A saída é do próprio dia 5: fora da janela (5, hoje]
+        self.assertAlmostEqual(got.get(('02', 'PROD009', '05'), 0.0), 0.0)
+        got, _ = self.balances(day(6))
+        self.assertAlmostEqual(got[('02', 'PROD009', '05')], 2.0)
+
+        BalanceHistory.build_checkpoints([day(10)])
+        got, anchor = self.balances(day(9))
+        self.assertEqual(anchor, day(10))
+        self.assertAlmostEqual(got[('01', 'PROD003', '01')], 0.0)
+        self.assertAlmostEqual(got[('02', 'PROD009', '05')], 2.0)
+
+    def test_filters_with_checkpoint(self):
+        BalanceHistory.build_checkpoints([day(7)])
+        got, anchor = self.balances(day(6), filial='01', code='PROD001')
+        self.assertEqual(anchor, day(7))
+        self.assertBalances(got, self.expected(day(6), filial='01', code='PROD001'))
+
+    def test_daily_series(self):
+        start, end = day(10), day(0)
+        results, _ = BalanceHistory.daily_series(start, end)
+        series = {(r['filial'], r['code'], r['local']): r['series'] for r in results}
+
+        for key in set(self.fake.truth(start)) | set(self.fake.current):
+            points = series[key]
+            self.assertEqual(points[0]['date'], start.isoformat())
+            # Degraus: o saldo de cada dia é o do último ponto até ele
+            for offset in range(10, -1, -1):
+                date = day(offset)
+                value = [p['balance'] for p in points if p['date'] <= date.isoformat()][-1]
+                self.assertAlmostEqual(value, self.fake.truth(date).get(key, 0.0), msg=(key, date))
+
+        # Movimentos do mesmo dia viram um ponto só
+        dates = [p['date'] for p in series[('01', 'PROD001', '01')]]
+        self.assertEqual(len(dates), len(set(dates)))
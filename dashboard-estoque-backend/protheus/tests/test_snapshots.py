@@ -0,0 +1,146 @@
+import datetime
+import tempfile
+import types
+from unittest import mock
+
+import numpy as np
+import pyarrow as pa
+from django.test import SimpleTestCase, override_settings
+
+from protheus import snapshots
+from protheus.services import ProtheusService
+from protheus.snapshots import StockSnapshots
+
+START = datetime.date(2026, 3, 1)
+
+
+class FakeDate(datetime.date):
+    current = START
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+class StockSnapshotsTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROTHEUS_SNAPSHOT_DIR=directory.name, PROTHEUS_SNAPSHOT_FULL_EVERY=7))
+        self.enterContext(mock.patch.object(
+            snapshots, 'datetime', types.SimpleNamespace(date=FakeDate, timedelta=datetime.timedelta)
+        ))
+        self.enterContext(mock.patch.object(
+            ProtheusService, 'get_current_balances', side_effect=self.current_balances
+        ))
+        snapshots._load.cache_clear()
+        snapshots._load_dictionary.cache_clear()
+        self.sb2 = {}
+        self.captured = {}
+
+    def current_balances(self, filial=None, local=None, code=None, as_arrow=False):
+        keys = sorted(self.sb2)
+        return pa.table({
+            'filial': [k[0].ljust(2) for k in keys],
+            'code': [k[1].ljust(15) for k in keys],
+            'local': [k[2] for k in keys],
+            'balance': pa.array([self.sb2[k] for k in keys], pa.float64()),
+        })
+
+    def capture(self, date):
+        FakeDate.current = date
+        kind, written, total = StockSnapshots.capture()
+        self.captured[date] = dict(self.sb2)
+        return kind
+
+    def loaded(self, date):
+        ids, balance = StockSnapshots.load(date)
+        self.assertTrue(np.all(np.diff(ids) > 0), 'ids em ordem crescente e únicos')
+        keys = StockSnapshots.dictionary()[ids]
+        return {tuple(k.decode().split('|')): v for k, v in zip(keys.tolist(), balance.tolist())}
+
+    def test_full_then_deltas_round_trip(self):
+        days = [START + datetime.timedelta(days=i) for i in range(4)]
+        self.sb2 = {('01', 'PROD001', '01'): 10.0, ('01', 'PROD002', '01'): 5.0, ('02', 'PROD001', '03'): 0.0}
+        self.assertEqual(self.capture(days[0]), 'completo')
+
+        # Só saldos alterados
+        self.sb2[('01', 'PROD001', '01')] = 12.5
+        self.assertEqual(self.capture(days[1]), f'delta de {days[0]}')
+
+        # Chaves novas (ids novos no dicionário, código mais longo) e removidas
+        del self.sb2[('01', 'PROD002', '01')]
+        self.sb2[('01', 'PRODUTO-LONGO-9', '02')] = 3.0
+        self.sb2[('03', 'A', '01')] = -1.0
+        self.assertEqual(self.capture(days[2]), f'delta de {days[1]}')
+
+        # Chave removida que volta (reaproveita o id antigo)
+        self.sb2[('01', 'PROD002', '01')] = 7.0
+        del self.sb2[('02', 'PROD001', '03')]
+        self.capture(days[3])
+
+        self.assertIsNone(StockSnapshots.base_of(days[0]))
+        self.assertEqual(StockSnapshots.base_of(days[3]), days[2])
+        self.assertEqual(len(StockSnapshots.dictionary()), 5)
+
+        snapshots._load.cache_clear()
+        for date in days:
+            self.assertEqual(self.loaded(date), self.captured[date], date)
+
+    def test_recapture_same_day_and_full_every(self):
+        self.sb2 = {('01', 'PROD001', '01'): 1.0}
+        with override_settings(PROTHEUS_SNAPSHOT_FULL_EVERY=3):
+            kinds = []
+            for i in range(7):
+                self.sb2[('01', 'PROD001', '01')] += 1
+                kinds.append(self.capture(START + datetime.timedelta(days=i)).split()[0])
+            self.assertEqual(kinds, ['completo', 'delta', 'delta', 'completo', 'delta', 'delta', 'completo'])
+
+            # Regravar o dia troca o arquivo sem quebrar a cadeia
+            self.sb2[('01', 'PROD001', '01')] = 99.0
+            self.capture(START + datetime.timedelta(days=5))
+
+        snapshots._load.cache_clear()
+        for date, expected in self.captured.items():
+            self.assertEqual(self.loaded(date), expected, date)
+
+    def test_prune_keeps_bases_of_kept_deltas(self):
+        days = [START + datetime.timedelta(days=i) for i in range(10)]
+        self.sb2 = {('01', 'PROD001', '01'): 0.0}
+        with override_settings(PROTHEUS_SNAPSHOT_FULL_EVERY=4):
+            for i, date in enumerate(days):
+                self.sb2[('01', 'PROD001', '01')] = float(i)
+                self.sb2[('01', f'NOVO{i}', '01')] = float(i)
+                self.capture(date)
+        # Completos em 0, 4 e 8
+        self.assertEqual([d for d in days if StockSnapshots.base_of(d) is None], [days[0], days[4], days[8]])
+
+        # Manter a partir do dia 6 exige o completo do dia 4 e o delta do dia 5
+        removed = StockSnapshots.prune(keep_after=days[6])
+        self.assertEqual(removed, 4)
+        self.assertEqual(StockSnapshots.dates(), days[4:])
+
+        snapshots._load.cache_clear()
+        for date in days[4:]:
+            self.assertEqual(self.loaded(date), self.captured[date], date)
+
+        # A partir de um completo nada anterior é necessário
+        self.assertEqual(StockSnapshots.prune(keep_after=days[8]), 4)
+        self.assertEqual(StockSnapshots.dates(), days[8:])
+        snapshots._load.cache_clear()
+        self.assertEqual(self.loaded(days[9]), self.captured[days[9]])
+
+    def test_diff_counts_removed_and_added_keys(self):
+        first, second = START, START + datetime.timedelta(days=1)
+        self.sb2 = {('01', 'PROD001', '01'): 10.0, ('01', 'PROD002', '01'): 4.0, ('02', 'PROD001', '01'): 1.0}
+        self.capture(first)
+        self.sb2 = {('01', 'PROD001', '01'): 10.5, ('02', 'PROD001', '01'): 1.0, ('01', 'PROD003', '02'): 9.0}
+        self.capture(second)
+
+        keys, before, after = StockSnapshots.diff(first, second, threshold=1.0)
+        changes = {k.decode(): (b, a) for k, b, a in zip(keys.tolist(), before.tolist(), after.tolist())}
+        self.assertEqual(changes, {'01|PROD002|01': (4.0, 0.0), '01|PROD003|02': (0.0, 9.0)})
+
+        keys, _, _ = StockSnapshots.diff(first, second, filial='01', code='PROD001')
+        self.assertEqual(keys.tolist(), [b'01|PROD001|01'])
@@ -0,0 +1,100 @@
+# protheus/throttling.py - LIMITE DE REQUISIÇÕES POR CLIENTE
+#
+# Os throttles padrão do DRF guardam o histórico no cache "default" (memória
+# local de cada worker) com leitura e gravação separadas. Estes guardam o
+# histórico em arquivos de PROTHEUS_THROTTLE_DIR travados com flock (como as
+# vagas de protheus/admission.py): a leitura, a contagem e a gravação são uma
+# operação só entre todos os workers, então o limite vale para o servidor
+# inteiro mesmo numa rajada, e o cache das consultas (``protheus``) não recebe
+# uma gravação por requisição.
+#
+# Os clientes são espalhados em THROTTLE_BUCKETS arquivos (JSON com o histórico
+# de cada chave); chaves sem requisições na janela saem na gravação seguinte.
+
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.throttling import ScopedRateThrottle, SimpleRateThrottle
+
+THROTTLE_BUCKETS = 64
+
+
+@contextmanager
+def locked_bucket(key):
+    """
+    Históricos do arquivo da ``key`` ({chave: {'history', 'expires'}}) com o
+    arquivo travado; o dicionário é gravado de volta ao sair do bloco
+    """
+    directory = Path(settings.PROTHEUS_THROTTLE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    bucket = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % THROTTLE_BUCKETS
+
+    fd = os.open(directory / f'{bucket}.json', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        with os.fdopen(os.dup(fd), 'r+', encoding='utf-8') as fh:
+            try:
+                table = json.loads(fh.read() or '{}')
+            except ValueError:
+                table = {}
+            yield table
+            fh.seek(0)
+            fh.truncate()
+            fh.write(json.dumps(table))
+    finally:
+        # Fechar o descritor libera a trava
+        os.close(fd)
+
+
+class LockedHistoryRateThrottle(SimpleRateThrottle):
+    """
+    ``SimpleRateThrottle`` com o histórico em ``locked_bucket``
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        with locked_bucket(self.key) as table:
+            for key in [k for k, entry in table.items() if entry['expires'] <= self.now]:
+                del table[key]
+
+            entry = table.get(self.key)
+            self.history = [t for t in (entry['history'] if entry else []) if t > self.now - self.duration]
+            allowed = len(self.history) < self.num_requests
+            if allowed:
+                self.history.insert(0, self.now)
+            if self.history:
+                table[self.key] = {'history': self.history, 'expires': self.history[0] + self.duration}
+
+        return allowed
+
+
+class ClientRateThrottle(LockedHistoryRateThrottle):
+    """
+    Limite geral por cliente (IP ou usuário autenticado) - escopo "cliente"
+    """
+    scope = 'cliente'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class ClientScopedRateThrottle(ScopedRateThrottle, LockedHistoryRateThrottle):
+    """
+    Limite por cliente das views com ``throttle_scope`` (ex.: "consulta_pesada")
+    """
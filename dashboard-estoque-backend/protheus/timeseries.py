@@ -0,0 +1,50 @@
+# protheus/timeseries.py - REDUÇÃO DE SÉRIES TEMPORAIS PARA GRÁFICOS
+
+from core.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: índices dos ``threshold`` pontos que melhor
+    preservam o formato visual da série (x crescente).
+
+    O primeiro e o último ponto são sempre mantidos; se a série já tiver
+    ``threshold`` pontos ou menos, todos os índices são retornados.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Limites dos baldes intermediários (o primeiro e o último ponto ficam fora)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+
+        # Média do balde seguinte (ou o último ponto, no último balde)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Área do triângulo (ponto escolhido anterior, candidato, média seguinte)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
@@ -1,12 +1,23 @@
 from django.urls import path
 from protheus.views import (
      StockView, 
+     StockBalanceAtView,
+     StockBalanceSeriesView,
+     StockDiffView,
+     StockAtpView,
+     ProductSearchView,
      StockMovementView,
+     StockMovementSeriesView,
      SalesView,
      LocationsView, 
      DeliveryView, 
      DeliveryStatusView, 
-     PendingDeliveriesView
+     PendingDeliveriesView,
+     DeliveryExpiryView,
+     ProductListView,
+     StockBalanceListView,
+     StockMovementListView,
+     DeliveryListView,
 )
 
 
@@ -14,10 +25,23 @@ app_name = "protheus"
 
 urlpatterns = [
     path("stocks/", StockView.as_view(), name="stocks-summary"),
+    path("stocks/balance_at/", StockBalanceAtView.as_view(), name="stocks-balance-at"),
+    path("stocks/balance_series/", StockBalanceSeriesView.as_view(), name="stocks-balance-series"),
+    path("stocks/diff/", StockDiffView.as_view(), name="stocks-diff"),
+    path("stocks/atp/", StockAtpView.as_view(), name="stocks-atp"),
+    path("products/search/", ProductSearchView.as_view(), name="products-search"),
     path("stocks_moviment/", StockMovementView.as_view(), name="stocks-moviment-summary"),
+    path("stocks_moviment/series/", StockMovementSeriesView.as_view(), name="stocks-moviment-series"),
     path("sales/", SalesView.as_view(), name="sales-summary"),
     path("locations/", LocationsView.as_view(), name="locations-list"), 
     path("deliveries/", DeliveryView.as_view(), name="deliveries-list"),
     path("deliveries/status/", DeliveryStatusView.as_view(), name="deliveries-status"),
     path("deliveries/pending/", PendingDeliveriesView.as_view(), name="deliveries-pending"),
+    path("deliveries/expiry/", DeliveryExpiryView.as_view(), name="deliveries-expiry"),
+
+    # Listagens via ORM (FilterSets de protheus/filters.py)
+    path("products/", ProductListView.as_view(), name="products-list"),
+    path("stocks/balances/", StockBalanceListView.as_view(), name="stocks-balances-list"),
+    path("stocks_moviment/records/", StockMovementListView.as_view(), name="stocks-moviment-list"),
+    path("deliveries/records/", DeliveryListView.as_view(), name="deliveries-records"),
 ]
\ No newline at end of file
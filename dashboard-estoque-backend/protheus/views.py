@@ -1,32 +1,68 @@
+import datetime
+
+from django.conf import settings
+from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 
-from protheus.services import ProtheusService
+from core.lazy import lazy_import
+from protheus.admission import QueryUnavailable, oracle_session
+from protheus.atp import AvailableToPromise
+from protheus.balances import BalanceHistory, split_key
+from protheus.filters import StockMovementFilter, ProductFilter, StockFilter, DeliveryFilter
+from protheus.models import ProtheusSB1, ProtheusSB2, ProtheusSD3, ProtheusSC9
+from protheus.pagination import StandardPagination
+from protheus.replica import PRIMARY, database_for
+from protheus.services import (
+    ProtheusService,
+    MOVEMENT_SERIES_GROUPS,
+    MOVEMENT_SERIES_PERIODS,
+    PENDING_AGING_BUCKETS,
+    parse_list,
+)
+from protheus.search import ProductSearchIndex
+from protheus.snapshots import StockSnapshots, key_rows
+from protheus.timeseries import lttb
 from protheus.serializers import (
     StockSummarySerializer,
+    BalanceAtSerializer,
+    BalanceSeriesSerializer,
+    StockDiffSerializer,
+    AtpSerializer,
+    ProductSearchSerializer,
     StockMovementSerializer,
+    MovementSeriesPointSerializer,
+    LocationSerializer,
     SalesSumarySerializer,
     DeliverySummarySerializer,
+    DeliveryStatusSerializer,
+    PendingDeliverySerializer,
+    PendingAgingOrderSerializer,
+    ExpiryExposureSerializer,
+    ProductSerializer,
+    StockBalanceSerializer,
+    StockMovementRecordSerializer,
+    DeliveryRecordSerializer,
 )
 
+np = lazy_import('numpy')
 
-class StandardPagination(PageNumberPagination):
-    page_size = 50
-    page_size_query_param = 'page_size'
-    max_page_size = 1000
 
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'total_pages': self.page.paginator.num_pages,
-            'current_page': self.page.number,
-            'page_size': self.get_page_size(self.request),
-            'results': data
-        })
+def overloaded_response(view_name, error):
+    """
+    503 quando o Oracle não atendeu a consulta e não havia cópia vencida no cache
+    (sem vaga, tempo esgotado ou disjuntor aberto - ver protheus/admission.py)
+    """
+    print(f"⏳ {view_name} - {error}")
+    retry_after = error.retry_after or settings.PROTHEUS_RETRY_AFTER
+    response = Response({
+        'error': str(error),
+        'reason': error.reason,
+        'retry_after': retry_after,
+    }, status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
 
 
 class StockView(APIView):
@@ -36,40 +72,28 @@ class StockView(APIView):
         try:
             filial_filter = request.query_params.get('filial', '')
             armazem_filter = request.query_params.get('armazem', '')
+            code_filter = request.query_params.get('code', '').strip()
             
-            print(f"📦 StockView - Filtros: filial={filial_filter}, armazem={armazem_filter}")
+            print(f"📦 StockView - Filtros: filial={filial_filter}, armazem={armazem_filter}, code={code_filter}")
             
-            # Buscar dados com filtros aplicados
-            raw_data = ProtheusService.get_stock_summary(
+            # Buscar dados com filtros aplicados (índices do catálogo ou dicts)
+            items, rows = ProtheusService.select_stock(
                 filial=filial_filter if filial_filter else None,
-                armazem=armazem_filter if armazem_filter else None
+                armazem=armazem_filter if armazem_filter else None,
+                code_prefix=code_filter if code_filter else None
             )
 
-            data = []
-            for item in raw_data:
-                try:
-                    formatted_item = {
-                        "code": str(item.get("code", "")),
-                        "description": str(item.get("description", "")),
-                        "balance": float(item.get("balance", 0)),
-                        "filial": str(item.get("filial", "")),
-                        "local": str(item.get("local", "")),
-                    }
-                    data.append(formatted_item)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar item de estoque: {e}")
-                    continue
-
-            print(f"✅ StockView - {len(data)} itens processados")
+            print(f"✅ StockView - {len(items)} itens processados")
 
-            # Aplicar paginação
+            # Paginar antes de montar as linhas: só a página vira dict
             paginator = StandardPagination()
-            paginated_data = paginator.paginate_queryset(data, request)
-            serializer = StockSummarySerializer(paginated_data, many=True)
+            page = paginator.paginate_queryset(items, request)
+            serializer = StockSummarySerializer(rows(page), many=True)
 
             return paginator.get_paginated_response(serializer.data)
             
+        except QueryUnavailable as e:
+            return overloaded_response('StockView', e)
         except Exception as e:
             print(f"❌ Erro na StockView: {e}")
             return Response({
@@ -84,8 +108,153 @@ class StockView(APIView):
             }, status=500)
 
 
+class ProductSearchView(APIView):
+    """
+    Busca instantânea de produtos por código e descrição (prefixo, substring e
+    sem acentos), servida pelo índice em memória gerado no sync_stock_catalog
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            query = request.query_params.get('q', '').strip()
+            filial_filter = request.query_params.get('filial', '')
+
+            paginator = StandardPagination()
+
+            index = ProductSearchIndex.current()
+            if index is None:
+                return Response({
+                    'error': 'Índice de busca indisponível (execute sync_stock_catalog)',
+                    'count': 0,
+                    'results': []
+                }, status=503)
+
+            doc_ids = index.search(query, filial=parse_list(filial_filter))
+
+            page = paginator.paginate_queryset(doc_ids, request)
+            serializer = ProductSearchSerializer(index.documents(page), many=True)
+
+            return paginator.get_paginated_response(serializer.data)
+
+        except QueryUnavailable as e:
+            return overloaded_response('ProductSearchView', e)
+        except Exception as e:
+            print(f"❌ Erro na ProductSearchView: {e}")
+            return Response({
+                'error': f'Erro na busca de produtos: {str(e)}',
+                'count': 0,
+                'next': None,
+                'previous': None,
+                'total_pages': 0,
+                'current_page': 1,
+                'page_size': 50,
+                'results': []
+            }, status=500)
+
+
+class StockMovementSeriesView(APIView):
+    """
+    API de séries temporais de movimentações (SD3): entradas/saídas por período
+    (dia, semana ou mês) e por produto ou local, com redução opcional por LTTB
+    """
+    # permission_classes = [IsAuthenticated]
+    throttle_scope = 'consulta_pesada'
+
+    def get(self, request):
+        try:
+            period = request.query_params.get('period', 'day')
+            group = request.query_params.get('group', 'product')
+            code_filter = request.query_params.get('code', '')
+            filial_filter = request.query_params.get('filial', '')
+            local_filter = request.query_params.get('local', '') or request.query_params.get('armazem', '')
+            months = max(1, min(int(request.query_params.get('months', 6)), 36))
+            points = max(0, int(request.query_params.get('points', 0)))
+
+            if period not in MOVEMENT_SERIES_PERIODS or group not in MOVEMENT_SERIES_GROUPS:
+                return Response({
+                    'error': (
+                        f"Parâmetros inválidos: period deve ser {', '.join(MOVEMENT_SERIES_PERIODS)} "
+                        f"e group deve ser {', '.join(MOVEMENT_SERIES_GROUPS)}"
+                    ),
+                    'data': []
+                }, status=400)
+            
+            print(f"📈 StockMovementSeriesView - period={period}, group={group}, code={code_filter}, "
+                  f"filial={filial_filter}, local={local_filter}, months={months}, points={points}")
+            
+            raw_data = ProtheusService.get_movement_series(
+                period=period,
+                group=group,
+                code=parse_list(code_filter) or None,
+                filial=filial_filter if filial_filter else None,
+                local=local_filter if local_filter else None,
+                months=months
+            )
+
+            # Linhas já vêm ordenadas por chave + período
+            series = {}
+            for item in raw_data:
+                series.setdefault(item['chave'], []).append(item)
+
+            data = []
+            for chave, rows in series.items():
+                entradas = np.array([r['entradas'] or 0 for r in rows], dtype=float)
+                saidas = np.array([r['saidas'] or 0 for r in rows], dtype=float)
+
+                if points and len(rows) > points:
+                    x = np.array([
+                        datetime.date.fromisoformat(r['periodo']).toordinal() for r in rows
+                    ])
+                    selected = lttb(x, entradas + saidas, points)
+                else:
+                    selected = range(len(rows))
+
+                data.append({
+                    'chave': chave,
+                    'pontos': len(rows),
+                    'total_entradas': float(entradas.sum()),
+                    'total_saidas': float(saidas.sum()),
+                    'series': MovementSeriesPointSerializer(
+                        [
+                            {
+                                'periodo': rows[i]['periodo'],
+                                'entradas': entradas[i],
+                                'saidas': saidas[i],
+                                'saldo': entradas[i] - saidas[i],
+                                'movimentos': rows[i].get('movimentos') or 0,
+                            }
+                            for i in selected
+                        ],
+                        many=True
+                    ).data,
+                })
+
+            print(f"✅ StockMovementSeriesView - {len(data)} séries, {len(raw_data)} pontos")
+
+            return Response({
+                'success': True,
+                'period': period,
+                'group': group,
+                'months': months,
+                'count': len(data),
+                'data': data
+            })
+
+        except QueryUnavailable as e:
+            return overloaded_response('StockMovementSeriesView', e)
+        except Exception as e:
+            print(f"❌ Erro na StockMovementSeriesView: {e}")
+            return Response({
+                'error': f'Erro ao buscar série de movimentações: {str(e)}',
+                'count': 0,
+                'data': []
+            }, status=500)
+
+
 class SalesView(APIView):
     # permission_classes = [IsAuthenticated]
+    throttle_scope = 'consulta_pesada'
 
     def get(self, request):
         try:
@@ -95,45 +264,12 @@ class SalesView(APIView):
             
             print(f"📊 SalesView - Meses: {months}, Filial: {filial_filter}, Armazém: {armazem_filter}")
             
-            # Buscar vendas + movimentações combinadas
-            raw_data = ProtheusService.get_sales_and_movements_summary(
+            # Buscar vendas + movimentações combinadas, consolidadas por produto
+            data = ProtheusService.get_consolidated_sales(
                 months=months,
                 filial=filial_filter if filial_filter else None,
                 armazem=armazem_filter if armazem_filter else None
             )
-
-            # Consolidar dados por produto (agrupar vendas + movimentações)
-            consolidated_data = {}
-            
-            for item in raw_data:
-                try:
-                    code = str(item.get("code", ""))
-                    filial = str(item.get("filial", ""))
-                    local = str(item.get("local", ""))
-                    
-                    # Criar chave única por produto + filial + armazém
-                    key = f"{code}_{filial}_{local}"
-                    
-                    if key not in consolidated_data:
-                        consolidated_data[key] = {
-                            "code": code,
-                            "description": str(item.get("description", "")),
-                            "quantity": 0,
-                            "value": 0,
-                            "filial": filial,
-                            "local": local,
-                        }
-                    
-                    # Somar quantidades e valores (vendas + movimentações)
-                    consolidated_data[key]["quantity"] += float(item.get("quantity", 0))
-                    consolidated_data[key]["value"] += float(item.get("value", 0))
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar item de vendas: {e}")
-                    continue
-
-            # Converter para lista
-            data = list(consolidated_data.values())
             
             print(f"✅ SalesView - {len(data)} itens consolidados")
 
@@ -144,6 +280,8 @@ class SalesView(APIView):
 
             return paginator.get_paginated_response(serializer.data)
             
+        except QueryUnavailable as e:
+            return overloaded_response('SalesView', e)
         except Exception as e:
             print(f"❌ Erro na SalesView: {e}")
             return Response({
@@ -158,6 +296,271 @@ class SalesView(APIView):
             }, status=500)
 
 
+class StockBalanceAtView(APIView):
+    """
+    Saldo em data: saldo de estoque no fim do dia informado por filial/produto/local,
+    reconstruído a partir do checkpoint mais próximo (ou do SB2 atual)
+    """
+    # permission_classes = [IsAuthenticated]
+    throttle_scope = 'consulta_pesada'
+
+    def get(self, request):
+        try:
+            date = datetime.date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({
+                'error': 'Informe a data no formato YYYY-MM-DD (parâmetro date)',
+                'count': 0,
+                'results': []
+            }, status=400)
+
+        try:
+            filial_filter = request.query_params.get('filial', '')
+            armazem_filter = request.query_params.get('armazem', '') or request.query_params.get('local', '')
+            code_filter = request.query_params.get('code', '')
+            
+            print(f"🕰️ StockBalanceAtView - date={date}, filial={filial_filter}, armazem={armazem_filter}, code={code_filter}")
+            
+            keys, balance, anchor = BalanceHistory.balances_at(
+                date,
+                filial=parse_list(filial_filter) or None,
+                local=parse_list(armazem_filter) or None,
+                code=parse_list(code_filter) or None
+            )
+
+            paginator = StandardPagination()
+            page = paginator.paginate_queryset(np.arange(len(keys)), request)
+            data = [{**split_key(keys[i]), 'balance': float(balance[i])} for i in page]
+
+            response = paginator.get_paginated_response(BalanceAtSerializer(data, many=True).data)
+            response.data['date'] = date.isoformat()
+            response.data['anchor'] = anchor.isoformat() if anchor else 'atual'
+            return response
+
+        except QueryUnavailable as e:
+            return overloaded_response('StockBalanceAtView', e)
+        except Exception as e:
+            print(f"❌ Erro na StockBalanceAtView: {e}")
+            return Response({
+                'error': f'Erro ao reconstruir saldo em data: {str(e)}',
+                'count': 0,
+                'next': None,
+                'previous': None,
+                'total_pages': 0,
+                'current_page': 1,
+                'page_size': 50,
+                'results': []
+            }, status=500)
+
+
+class StockBalanceSeriesView(APIView):
+    """
+    Série diária de saldo por filial/produto/local entre duas datas
+    (apenas os dias em que o saldo muda, precedidos do saldo inicial)
+    """
+    # permission_classes = [IsAuthenticated]
+    throttle_scope = 'consulta_pesada'
+
+    MAX_DAYS = 366
+
+    def get(self, request):
+        try:
+            start = datetime.date.fromisoformat(request.query_params.get('start', ''))
+            end = datetime.date.fromisoformat(
+                request.query_params.get('end', '') or datetime.date.today().isoformat()
+            )
+        except ValueError:
+            return Response({
+                'error': 'Informe start (e opcionalmente end) no formato YYYY-MM-DD',
+                'data': []
+            }, status=400)
+
+        code_filter = request.query_params.get('code', '')
+        if not parse_list(code_filter):
+            return Response({
+                'error': 'Informe ao menos um produto (parâmetro code)',
+                'data': []
+            }, status=400)
+
+        end = min(end, datetime.date.today())
+        if start >= end or (end - start).days > self.MAX_DAYS:
+            return Response({
+                'error': f'Período inválido: start deve ser anterior a end e o intervalo de até {self.MAX_DAYS} dias',
+                'data': []
+            }, status=400)
+
+        try:
+            filial_filter = request.query_params.get('filial', '')
+            armazem_filter = request.query_params.get('armazem', '') or request.query_params.get('local', '')
+            
+            print(f"🕰️ StockBalanceSeriesView - {start} a {end}, filial={filial_filter}, armazem={armazem_filter}, code={code_filter}")
+            
+            data, anchor = BalanceHistory.daily_series(
+                start,
+                end,
+                filial=parse_list(filial_filter) or None,
+                local=parse_list(armazem_filter) or None,
+                code=parse_list(code_filter)
+            )
+
+            print(f"✅ StockBalanceSeriesView - {len(data)} séries")
+
+            return Response({
+                'success': True,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'anchor': anchor.isoformat() if anchor else 'atual',
+                'count': len(data),
+                'data': BalanceSeriesSerializer(data, many=True).data
+            })
+
+        except QueryUnavailable as e:
+            return overloaded_response('StockBalanceSeriesView', e)
+        except Exception as e:
+            print(f"❌ Erro na StockBalanceSeriesView: {e}")
+            return Response({
+                'error': f'Erro ao reconstruir série de saldo: {str(e)}',
+                'data': []
+            }, status=500)
+
+
+class StockDiffView(APIView):
+    """
+    O que mudou no estoque entre duas datas: chaves filial/produto/local cujo
+    saldo variou mais que ``threshold``, pelas fotografias diárias do SB2
+    (ver protheus/snapshots.py), da maior variação para a menor. Datas sem
+    fotografia usam a anterior; sem ``start``, compara com a fotografia anterior
+    à de ``end``
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            end = datetime.date.fromisoformat(
+                request.query_params.get('end', '') or datetime.date.today().isoformat()
+            )
+            start = request.query_params.get('start', '')
+            start = datetime.date.fromisoformat(start) if start else None
+            threshold = abs(float(request.query_params.get('threshold', 0) or 0))
+        except ValueError:
+            return Response({
+                'error': 'Informe start/end no formato YYYY-MM-DD e threshold numérico',
+                'count': 0,
+                'results': []
+            }, status=400)
+
+        # Sem start: desde a fotografia anterior à de end
+        end_snapshot = StockSnapshots.on_or_before(end)
+        if start is None and end_snapshot is not None:
+            start = end_snapshot - datetime.timedelta(days=1)
+        start_snapshot = StockSnapshots.on_or_before(start) if start else None
+        if start_snapshot is None or end_snapshot is None:
+            return Response({
+                'error': 'Sem fotografia de estoque até a data informada (ver manage.py snapshot_stock)',
+                'count': 0,
+                'results': []
+            }, status=404)
+
+        try:
+            filial_filter = request.query_params.get('filial', '')
+            armazem_filter = request.query_params.get('armazem', '') or request.query_params.get('local', '')
+            code_filter = request.query_params.get('code', '')
+
+            print(f"🔀 StockDiffView - {start_snapshot} a {end_snapshot}, threshold={threshold}, filial={filial_filter}, armazem={armazem_filter}, code={code_filter}")
+
+            keys, before, after = StockSnapshots.diff(
+                start_snapshot,
+                end_snapshot,
+                threshold=threshold,
+                filial=parse_list(filial_filter) or None,
+                local=parse_list(armazem_filter) or None,
+                code=parse_list(code_filter) or None
+            )
+            order = np.argsort(-np.abs(after - before), kind='stable')
+
+            paginator = StandardPagination()
+            page = np.asarray(paginator.paginate_queryset(order, request), dtype=np.int64)
+            data = key_rows(keys[page], before[page], after[page])
+
+            print(f"✅ StockDiffView - {len(keys)} chaves alteradas")
+
+            response = paginator.get_paginated_response(StockDiffSerializer(data, many=True).data)
+            response.data['start'] = start_snapshot.isoformat()
+            response.data['end'] = end_snapshot.isoformat()
+            response.data['threshold'] = threshold
+            return response
+
+        except Exception as e:
+            print(f"❌ Erro na StockDiffView: {e}")
+            return Response({
+                'error': f'Erro ao comparar fotografias de estoque: {str(e)}',
+                'count': 0,
+                'next': None,
+                'previous': None,
+                'total_pages': 0,
+                'current_page': 1,
+                'page_size': 50,
+                'results': []
+            }, status=500)
+
+
+class StockAtpView(APIView):
+    """
+    Disponível para promessa por produto/local de uma filial: saldo, reserva,
+    liberações pendentes, carteira em aberto do SC6 e o perfil projetado por dia
+    de entrega (ver protheus/atp.py)
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        filiais = parse_list(request.query_params.get('filial', ''))
+        if len(filiais) != 1:
+            return Response({
+                'error': 'Informe uma filial (parâmetro filial)',
+                'count': 0,
+                'results': []
+            }, status=400)
+        filial = filiais[0]
+
+        try:
+            code_filter = request.query_params.get('code', '')
+            armazem_filter = request.query_params.get('armazem', '') or request.query_params.get('local', '')
+            shortage_only = request.query_params.get('shortage', '') in ('1', 'true')
+
+            print(f"🤝 StockAtpView - filial={filial}, code={code_filter}, armazem={armazem_filter}, shortage={shortage_only}")
+
+            atp = AvailableToPromise.current(filial)
+            indices = atp.find(
+                code=parse_list(code_filter) or None,
+                local=parse_list(armazem_filter) or None,
+                shortage_only=shortage_only
+            )
+
+            paginator = StandardPagination()
+            page = paginator.paginate_queryset(indices, request)
+            data = atp.rows(page)
+
+            response = paginator.get_paginated_response(AtpSerializer(data, many=True).data)
+            response.data['filial'] = filial
+            response.data['age'] = int(atp.age)
+            return response
+
+        except QueryUnavailable as e:
+            return overloaded_response('StockAtpView', e)
+        except Exception as e:
+            print(f"❌ Erro na StockAtpView: {e}")
+            return Response({
+                'error': f'Erro ao calcular disponível para promessa: {str(e)}',
+                'count': 0,
+                'next': None,
+                'previous': None,
+                'total_pages': 0,
+                'current_page': 1,
+                'page_size': 50,
+                'results': []
+            }, status=500)
+
+
 class StockMovementView(APIView):
     # permission_classes = [IsAuthenticated]
 
@@ -177,24 +580,7 @@ class StockMovementView(APIView):
                 armazem=armazem_filter if armazem_filter else None
             )
 
-            data = []
-            for item in raw_data:
-                try:
-                    formatted_item = {
-                        "code": str(item.get("code", "")),
-                        "movement_type": str(item.get("movement_type", "")),
-                        "date": item.get("date"),
-                        "quantity": float(item.get("quantity", 0)),
-                        "fiscal_code": str(item.get("fiscal_code", "")),
-                        "document": str(item.get("document", "")),
-                        "location": str(item.get("location", "")),
-                        "filial": str(item.get("filial", "")),
-                    }
-                    data.append(formatted_item)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar item de movimentação: {e}")
-                    continue
+            data = raw_data
 
             print(f"✅ StockMovementView - {len(data)} itens processados")
 
@@ -205,6 +591,8 @@ class StockMovementView(APIView):
                 "results": StockMovementSerializer(data, many=True).data
             })
 
+        except QueryUnavailable as e:
+            return overloaded_response('StockMovementView', e)
         except Exception as e:
             print(f"❌ Erro na StockMovementView: {e}")
             return Response({
@@ -232,18 +620,7 @@ class LocationsView(APIView):
                 filial=filial_filter if filial_filter else None
             )
 
-            data = []
-            for item in raw_data:
-                try:
-                    formatted_item = {
-                        "location": str(item.get("location", "")),
-                        "movement_count": int(item.get("movement_count", 0)),
-                    }
-                    data.append(formatted_item)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar location: {e}")
-                    continue
+            data = LocationSerializer(raw_data, many=True).data
 
             print(f"✅ LocationsView - {len(data)} locations processados")
 
@@ -253,6 +630,8 @@ class LocationsView(APIView):
                 "count": len(data)
             })
             
+        except QueryUnavailable as e:
+            return overloaded_response('LocationsView', e)
         except Exception as e:
             print(f"❌ Erro na LocationsView: {e}")
             return Response({
@@ -268,6 +647,7 @@ class DeliveryView(APIView):
     API para buscar dados de liberações/entregas (SC9)
     """
     # permission_classes = [IsAuthenticated]
+    throttle_scope = 'consulta_pesada'
 
     def get(self, request):
         try:
@@ -277,42 +657,15 @@ class DeliveryView(APIView):
             
             print(f"🚚 DeliveryView - Filtros: filial={filial_filter}, local={local_filter}, days={days}")
             
-            # Buscar dados de liberações/entregas
-            raw_data = ProtheusService.get_deliveries_summary(
+            include_status = request.query_params.get('include_status', '').lower() in ('1', 'true', 'sim')
+            
+            # Buscar dados de liberações/entregas (e o resumo por status da mesma varredura)
+            scan = ProtheusService.get_deliveries_with_status(
                 filial=filial_filter if filial_filter else None,
                 local=local_filter if local_filter else None,
                 days=days
             )
-
-            data = []
-            for item in raw_data:
-                try:
-                    formatted_item = {
-                        "pedido": str(item.get("pedido", "")),
-                        "item": str(item.get("item", "")),
-                        "sequencia": str(item.get("sequencia", "")),
-                        "produto": str(item.get("produto", "")),
-                        "descricao": str(item.get("descricao", "")),
-                        "quantidade_liberada": float(item.get("quantidade_liberada", 0)),
-                        "preco_venda": float(item.get("preco_venda", 0)),
-                        "valor_total": float(item.get("valor_total", 0)),
-                        "data_liberacao": item.get("data_liberacao"),
-                        "local": str(item.get("local", "")),
-                        "lote": str(item.get("lote", "")),
-                        "data_validade": item.get("data_validade"),
-                        "ordem_separacao": str(item.get("ordem_separacao", "")),
-                        "nota_fiscal": str(item.get("nota_fiscal", "")),
-                        "serie_nf": str(item.get("serie_nf", "")),
-                        "status_liberacao": str(item.get("status_liberacao", "")),
-                        "bloqueio_estoque": str(item.get("bloqueio_estoque", "")),
-                        "bloqueio_credito": str(item.get("bloqueio_credito", "")),
-                        "filial": str(item.get("filial", "")),
-                    }
-                    data.append(formatted_item)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar item de liberação: {e}")
-                    continue
+            data = scan['rows']
 
             print(f"✅ DeliveryView - {len(data)} itens processados")
 
@@ -321,8 +674,13 @@ class DeliveryView(APIView):
             paginated_data = paginator.paginate_queryset(data, request)
             serializer = DeliverySummarySerializer(paginated_data, many=True)
 
-            return paginator.get_paginated_response(serializer.data)
+            response = paginator.get_paginated_response(serializer.data)
+            if include_status:
+                response.data['status'] = DeliveryStatusSerializer(scan['status'], many=True).data
+            return response
             
+        except QueryUnavailable as e:
+            return overloaded_response('DeliveryView', e)
         except Exception as e:
             print(f"❌ Erro na DeliveryView: {e}")
             return Response({
@@ -356,19 +714,7 @@ class DeliveryStatusView(APIView):
                 days=days
             )
 
-            data = []
-            for item in raw_data:
-                try:
-                    formatted_item = {
-                        "status": str(item.get("status", "")),
-                        "quantidade": int(item.get("quantidade", 0)),
-                        "valor_total": float(item.get("valor_total", 0)),
-                    }
-                    data.append(formatted_item)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar status de liberação: {e}")
-                    continue
+            data = DeliveryStatusSerializer(raw_data, many=True).data
 
             print(f"✅ DeliveryStatusView - {len(data)} status processados")
 
@@ -378,6 +724,8 @@ class DeliveryStatusView(APIView):
                 'data': data
             })
             
+        except QueryUnavailable as e:
+            return overloaded_response('DeliveryStatusView', e)
         except Exception as e:
             print(f"❌ Erro na DeliveryStatusView: {e}")
             return Response({
@@ -399,45 +747,208 @@ class PendingDeliveriesView(APIView):
             
             print(f"⏳ PendingDeliveriesView - Filtros: filial={filial_filter}, local={local_filter}")
             
+            if request.query_params.get('aging', '').lower() in ('1', 'true', 'sim'):
+                return self.get_aging(request, filial_filter, local_filter)
+            
             # Buscar liberações pendentes
             raw_data = ProtheusService.get_pending_deliveries(
                 filial=filial_filter if filial_filter else None,
                 local=local_filter if local_filter else None
             )
 
-            data = []
-            for item in raw_data:
-                try:
-                    formatted_item = {
-                        "filial": str(item.get("filial", "")),
-                        "pedido": str(item.get("pedido", "")),
-                        "produto": str(item.get("produto", "")),
-                        "descricao": str(item.get("descricao", "")),
-                        "local": str(item.get("local", "")),
-                        "total_liberado": float(item.get("total_liberado", 0)),
-                        "valor_total": float(item.get("valor_total", 0)),
-                        "primeira_liberacao": item.get("primeira_liberacao"),
-                        "ultima_liberacao": item.get("ultima_liberacao"),
-                        "total_itens": int(item.get("total_itens", 0)),
-                    }
-                    data.append(formatted_item)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao processar liberação pendente: {e}")
-                    continue
-
-            print(f"✅ PendingDeliveriesView - {len(data)} pendências processadas")
+            print(f"✅ PendingDeliveriesView - {len(raw_data)} pendências processadas")
 
-            # Aplicar paginação
+            # Paginar antes de serializar: só a página passa pelo serializer
             paginator = StandardPagination()
-            paginated_data = paginator.paginate_queryset(data, request)
+            paginated_data = paginator.paginate_queryset(raw_data, request)
+            serializer = PendingDeliverySerializer(paginated_data, many=True)
 
-            return paginator.get_paginated_response(paginated_data)
+            return paginator.get_paginated_response(serializer.data)
             
+        except QueryUnavailable as e:
+            return overloaded_response('PendingDeliveriesView', e)
         except Exception as e:
             print(f"❌ Erro na PendingDeliveriesView: {e}")
             return Response({
                 'error': f'Erro ao buscar liberações pendentes: {str(e)}',
                 'count': 0,
                 'results': []
-            }, status=500)
\ No newline at end of file
+            }, status=500)
+
+    def get_aging(self, request, filial_filter, local_filter):
+        """
+        Aging das pendências: valor por faixa de dias desde a primeira liberação
+        e os ``top`` pedidos mais antigos de cada filial (calculados no Oracle)
+        """
+        try:
+            top = max(1, min(int(request.query_params.get('top', 10)), 100))
+        except ValueError:
+            top = 10
+
+        raw_data = ProtheusService.get_pending_deliveries_aging(
+            filial=filial_filter if filial_filter else None,
+            local=local_filter if local_filter else None,
+            top=top
+        )
+
+        filiais = {}
+        for row in raw_data:
+            filial = row['filial'] or ''
+            entry = filiais.setdefault(filial, {
+                'filial': filial,
+                'faixas': {
+                    faixa: {'valor_total': 0.0, 'pedidos': 0}
+                    for faixa in PENDING_AGING_BUCKETS
+                },
+                'mais_antigos': [],
+            })
+
+            # Linha representante da faixa traz os totais analíticos
+            if int(row.get('faixa_rn') or 0) == 1:
+                entry['faixas'][row['faixa']] = {
+                    'valor_total': float(row.get('faixa_valor') or 0),
+                    'pedidos': int(row.get('faixa_pedidos') or 0),
+                }
+
+            if int(row.get('posicao') or 0) <= top:
+                entry['mais_antigos'].append(row)
+
+        data = []
+        for entry in filiais.values():
+            entry['mais_antigos'] = PendingAgingOrderSerializer(entry['mais_antigos'], many=True).data
+            data.append(entry)
+
+        print(f"✅ PendingDeliveriesView (aging) - {len(data)} filiais, top {top}")
+
+        return Response({
+            'success': True,
+            'faixas': list(PENDING_AGING_BUCKETS),
+            'top': top,
+            'count': len(data),
+            'data': data,
+        })
+
+
+class DeliveryExpiryView(APIView):
+    """
+    API de exposição a vencimento (FEFO) das liberações (SC9): quantidades
+    liberadas e não faturadas por faixa de validade (vencido, até 30, 60, 90 dias)
+    """
+    # permission_classes = [IsAuthenticated]
+
+    BUCKETS = ('VENCIDO', 'ATE_30', 'ATE_60', 'ATE_90')
+
+    def get(self, request):
+        try:
+            filial_filter = request.query_params.get('filial', '')
+            local_filter = request.query_params.get('local', '')
+            
+            print(f"🧪 DeliveryExpiryView - Filtros: filial={filial_filter}, local={local_filter}")
+            
+            raw_data = ProtheusService.get_expiry_exposure(
+                filial=filial_filter if filial_filter else None,
+                local=local_filter if local_filter else None
+            )
+
+            data = ExpiryExposureSerializer(raw_data, many=True).data
+
+            # Totais por faixa calculados sobre as linhas já agregadas no Oracle
+            summary = {
+                bucket: {'faixa_validade': bucket, 'quantidade': 0.0, 'valor_total': 0.0, 'total_lotes': 0}
+                for bucket in self.BUCKETS
+            }
+            for item in data:
+                bucket = summary[item['faixa_validade']]
+                bucket['quantidade'] += item['quantidade']
+                bucket['valor_total'] += item['valor_total']
+                bucket['total_lotes'] += 1
+
+            print(f"✅ DeliveryExpiryView - {len(data)} lotes processados")
+
+            return Response({
+                'success': True,
+                'resumo': list(summary.values()),
+                'count': len(data),
+                'data': data
+            })
+            
+        except QueryUnavailable as e:
+            return overloaded_response('DeliveryExpiryView', e)
+        except Exception as e:
+            print(f"❌ Erro na DeliveryExpiryView: {e}")
+            return Response({
+                'error': f'Erro ao buscar vencimentos: {str(e)}',
+                'success': False,
+                'resumo': [],
+                'data': []
+            }, status=500)
+
+
+class ProtheusListView(generics.ListAPIView):
+    """
+    Base das listagens via ORM (somente leitura) sobre as tabelas Protheus.
+
+    Os filtros vêm dos FilterSets de ``protheus/filters.py`` e a ordenação segue a
+    chave do índice nativo da tabela (com R_E_C_N_O_ como desempate), para
+    paginação estável.
+    """
+    # permission_classes = [IsAuthenticated]
+    pagination_class = StandardPagination
+    ordering = ()
+
+    # Banco escolhido uma vez por requisição (principal ou réplica) em ``list``
+    database = PRIMARY
+
+    def get_queryset(self):
+        return self.queryset.using(self.database).ativos().order_by(*self.ordering).stable()
+
+    def list(self, request, *args, **kwargs):
+        try:
+            # Vaga, contagem e página no mesmo banco, mesmo se a saúde da réplica
+            # mudar no meio da requisição
+            self.database = database_for('orm_list')
+            with oracle_session('orm_list', self.database, method=type(self).__name__):
+                return super().list(request, *args, **kwargs)
+        except QueryUnavailable as e:
+            return overloaded_response(type(self).__name__, e)
+
+
+class ProductListView(ProtheusListView):
+    """
+    Produtos (SB1) - filtros: B1_FILIAL, B1_COD, B1_TIPO
+    """
+    queryset = ProtheusSB1.objects.all()
+    serializer_class = ProductSerializer
+    filterset_class = ProductFilter
+    ordering = ('B1_FILIAL', 'B1_COD')
+
+
+class StockBalanceListView(ProtheusListView):
+    """
+    Saldos por armazém (SB2) - filtros: B2_FILIAL, B2_COD, B2_LOCAL
+    """
+    queryset = ProtheusSB2.objects.all()
+    serializer_class = StockBalanceSerializer
+    filterset_class = StockFilter
+    ordering = ('B2_FILIAL', 'B2_COD', 'B2_LOCAL')
+
+
+class StockMovementListView(ProtheusListView):
+    """
+    Movimentações (SD3) - filtros: D3_FILIAL, D3_COD, D3_DOC, D3_LOCAL, D3_TM
+    """
+    queryset = ProtheusSD3.objects.all()
+    serializer_class = StockMovementRecordSerializer
+    filterset_class = StockMovementFilter
+    ordering = ('D3_FILIAL', 'D3_COD', 'D3_LOCAL', 'D3_EMISSAO')
+
+
+class DeliveryListView(ProtheusListView):
+    """
+    Liberações (SC9) - filtros: C9_FILIAL, C9_PEDIDO, C9_PRODUTO, C9_LOCAL,
+    C9_NFISCAL, C9_BLEST, C9_BLCRED
+    """
+    queryset = ProtheusSC9.objects.all()
+    serializer_class = DeliveryRecordSerializer
+    filterset_class = DeliveryFilter
+    ordering = ('C9_FILIAL', 'C9_PEDIDO', 'C9_ITEM', 'C9_SEQUEN')
@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from reports.models import ReportJob
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report', 'status', 'rows', 'created_at', 'finished_at', 'expires_at')
+    list_filter = ('report', 'status')
@@ -0,0 +1,227 @@
+# reports/jobs.py - FILA DE RELATÓRIOS (SQLITE + POOL DE PROCESSOS LOCAL)
+
+import datetime
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import traceback
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from protheus.admission import QueryUnavailable, call_timeout
+from reports.models import ReportJob
+from reports.registry import REPORTS
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (ReportJob.STATUS_PENDENTE, ReportJob.STATUS_EXECUTANDO)
+
+# Trava (flock) do report_worker em execução, em REPORTS_RESULT_DIR
+WORKER_LOCK_NAME = '.report_worker.lock'
+
+
+def result_dir():
+    return Path(settings.REPORTS_RESULT_DIR)
+
+
+def normalize_params(report, params):
+    """
+    Mantém só os parâmetros aceitos pelo relatório, como strings sem espaços
+    """
+    accepted = REPORTS[report][1]
+    normalized = {}
+    for name in accepted:
+        value = params.get(name)
+        if value is None or value == '':
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ','.join(sorted(str(v).strip() for v in value))
+        normalized[name] = str(value).strip()
+    return normalized
+
+
+def params_hash(report, params):
+    payload = json.dumps({'report': report, 'params': params}, sort_keys=True)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def submit(report, params):
+    """
+    Enfileira um relatório; pedidos idênticos reaproveitam o job em andamento
+    ou o resultado ainda válido. Retorna (job, criado).
+    """
+    if report not in REPORTS:
+        raise ValueError(f"Relatório desconhecido: {report}")
+
+    params = normalize_params(report, params)
+    digest = params_hash(report, params)
+
+    with transaction.atomic():
+        existing = (
+            ReportJob.objects
+            .filter(params_hash=digest)
+            .exclude(status=ReportJob.STATUS_ERRO)
+            .order_by('-created_at')
+            .first()
+        )
+        if existing and (existing.status in ACTIVE_STATUSES or not existing.expired):
+            return existing, False
+
+        job = ReportJob.objects.create(report=report, params=params, params_hash=digest)
+        return job, True
+
+
+def ready_jobs():
+    """
+    Jobs pendentes que já podem rodar (sem espera de ``REPORTS_RETRY_DELAY``
+    pendente), mais antigos primeiro
+    """
+    return (
+        ReportJob.objects
+        .filter(status=ReportJob.STATUS_PENDENTE)
+        .filter(Q(not_before__isnull=True) | Q(not_before__lte=timezone.now()))
+        .order_by('created_at')
+    )
+
+
+def claim(job_id):
+    """
+    Marca o job como em execução se ainda estiver pendente (um único worker vence)
+    """
+    return ReportJob.objects.filter(pk=job_id, status=ReportJob.STATUS_PENDENTE).update(
+        status=ReportJob.STATUS_EXECUTANDO,
+        started_at=timezone.now(),
+    ) == 1
+
+
+def acquire_worker_lock():
+    """
+    Trava exclusiva do report_worker: retorna o descritor (mantido aberto enquanto
+    o worker roda) ou None se outro worker já estiver em execução. A trava é
+    liberada pelo sistema quando o processo termina, mesmo se ele morrer.
+    """
+    directory = result_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    fd = os.open(directory / WORKER_LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    return fd
+
+
+def requeue_orphans():
+    """
+    Jobs que ficaram em execução quando o worker anterior parou voltam para a fila.
+
+    Só pode ser chamada com a trava de ``acquire_worker_lock``: com um único
+    worker por vez, nenhum job em execução tem dono vivo.
+    """
+    return ReportJob.objects.filter(status=ReportJob.STATUS_EXECUTANDO).update(
+        status=ReportJob.STATUS_PENDENTE,
+        started_at=None,
+    )
+
+
+def purge_expired():
+    """
+    Remove resultados vencidos (arquivo e registro)
+    """
+    expired = ReportJob.objects.filter(expires_at__lte=timezone.now())
+    count = 0
+    for job in expired:
+        if job.result_file:
+            (result_dir() / job.result_file).unlink(missing_ok=True)
+        count += 1
+    expired.delete()
+    return count
+
+
+def write_rows(fh, rows):
+    """
+    Grava ``rows`` como lista JSON, uma linha por vez (aceita geradores, como os
+    relatórios lidos com ``stream``), e retorna a quantidade de linhas
+    """
+    count = 0
+    fh.write('[')
+    for row in rows:
+        if count:
+            fh.write(', ')
+        fh.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+        count += 1
+    fh.write(']')
+    return count
+
+
+def run(job_id):
+    """
+    Executa o job no processo filho e grava o resultado em disco (JSON).
+
+    Se o Oracle não atender (sem vaga, tempo esgotado ou disjuntor aberto - ver
+    ``QueryUnavailable``) o job volta para a fila, só roda de novo depois de
+    REPORTS_RETRY_DELAY segundos, e a função retorna None. As consultas têm até
+    PROTHEUS_BACKGROUND_CALL_TIMEOUT segundos cada.
+    """
+    job = ReportJob.objects.get(pk=job_id)
+    func = REPORTS[job.report][0]
+
+    directory = result_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = f'{job.pk}.json'
+    tmp_path = directory / f'.{filename}.tmp'
+
+    try:
+        # Relatórios geradores consultam o Oracle durante a gravação
+        with call_timeout(settings.PROTHEUS_BACKGROUND_CALL_TIMEOUT):
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                rows = write_rows(fh, func(job.params))
+        os.replace(tmp_path, directory / filename)
+
+        finished = timezone.now()
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.STATUS_CONCLUIDO,
+            rows=rows,
+            result_file=filename,
+            finished_at=finished,
+            expires_at=finished + datetime.timedelta(seconds=settings.REPORTS_RESULT_TTL),
+        )
+        logger.info(f"Relatório {job.report} #{job.pk}: {rows} linhas")
+        return job.pk
+
+    except QueryUnavailable as e:
+        logger.warning(f"Relatório {job.report} #{job.pk} devolvido à fila ({e.reason}): {e}")
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.STATUS_PENDENTE,
+            started_at=None,
+            not_before=timezone.now() + datetime.timedelta(seconds=settings.REPORTS_RETRY_DELAY),
+        )
+        return None
+
+    except Exception as e:
+        logger.error(f"Erro no relatório {job.report} #{job.pk}: {e}")
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.STATUS_ERRO,
+            error=f"{e}\n{traceback.format_exc()}",
+            finished_at=timezone.now(),
+            expires_at=timezone.now() + datetime.timedelta(seconds=settings.REPORTS_RESULT_TTL),
+        )
+        raise
+
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        connections.close_all()
+
+
+def load_result(job):
+    with open(result_dir() / job.result_file, encoding='utf-8') as fh:
+        return json.load(fh)
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from reports import jobs
+from reports.worker import init_worker, run_job
+
+
+class Command(BaseCommand):
+    help = "Executa os relatórios enfileirados (ReportJob) em um pool de processos local"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Processos executando relatórios em paralelo (padrão: 2)',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=2.0,
+            help='Intervalo em segundos entre verificações da fila (padrão: 2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Processa uma vez os jobs já prontos ao iniciar e termina',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+
+        # Um único report_worker por vez (use --workers para paralelizar); sem a
+        # trava, o requeue_orphans devolveria à fila jobs de outro worker vivo
+        lock = jobs.acquire_worker_lock()
+        if lock is None:
+            raise CommandError("Já existe um report_worker em execução")
+        try:
+            self.run_queue(workers, options)
+        finally:
+            os.close(lock)
+
+    def run_queue(self, workers, options):
+        requeued = jobs.requeue_orphans()
+        if requeued:
+            self.stdout.write(f"{requeued} jobs interrompidos voltaram para a fila")
+
+        # --once: só os jobs prontos ao iniciar, cada um uma vez; os devolvidos à
+        # fila (Oracle indisponível) ficam para a próxima execução
+        once = options['once']
+        remaining = set(jobs.ready_jobs().values_list('pk', flat=True)) if once else None
+
+        running = {}
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+            try:
+                while True:
+                    for job_id, future in list(running.items()):
+                        if future.done():
+                            del running[job_id]
+                            error = future.exception()
+                            if error:
+                                self.stderr.write(f"Job #{job_id}: erro - {error}")
+                            elif future.result() is None:
+                                self.stdout.write(f"Job #{job_id}: Oracle indisponível, devolvido à fila")
+                            else:
+                                self.stdout.write(self.style.SUCCESS(f"Job #{job_id}: concluído"))
+
+                    free = workers - len(running)
+                    if free > 0:
+                        pending = jobs.ready_jobs()
+                        if once:
+                            remaining = set(pending.filter(pk__in=remaining).values_list('pk', flat=True))
+                            pending = pending.filter(pk__in=remaining)
+                        for job_id in pending.values_list('pk', flat=True)[:free]:
+                            if once:
+                                remaining.discard(job_id)
+                            if jobs.claim(job_id):
+                                running[job_id] = pool.submit(run_job, job_id)
+                                self.stdout.write(f"Job #{job_id}: iniciado")
+
+                    purged = jobs.purge_expired()
+                    if purged:
+                        self.stdout.write(f"{purged} resultados vencidos removidos")
+
+                    if once and not running and not remaining:
+                        break
+
+                    connections.close_all()
+                    time.sleep(options['poll'])
+
+            except KeyboardInterrupt:
+                self.stdout.write("Encerrando: aguardando jobs em execução...")
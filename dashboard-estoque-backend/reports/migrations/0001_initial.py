@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(max_length=50, verbose_name='Relatório')),
+                ('params', models.JSONField(default=dict, verbose_name='Parâmetros')),
+                ('params_hash', models.CharField(db_index=True, max_length=32, verbose_name='Hash (relatório + parâmetros)')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EXECUTANDO', 'Executando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=10)),
+                ('rows', models.IntegerField(blank=True, null=True, verbose_name='Linhas no resultado')),
+                ('result_file', models.CharField(blank=True, max_length=255, verbose_name='Arquivo do resultado')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Job de relatório',
+                'verbose_name_plural': 'Jobs de relatório',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
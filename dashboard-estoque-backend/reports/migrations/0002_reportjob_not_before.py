@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='not_before',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Não executar antes de'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ReportJob(models.Model):
+    """
+    Relatório pesado executado fora do request pelo comando ``report_worker``.
+
+    Fica no banco ``default`` (SQLite); o resultado é gravado em disco
+    (``REPORTS_RESULT_DIR``) e expira após ``REPORTS_RESULT_TTL`` segundos.
+    """
+
+    STATUS_PENDENTE = 'PENDENTE'
+    STATUS_EXECUTANDO = 'EXECUTANDO'
+    STATUS_CONCLUIDO = 'CONCLUIDO'
+    STATUS_ERRO = 'ERRO'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, 'Pendente'),
+        (STATUS_EXECUTANDO, 'Executando'),
+        (STATUS_CONCLUIDO, 'Concluído'),
+        (STATUS_ERRO, 'Erro'),
+    ]
+
+    report = models.CharField(max_length=50, verbose_name='Relatório')
+    params = models.JSONField(default=dict, verbose_name='Parâmetros')
+    params_hash = models.CharField(max_length=32, db_index=True, verbose_name='Hash (relatório + parâmetros)')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDENTE, db_index=True)
+    rows = models.IntegerField(null=True, blank=True, verbose_name='Linhas no resultado')
+    result_file = models.CharField(max_length=255, blank=True, verbose_name='Arquivo do resultado')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    not_before = models.DateTimeField(null=True, blank=True, verbose_name='Não executar antes de')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Job de relatório'
+        verbose_name_plural = 'Jobs de relatório'
+
+    def __str__(self):
+        return f'{self.pk} - {self.report} ({self.status})'
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
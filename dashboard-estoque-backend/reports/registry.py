@@ -0,0 +1,73 @@
+# reports/registry.py - RELATÓRIOS DISPONÍVEIS PARA EXECUÇÃO EM SEGUNDO PLANO
+
+from protheus.admission import oracle_session
+from protheus.filters import ProductFilter
+from protheus.models import ProtheusSB1
+from protheus.replica import database_for
+from protheus.serializers import ProductSerializer
+from protheus.services import ProtheusService, parse_list
+
+
+def _list_or_none(value):
+    return parse_list(value) or None
+
+
+def sales_summary(params):
+    """
+    Média de vendas + saídas (SalesView) consolidada por produto, sem paginação
+    """
+    return ProtheusService.get_consolidated_sales(
+        months=int(params.get('meses', 12)),
+        filial=_list_or_none(params.get('filial')),
+        armazem=_list_or_none(params.get('armazem')),
+    )
+
+
+def stock_export(params):
+    """
+    Exportação completa do estoque (SB1 + SB2)
+    """
+    return ProtheusService.get_stock_summary(
+        filial=_list_or_none(params.get('filial')),
+        armazem=_list_or_none(params.get('armazem')),
+        code_prefix=params.get('code') or None,
+    )
+
+
+def deliveries_export(params):
+    """
+    Exportação completa das liberações (SC9) do período
+    """
+    return ProtheusService.get_deliveries_summary(
+        filial=_list_or_none(params.get('filial')),
+        local=_list_or_none(params.get('local')),
+        days=int(params.get('days', 30)),
+    )
+
+
+def products_export(params):
+    """
+    Exportação completa do cadastro de produtos (SB1), com os filtros do
+    /products/. Lida pelo ORM em blocos (``stream``) e gravada linha a linha
+    pelo ``jobs.run``, sem a tabela inteira em memória.
+    """
+    database = database_for('products_export')
+    with oracle_session('products_export', database, method='products_export'):
+        queryset = ProductFilter(
+            {
+                'B1_FILIAL': params.get('filial', ''),
+                'B1_COD': params.get('code', ''),
+                'B1_TIPO': params.get('tipo', ''),
+            },
+            queryset=ProtheusSB1.objects.using(database).ativos().order_by('B1_FILIAL', 'B1_COD'),
+        ).qs
+        yield from queryset.values(*ProductSerializer.Meta.fields).stream()
+
+
+# Nome do relatório -> (função, parâmetros aceitos)
+REPORTS = {
+    'sales_summary': (sales_summary, ('meses', 'filial', 'armazem')),
+    'stock_export': (stock_export, ('filial', 'armazem', 'code')),
+    'deliveries_export': (deliveries_export, ('filial', 'local', 'days')),
+    'products_export': (products_export, ('filial', 'code', 'tipo')),
+}
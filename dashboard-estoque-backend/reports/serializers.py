@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+from reports.models import ReportJob
+from reports.registry import REPORTS
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report', 'params', 'status', 'rows', 'error',
+            'created_at', 'started_at', 'finished_at', 'expires_at', 'not_before',
+        ]
+
+
+class ReportRequestSerializer(serializers.Serializer):
+    report = serializers.ChoiceField(choices=sorted(REPORTS))
+    params = serializers.DictField(required=False, default=dict)
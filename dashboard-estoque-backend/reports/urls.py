@@ -0,0 +1,15 @@
+from django.urls import path
+from reports.views import (
+     ReportJobView,
+     ReportJobDetailView,
+     ReportJobDownloadView,
+)
+
+
+app_name = "reports"
+
+urlpatterns = [
+    path("reports/", ReportJobView.as_view(), name="reports-jobs"),
+    path("reports/<int:pk>/", ReportJobDetailView.as_view(), name="reports-job-detail"),
+    path("reports/<int:pk>/download/", ReportJobDownloadView.as_view(), name="reports-job-download"),
+]
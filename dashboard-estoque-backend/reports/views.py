@@ -0,0 +1,107 @@
+import csv
+import io
+
+from django.http import HttpResponse, JsonResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from reports import jobs
+from reports.models import ReportJob
+from reports.serializers import ReportJobSerializer, ReportRequestSerializer
+
+
+class ReportJobView(APIView):
+    """
+    Enfileira relatórios pesados (POST) e lista os jobs recentes (GET)
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            queryset = ReportJob.objects.all()[:50]
+            return Response({
+                'success': True,
+                'data': ReportJobSerializer(queryset, many=True).data
+            })
+
+        except Exception as e:
+            print(f"❌ Erro na ReportJobView: {e}")
+            return Response({
+                'error': f'Erro ao listar relatórios: {str(e)}',
+                'data': []
+            }, status=500)
+
+    def post(self, request):
+        serializer = ReportRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': serializer.errors}, status=400)
+
+        try:
+            job, created = jobs.submit(
+                serializer.validated_data['report'],
+                serializer.validated_data['params'],
+            )
+            print(f"🧾 ReportJobView - {job.report} #{job.pk} ({'novo' if created else 'reaproveitado'})")
+
+            return Response({
+                'success': True,
+                'created': created,
+                'job': ReportJobSerializer(job).data
+            }, status=202 if created else 200)
+
+        except Exception as e:
+            print(f"❌ Erro na ReportJobView: {e}")
+            return Response({
+                'error': f'Erro ao enfileirar relatório: {str(e)}'
+            }, status=500)
+
+
+class ReportJobDetailView(APIView):
+    """
+    Status de um job de relatório
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = ReportJob.objects.filter(pk=pk).first()
+        if job is None:
+            return Response({'error': 'Relatório não encontrado'}, status=404)
+        return Response({'success': True, 'job': ReportJobSerializer(job).data})
+
+
+class ReportJobDownloadView(APIView):
+    """
+    Resultado de um job concluído em JSON (padrão) ou CSV (``?formato=csv``)
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = ReportJob.objects.filter(pk=pk).first()
+        if job is None:
+            return Response({'error': 'Relatório não encontrado'}, status=404)
+        if job.status != ReportJob.STATUS_CONCLUIDO:
+            return Response({'error': f'Relatório ainda não concluído ({job.status})'}, status=409)
+        if job.expired:
+            return Response({'error': 'Resultado expirado; enfileire o relatório novamente'}, status=410)
+
+        try:
+            rows = jobs.load_result(job)
+        except OSError:
+            return Response({'error': 'Arquivo do resultado indisponível'}, status=410)
+
+        filename = f'{job.report}_{job.pk}'
+
+        if request.query_params.get('formato') == 'csv':
+            buffer = io.StringIO()
+            if rows:
+                writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()), delimiter=';')
+                writer.writeheader()
+                writer.writerows(rows)
+            response = HttpResponse(buffer.getvalue(), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+
+        response = JsonResponse({'report': job.report, 'params': job.params, 'count': len(rows), 'data': rows})
+        response['Content-Disposition'] = f'attachment; filename="{filename}.json"'
+        return response
@@ -0,0 +1,17 @@
+# reports/worker.py - PONTO DE ENTRADA DOS PROCESSOS FILHOS DO report_worker
+#
+# Os filhos são iniciados com ``spawn`` (não herdam conexões Oracle/SQLite do
+# processo pai); por isso este módulo não importa models no topo.
+
+import os
+
+
+def init_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from reports.jobs import run
+    return run(job_id)